@@ -1,18 +1,56 @@
-from .playground import ModelPlayground, Competition,Experiment, Data
-from .preprocessormodules import export_preprocessor,upload_preprocessor,import_preprocessor
-from .data_sharing.download_data import download_data, import_quickstart_data
-from .reproducibility import export_reproducibility_env, import_reproducibility_env
+import importlib
+
+# Public objects are resolved on first attribute access, so that
+# `import aimodelshare` does not pull in ml frameworks, boto3 or pandas
+# before any of them is actually needed.
+_LAZY_ATTRIBUTES = {
+    # Object Oriented
+    "ModelPlayground": "aimodelshare.playground",
+    "Competition": "aimodelshare.playground",
+    "Experiment": "aimodelshare.playground",
+    "Data": "aimodelshare.playground",
+    # Preprocessor
+    "export_preprocessor": "aimodelshare.preprocessormodules",
+    "upload_preprocessor": "aimodelshare.preprocessormodules",
+    "import_preprocessor": "aimodelshare.preprocessormodules",
+    # Data
+    "download_data": "aimodelshare.data_sharing.download_data",
+    "import_quickstart_data": "aimodelshare.data_sharing.download_data",
+    # Reproducibility
+    "export_reproducibility_env": "aimodelshare.reproducibility",
+    "import_reproducibility_env": "aimodelshare.reproducibility",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        # submodules, e.g. aimodelshare.aws after a bare `import aimodelshare`
+        try:
+            return importlib.import_module(__name__ + "." + name)
+        except ModuleNotFoundError as err:
+            if err.name != __name__ + "." + name:
+                raise
+        raise AttributeError("module 'aimodelshare' has no attribute '" + name + "'")
+
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_LAZY_ATTRIBUTES.keys()))
 
 
 __all__ = [
     # Object Oriented
-    ModelPlayground,
-    Competition,
-    Data,
-    Experiment,
+    "ModelPlayground",
+    "Competition",
+    "Data",
+    "Experiment",
     # Preprocessor
-    upload_preprocessor,
-    import_preprocessor,
-    export_preprocessor,
-    download_data
+    "upload_preprocessor",
+    "import_preprocessor",
+    "export_preprocessor",
+    "download_data"
 ]
@@ -1,87 +1,187 @@
 # data wrangling
-import pandas as pd
 import numpy as np
 
-# ml frameworks
-try:
-    import sklearn
-    from sklearn.model_selection import GridSearchCV, RandomizedSearchCV
-except:
-    print("Warning: Please install sklearn to enable sklearn features")
-
-try:
-    import torch
-except:
-    print("Warning: Please install pytorch to enable pytorch features")
-
-try:
-    import xgboost
-except:
-    print("Warning: Please install xgboost to enable xgboost features")
-
-try:
-    import tensorflow as tf
-    import keras
-except:
-    print("Warning: Please install tensorflow/keras to enable tensorflow/keras features")
-
-try:
-    import pyspark
-    from pyspark.sql import SparkSession
-    from pyspark.ml import PipelineModel, Model
-    from pyspark.ml.tuning import CrossValidatorModel, TrainValidationSplitModel
-    from onnxmltools import convert_sparkml
-except:
-    print("Warning: Please install pyspark to enable pyspark features")
-
-
 # onnx modules
 import onnx
-import skl2onnx
-from skl2onnx import convert_sklearn
-import tf2onnx
-try:
-    from torch.onnx import export
-except:
-    pass
-from onnx.tools.net_drawer import GetPydotGraph, GetOpNodeProducer
 import importlib
-import onnxmltools
-import onnxruntime as rt
-from skl2onnx.common.data_types import FloatTensorType
 
 # aims modules
-from aimodelshare.aws import run_function_on_lambda, get_aws_client
+from aimodelshare.aws import resolve_playground, get_aws_client
 from aimodelshare.reproducibility import set_reproducibility_env
-from pandas.io.formats.style import Styler
+from aimodelshare.exceptions import ModelConversionError, ConversionTimeoutError, \
+    ConversionMemoryError, ConversionCancelledError, QuantizationAccuracyError
+from aimodelshare.conversion_cache import get_conversion_cache, get_artifact_store, model_fingerprint
+from aimodelshare.conversion_executor import get_conversion_executor
+from aimodelshare.estimator_registry import estimator_modules, estimator_class
+from aimodelshare.onnx_header import read_onnx_header
 
 # os etc
 import os
+import io
 import ast
 import tempfile
 import json
 import re
 import pickle
-import requests
+from aimodelshare import http_session
 import sys
 import shutil
 from pathlib import Path
 from zipfile import ZipFile
-import wget            
 from copy import copy
-import psutil
-from pympler import asizeof
-from IPython.core.display import display, HTML, SVG
-import absl.logging
-import networkx as nx
 import warnings
 from pathlib import Path
 import time
-import signal
-from scikeras.wrappers import KerasClassifier, KerasRegressor
+import functools
+import base64
+import hashlib
+import weakref
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+
+
+# ml frameworks and their onnx converters are heavy to import, so they are
+# only loaded once a model of that framework is actually passed in.
+# A model object can only exist if its framework was already imported,
+# so isinstance checks against frameworks missing from sys.modules are skipped.
+_FRAMEWORK_NAMES = {'sklearn': 'sklearn',
+                    'skl2onnx': 'sklearn',
+                    'torch': 'pytorch',
+                    'xgboost': 'xgboost',
+                    'tensorflow': 'tensorflow/keras',
+                    'keras': 'tensorflow/keras',
+                    'tf2onnx': 'tensorflow/keras',
+                    'scikeras': 'tensorflow/keras',
+                    'absl': 'tensorflow/keras',
+                    'pyspark': 'pyspark',
+                    'onnxmltools': 'onnxmltools',
+                    'onnxruntime': 'onnxruntime',
+                    'networkx': 'networkx'}
+
+
+def _import_framework(module_name):
+    '''Imports optional framework module on first use.'''
+
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        framework = _FRAMEWORK_NAMES.get(module_name.split('.')[0], module_name)
+        raise ImportError("Error: Please install " + framework +
+                          " to enable " + framework + " features")
+
+
+def _loaded_framework(module_name):
+    '''Returns framework module if it was already imported, otherwise None.'''
+
+    if module_name.split('.')[0] not in sys.modules:
+        return None
+
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        return None
+
+
+def _is_torch_model(model):
+
+    torch = _loaded_framework('torch')
+
+    return torch is not None and isinstance(model, torch.nn.Module)
+
+
+def _unwrap_sklearn_model(model):
+    '''Returns final estimator of sklearn parameter searches and pipelines.'''
+
+    model_selection = _loaded_framework('sklearn.model_selection')
+    pipeline = _loaded_framework('sklearn.pipeline')
+
+    if model_selection is not None and \
+    isinstance(model, (model_selection.GridSearchCV, model_selection.RandomizedSearchCV)):
+        model = model.best_estimator_
+
+    if pipeline is not None and isinstance(model, pipeline.Pipeline):
+        model = model.steps[-1][1]
+
+    return model
+
+
+# bytes of one node of a fitted sklearn tree (children, feature, threshold, impurity, sample counts)
+_TREE_NODE_BYTES = 64
 
 
-absl.logging.set_verbosity(absl.logging.ERROR)
+def _array_walk_size(obj, max_depth=6):
+    '''Sums nbytes of arrays reachable through attributes, containers and 
+    sklearn trees of obj, plus the shallow size of the objects holding them.'''
+
+    size = 0
+    seen = set()
+    stack = [(obj, 0)]
+
+    while stack:
+        item, depth = stack.pop()
+
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, np.ndarray):
+            size += item.nbytes
+            continue
+
+        size += sys.getsizeof(item, 0)
+
+        if depth >= max_depth or isinstance(item, (str, bytes, int, float, bool, type(None))):
+            continue
+
+        # cython tree of sklearn decision trees does not expose its node array
+        if hasattr(item, 'node_count') and hasattr(item, 'value'):
+            size += item.node_count * _TREE_NODE_BYTES + item.value.nbytes
+            continue
+
+        if isinstance(item, dict):
+            children = item.values()
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            children = item
+        elif hasattr(item, '__dict__'):
+            children = vars(item).values()
+        else:
+            continue
+
+        stack.extend((child, depth + 1) for child in children)
+
+    return size
+
+
+def estimate_memory_size(model):
+    '''Estimates memory footprint of a fitted model from its weight arrays.
+
+    Sums nbytes of keras weights, pytorch parameters and buffers, the 
+    serialized xgboost booster, or the arrays held by sklearn and other 
+    estimators, without walking the full python object graph.
+
+    Returns:
+    tuple of estimated size in bytes and name of the method used
+    '''
+
+    try:
+        if _is_torch_model(model):
+            import itertools
+            return sum(t.numel() * t.element_size() for t in 
+                       itertools.chain(model.parameters(), model.buffers())), 'torch_tensors'
+
+        if hasattr(model, 'get_weights') and hasattr(model, 'weights'):
+            return sum(int(np.prod(w.shape)) * np.dtype(getattr(w.dtype, 'as_numpy_dtype', w.dtype)).itemsize 
+                       for w in model.weights), 'keras_weights'
+
+        if hasattr(model, 'get_booster'):
+            return len(model.get_booster().save_raw()), 'xgboost_booster'
+
+        return _array_walk_size(model), 'array_walk'
+
+    except Exception:
+        return sys.getsizeof(model), 'getsizeof'
+
 
 def _extract_onnx_metadata(onnx_model, framework):
     '''Extracts model metadata from ONNX file.'''
@@ -174,6 +274,9 @@ def _misc_to_onnx(model, initial_types, transfer_learning=None,
     metadata['data_id'] = None
     metadata['preprocessor_id'] = None
     try:
+        xgboost = _import_framework('xgboost')
+        onnxmltools = _import_framework('onnxmltools')
+
         # infer ml framework from function call
         if isinstance(model, (xgboost.XGBClassifier, xgboost.XGBRegressor)):
             metadata['ml_framework'] = 'xgboost'
@@ -217,9 +320,9 @@ def _misc_to_onnx(model, initial_types, transfer_learning=None,
     if hasattr(model, 'solver'):
         model_architecture['optimizer'] = model.solver
 
-    metadata['model_architecture'] = str(model_architecture)
+    metadata['model_architecture'] = model_architecture
 
-    metadata['memory_size'] = asizeof.asizeof(model)    
+    metadata['memory_size'], metadata['memory_size_method'] = estimate_memory_size(model)
 
 
     # placeholder, needs evaluation engine
@@ -231,25 +334,45 @@ def _misc_to_onnx(model, initial_types, transfer_learning=None,
 
     meta = onx.metadata_props.add()
     meta.key = 'model_metadata'
-    meta.value = str(metadata)
+    meta.value = _dump_metadata(metadata)
 
     return onx
 
 
 
+@functools.lru_cache(maxsize=None)
+def _onnx_ir_version():
+    '''Returns ir_version matching the installed onnx release, looked up once per process.'''
+
+    from onnx.helper import VERSION_TABLE
+
+    indexlocationlist=[]
+    for i in VERSION_TABLE:
+      indexlocationlist.append(str(i).find(str(onnx.__version__)))
+
+    arr = np.array(indexlocationlist)
+
+    def condition(x): return x > -1
+
+    bool_arr = condition(arr)
+
+    output = np.where(bool_arr)[0]
+
+    return VERSION_TABLE[output[0]][1]
+
+
 def _sklearn_to_onnx(model, initial_types=None, transfer_learning=None,
-                    deep_learning=None, task_type=None):
+                    deep_learning=None, task_type=None, zipmap=True):
     '''Extracts metadata from sklearn model object.'''
     
     # check whether this is a fitted sklearn model
     # sklearn.utils.validation.check_is_fitted(model)
 
-    # deal with pipelines and parameter search 
-    if isinstance(model, (GridSearchCV, RandomizedSearchCV)):
-        model = model.best_estimator_
+    convert_sklearn = _import_framework('skl2onnx').convert_sklearn
+    FloatTensorType = _import_framework('skl2onnx.common.data_types').FloatTensorType
 
-    if isinstance(model, sklearn.pipeline.Pipeline):
-        model = model.steps[-1][1]
+    # deal with pipelines and parameter search 
+    model = _unwrap_sklearn_model(model)
 
     # fix ensemble voting models
     if all([hasattr(model, 'flatten_transform'),hasattr(model, 'voting')]):
@@ -260,30 +383,17 @@ def _sklearn_to_onnx(model, initial_types=None, transfer_learning=None,
         feature_count=model.n_features_in_
         initial_types = [('float_input', FloatTensorType([None, feature_count]))]
 
-    onx = convert_sklearn(model, initial_types=initial_types,target_opset={'': 15, 'ai.onnx.ml': 2})
+    # classifiers output probabilities as plain float tensor instead of list of dicts
+    is_classifier = _import_framework('sklearn.base').is_classifier(model)
+    options = None
+    if is_classifier and not zipmap:
+        options = {id(model): {'zipmap': False}}
+
+    onx = convert_sklearn(model, initial_types=initial_types,target_opset={'': 15, 'ai.onnx.ml': 2},
+                          options=options)
     
     ## Dynamically set model ir_version to ensure sklearn opsets work properly
-    from onnx.helper import VERSION_TABLE
-    import onnx
-    import numpy as np
-
-    indexlocationlist=[]
-    for i in VERSION_TABLE:
-      indexlocationlist.append(str(i).find(str(onnx.__version__)))
-
-
-    arr = np.array(indexlocationlist)
-
-    def condition(x): return x > -1
-
-    bool_arr = condition(arr)
-
-    output = np.where(bool_arr)[0]
-
-    ir_version=VERSION_TABLE[output[0]][1]
-
-    #add to model object before saving
-    onx.ir_version = ir_version
+    onx.ir_version = _onnx_ir_version()
     
     # generate metadata dict 
     metadata = {}
@@ -319,17 +429,10 @@ def _sklearn_to_onnx(model, initial_types=None, transfer_learning=None,
     # get model config dict from sklearn model object
     metadata['model_config'] = str(model.get_params())
 
-    # get weights for pretrained models 
-    temp_dir = tempfile.gettempdir()
-    temp_path = os.path.join(temp_dir, 'temp_file_name')
-
-    with open(temp_path, 'wb') as f:
-        pickle.dump(model, f)
-
-    with open(temp_path, "rb") as f:
-        pkl_str = f.read()
+    # get weights for pretrained models, stored next to the onnx file
+    metadata['model_weights'], metadata['weights_artifact'] = _store_weights(pickle.dumps(model), 'pickle')
 
-    metadata['model_weights'] = pkl_str
+    metadata['zipmap'] = zipmap if is_classifier else None
     
     # get model state from sklearn model object
     metadata['model_state'] = None
@@ -359,7 +462,7 @@ def _sklearn_to_onnx(model, initial_types=None, transfer_learning=None,
                               'optimizer': model.solver
                              }
 
-        metadata['model_architecture'] = str(model_architecture)
+        metadata['model_architecture'] = model_architecture
 
 
     else:
@@ -370,9 +473,9 @@ def _sklearn_to_onnx(model, initial_types=None, transfer_learning=None,
         if hasattr(model, 'solver'):
             model_architecture['optimizer'] = model.solver
 
-        metadata['model_architecture'] = str(model_architecture)
+        metadata['model_architecture'] = model_architecture
 
-    metadata['memory_size'] = asizeof.asizeof(model)    
+    metadata['memory_size'], metadata['memory_size_method'] = estimate_memory_size(model)
 
     # placeholder, needs evaluation engine
     metadata['eval_metrics'] = None  
@@ -383,7 +486,7 @@ def _sklearn_to_onnx(model, initial_types=None, transfer_learning=None,
 
     meta = onx.metadata_props.add()
     meta.key = 'model_metadata'
-    meta.value = str(metadata)
+    meta.value = _dump_metadata(metadata)
 
     return onx
 
@@ -405,11 +508,10 @@ def _pyspark_to_onnx(model, initial_types, spark_session,
                     task_type=None):
     '''Extracts metadata from pyspark model object.'''
 
-    try:
-        if pyspark is None:
-            raise("Error: Please install pyspark to enable pyspark features")
-    except:
-        raise("Error: Please install pyspark to enable pyspark features")
+    _import_framework('pyspark')
+    from pyspark.ml import PipelineModel, Model
+    from pyspark.ml.tuning import CrossValidatorModel, TrainValidationSplitModel
+    convert_sparkml = _import_framework('onnxmltools').convert_sparkml
 
     # deal with pipelines and parameter search
     if isinstance(model, (TrainValidationSplitModel, CrossValidatorModel)):
@@ -464,32 +566,27 @@ def _pyspark_to_onnx(model, initial_types, spark_session,
         model_config[key.name] = value
     metadata['model_config'] = str(model_config)
 
-    # get weights for pretrained models 
-    temp_dir = tempfile.gettempdir()
+    # get weights for pretrained models, pyspark can only save to a directory
+    temp_dir = tempfile.mkdtemp()
     temp_path = os.path.join(temp_dir, 'temp_pyspark_model')
 
-    model.write().overwrite().save(temp_path)
+    try:
+        model.write().overwrite().save(temp_path)
 
-    # calling function to get all file paths in the directory
-    file_paths = get_pyspark_model_files_paths(temp_path)
+        # calling function to get all file paths in the directory
+        file_paths = get_pyspark_model_files_paths(temp_path)
 
-    temp_path_zip = os.path.join(temp_dir, 'temp_pyspark_model.zip')
-    with ZipFile(temp_path_zip, 'w') as zip:
-        # writing each file one by one
-        for file in file_paths:
-            zip.write(os.path.join(temp_path, file), file)
-    
-    with open(temp_path_zip, "rb") as f:
-        pkl_str = f.read()
+        zip_buffer = io.BytesIO()
+        with ZipFile(zip_buffer, 'w') as zip:
+            # writing each file one by one
+            for file in file_paths:
+                zip.write(os.path.join(temp_path, file), file)
 
-    metadata['model_weights'] = pkl_str
-    
-    # clean up temp directory files for future runs
-    try:
-        shutil.rmtree(temp_path)
-        os.remove(temp_path_zip)
-    except:
-        pass
+        metadata['model_weights'], metadata['weights_artifact'] = _store_weights(zip_buffer.getvalue(),
+                                                                                 'pyspark_zip')
+
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
     # get model state from sklearn model object
     metadata['model_state'] = None
@@ -520,7 +617,7 @@ def _pyspark_to_onnx(model, initial_types, spark_session,
                               'optimizer': model.getSolver()
                              }
 
-        metadata['model_architecture'] = str(model_architecture)
+        metadata['model_architecture'] = model_architecture
 
 
     else:
@@ -531,9 +628,9 @@ def _pyspark_to_onnx(model, initial_types, spark_session,
         if hasattr(model, 'getSolver') and callable(model.getSolver):
             model_architecture['optimizer'] = model.getSolver()
 
-        metadata['model_architecture'] = str(model_architecture)
+        metadata['model_architecture'] = model_architecture
 
-    metadata['memory_size'] = asizeof.asizeof(model)    
+    metadata['memory_size'], metadata['memory_size_method'] = estimate_memory_size(model)
 
     # placeholder, needs evaluation engine
     metadata['eval_metrics'] = None  
@@ -544,10 +641,200 @@ def _pyspark_to_onnx(model, initial_types, spark_session,
 
     meta = onx.metadata_props.add()
     meta.key = 'model_metadata'
-    meta.value = str(metadata)
+    meta.value = _dump_metadata(metadata)
 
     return onx
 
+# protobuf cannot serialize messages over 2GB, so larger models keep their 
+# initializers in an external data file next to the model file
+EXTERNAL_DATA_THRESHOLD = int(1.5 * 1024**3)
+EXTERNAL_DATA_LOCATION = 'model.onnx.data'
+
+
+def _needs_external_data(onx):
+    '''Returns True if onx is too large to be serialized into a single protobuf.'''
+
+    try:
+        return onx.ByteSize() > EXTERNAL_DATA_THRESHOLD
+    except Exception:
+        return True
+
+
+def save_onnx(onx, filepath):
+
+    '''Saves ONNX model object to filepath. Initializers of models too large for 
+    a single protobuf are written to EXTERNAL_DATA_LOCATION in the same directory,
+    which onnxruntime reads directly from disk.
+
+    Returns:
+    list of written file paths, model file first
+    '''
+
+    if not _needs_external_data(onx):
+        with open(filepath, 'wb') as f:
+            f.write(onx.SerializeToString())
+        return [filepath]
+
+    model_dir = os.path.dirname(os.path.abspath(filepath))
+    onnx.save_model(onx, filepath, save_as_external_data=True, all_tensors_to_one_file=True,
+                    location=EXTERNAL_DATA_LOCATION, size_threshold=1024)
+
+    # saving moves initializers out of onx, read them back so the caller's model stays complete
+    from onnx.external_data_helper import load_external_data_for_model
+    load_external_data_for_model(onx, model_dir)
+
+    return [filepath, os.path.join(model_dir, EXTERNAL_DATA_LOCATION)]
+
+
+def _inference_session(onx, **kwargs):
+    '''Creates onnxruntime session from ONNX object, via a private temp file 
+    with external data for models over the protobuf size limit.'''
+
+    rt = _import_framework('onnxruntime')
+
+    if not _needs_external_data(onx):
+        return rt.InferenceSession(onx.SerializeToString(), **kwargs)
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        temp_path = os.path.join(temp_dir, 'model.onnx')
+        save_onnx(onx, temp_path)
+        sess = rt.InferenceSession(temp_path, **kwargs)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return sess
+
+
+def _dump_for_transfer(onx):
+    '''Returns serialized ONNX bytes, or the path of a private temp file 
+    with external data for models over the protobuf size limit.'''
+
+    if not _needs_external_data(onx):
+        return onx.SerializeToString()
+
+    temp_path = os.path.join(tempfile.mkdtemp(), 'model.onnx')
+    save_onnx(onx, temp_path)
+
+    return temp_path
+
+
+def _load_from_transfer(payload):
+    '''Loads ONNX object returned by _dump_for_transfer and removes its temp files.'''
+
+    if isinstance(payload, bytes):
+        return onnx.load_from_string(payload)
+
+    try:
+        onx = onnx.load(payload)
+    finally:
+        shutil.rmtree(os.path.dirname(payload), ignore_errors=True)
+
+    return onx
+
+
+_ONNX_INPUT_DTYPES = {'tensor(float)': np.float32,
+                      'tensor(double)': np.float64,
+                      'tensor(int64)': np.int64,
+                      'tensor(int32)': np.int32,
+                      'tensor(bool)': np.bool_}
+
+
+def _batch_feeds(sess, batch_size, example_inputs=None):
+    '''Returns input feed of batch_size rows, repeating the first row of the 
+    example inputs or filling in zeros for every known input dimension.'''
+
+    feeds = {}
+    for i, model_input in enumerate(sess.get_inputs()):
+        dtype = _ONNX_INPUT_DTYPES.get(model_input.type, np.float32)
+
+        if example_inputs is not None:
+            x = np.repeat(np.asarray(example_inputs[i])[:1], batch_size, axis=0)
+        else:
+            shape = [batch_size] + [d if isinstance(d, int) else 1 for d in model_input.shape[1:]]
+            x = np.zeros(shape)
+
+        feeds[model_input.name] = x.astype(dtype)
+
+    return feeds
+
+
+def _check_dynamic_batch(onx, example_inputs=None, batch_size=4):
+    '''Returns True if onx runs at batch size 1 and batch_size and 
+    keeps the batch dimension in all of its outputs.'''
+
+    try:
+        sess = _inference_session(onx, providers=['CPUExecutionProvider'])
+
+        for n in [1, batch_size]:
+            outputs = sess.run(None, _batch_feeds(sess, n, example_inputs))
+            if any(len(o) != n for o in outputs if np.ndim(o) > 0):
+                return False
+
+    except Exception:
+        return False
+
+    return True
+
+
+def _keras_model_to_onnx(model, opset=13):
+    '''Converts keras model to ONNX within the current process.
+
+    Tries the live keras model first, then a traced tf.function of it and 
+    finally a TFLite export, without spawning a tf2onnx subprocess.'''
+
+    tf = _import_framework('tensorflow')
+    tf2onnx_convert = _import_framework('tf2onnx.convert')
+
+    errors = []
+
+    # declare symbolic batch dimension, other unknown dimensions stay symbolic as well
+    try:
+        input_signature = [tf.TensorSpec([None] + list(i.shape[1:]), i.dtype, name=i.name.split(':')[0]) 
+                           for i in model.inputs]
+    except Exception:
+        input_signature = None
+
+    # convert live keras model
+    try:
+        onx, _ = tf2onnx_convert.from_keras(model, input_signature=input_signature, opset=opset)
+        return onx
+    except Exception as err:
+        errors.append('from_keras: ' + str(err))
+
+    # convert traced tf.function, handles subclassed models without keras input specs
+    try:
+        traced_model = tf.function(lambda *inputs: model(*inputs))
+        onx, _ = tf2onnx_convert.from_function(traced_model, input_signature=input_signature, 
+                                               opset=opset)
+        return onx
+    except Exception as err:
+        errors.append('from_function: ' + str(err))
+
+    # convert TFLite flatbuffer, needs a private temp dir for tf2onnx
+    temp_dir = tempfile.mkdtemp()
+    try:
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS, # enable TensorFlow Lite ops.
+            tf.lite.OpsSet.SELECT_TF_OPS # enable TensorFlow ops.
+          ]
+        tflite_path = os.path.join(temp_dir, 'tempmodel.tflite')
+        with open(tflite_path, 'wb') as f:
+            f.write(converter.convert())
+
+        onx, _ = tf2onnx_convert.from_tflite(tflite_path, opset=opset)
+        return onx
+    except Exception as err:
+        errors.append('from_tflite: ' + str(err))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    raise ModelConversionError("Model conversion to onnx unsuccessful. Please try different model or submit "
+                               "predictions to leaderboard without submitting preprocessor or model files.\n" 
+                               + "\n".join(errors))
+
+
 def _keras_to_onnx(model, transfer_learning=None,
                   deep_learning=None, task_type=None, epochs=None):
     '''Extracts metadata from keras model object.'''
@@ -555,63 +842,28 @@ def _keras_to_onnx(model, transfer_learning=None,
     # check whether this is a fitted keras model
     # isinstance...
 
-    # handle keras models in sklearn wrapper
-    if isinstance(model, (GridSearchCV, RandomizedSearchCV)):
-        model = model.best_estimator_
+    tf = _import_framework('tensorflow')
+    absl_logging = _import_framework('absl.logging')
+    absl_logging.set_verbosity(absl_logging.ERROR)
 
-    if isinstance(model, sklearn.pipeline.Pipeline):
-        model = model.steps[-1][1]
+    # handle keras models in sklearn wrapper
+    model = _unwrap_sklearn_model(model)
 
-    sklearn_wrappers = (KerasClassifier,KerasRegressor)
+    scikeras_wrappers = _loaded_framework('scikeras.wrappers')
 
-    if isinstance(model, sklearn_wrappers):
+    if scikeras_wrappers is not None and \
+    isinstance(model, (scikeras_wrappers.KerasClassifier, scikeras_wrappers.KerasRegressor)):
         model = model.model
     
-    # convert to onnx
-    #onx = convert_keras(model)
-    # generate tempfile for onnx object 
-    temp_dir = tempfile.mkdtemp()
-
-
-
-    
+    # convert to onnx in process
     tf.get_logger().setLevel('ERROR') # probably not good practice
-    output_path = os.path.join(temp_dir, 'temp.onnx')
-    
-    
-    model.save(temp_dir)
-
-    # # Convert the model
-    try:
-            modelstringtest="python -m tf2onnx.convert --saved-model  "+temp_dir+" --output "+output_path+" --opset 13"
-            resultonnx=os.system(modelstringtest)
-            resultonnx2=1
-            if resultonnx==0:
-              pass
-            else:
-              raise Exception('Model conversion to onnx unsuccessful.  Please try different model or submit predictions to leaderboard without submitting preprocessor or model files.')
-    except:
-            converter = tf.lite.TFLiteConverter.from_saved_model(temp_dir) # path to the SavedModel directory
-            converter.target_spec.supported_ops = [
-                tf.lite.OpsSet.TFLITE_BUILTINS, # enable TensorFlow Lite ops.
-                tf.lite.OpsSet.SELECT_TF_OPS # enable TensorFlow ops.
-              ]
-            tflite_model = converter.convert()
-
-            # Save the model.
-            with open(os.path.join(temp_dir,'tempmodel.tflite'), 'wb') as f:
-              f.write(tflite_model)
-
-            modelstringtest="python -m tf2onnx.convert --tflite "+os.path.join(temp_dir,'tempmodel.tflite')+" --output "+output_path+" --opset 13"
-            resultonnx2=os.system(modelstringtest)
-            pass
+    onx = _keras_model_to_onnx(model)
 
-    if any([resultonnx==0, resultonnx2==0]):
-      pass
+    if _check_dynamic_batch(onx):
+        batch_axis = 'dynamic'
     else:
-      return print("Model conversion to onnx unsuccessful.  Please try different model or submit\npredictions to leaderboard without submitting preprocessor or model files.")
-
-    onx = onnx.load(output_path)
+        batch_axis = 'static'
+        warnings.warn("Converted model only runs with the batch size it was exported with.")
 
 
     # generate metadata dict 
@@ -648,7 +900,9 @@ def _keras_to_onnx(model, transfer_learning=None,
     metadata['model_config'] = str(model.get_config())
 
     # get model weights from keras object 
-    model_size = asizeof.asizeof(model.get_weights())
+    import psutil
+
+    model_size, memory_size_method = estimate_memory_size(model)
     mem = psutil.virtual_memory()
 
     if model_size > mem.available: 
@@ -656,13 +910,17 @@ def _keras_to_onnx(model, transfer_learning=None,
         warnings.warn(f"Model size ({model_size/1e6} MB) exceeds available memory ({mem.available/1e6} MB). Skipping extraction of model weights.")
 
         metadata['model_weights'] = None
+        metadata['weights_artifact'] = None
 
     else: 
         
-        metadata['model_weights'] = pickle.dumps(model.get_weights())
+        metadata['model_weights'], metadata['weights_artifact'] = _store_weights(
+            pickle.dumps(model.get_weights()), 'keras_weights')
 
     # get model state from pytorch model object
     metadata['model_state'] = None
+
+    metadata['batch_axis'] = batch_axis
     
     # get list of current layer types 
     layer_list, activation_list = _get_layer_names()
@@ -674,21 +932,19 @@ def _keras_to_onnx(model, transfer_learning=None,
     activations = []
 
 
-    keras_layers = keras_unpack(model)
-
-    for i in keras_layers: 
+    for i in _describe_model(model).layers: 
         
         # get layer names 
-        if i.__class__.__name__ in layer_list:
-            layers.append(i.__class__.__name__)
-            layers_n_params.append(i.count_params())
-            layers_shapes.append(i.output_shape)
+        if i.layer in layer_list:
+            layers.append(i.layer)
+            layers_n_params.append(i.params)
+            layers_shapes.append(i.shape)
         
         # get activation names
-        if i.__class__.__name__ in activation_list: 
-            activations.append(i.__class__.__name__.lower())
-        if hasattr(i, 'activation') and i.activation.__name__ in activation_list:
-            activations.append(i.activation.__name__)
+        if i.layer in activation_list: 
+            activations.append(i.layer.lower())
+        if i.activation in activation_list:
+            activations.append(i.activation)
 
     if hasattr(model, 'loss'):
         loss = model.loss.__class__.__name__
@@ -714,12 +970,13 @@ def _keras_to_onnx(model, transfer_learning=None,
                           'optimizer': optimizer
                          }
 
-    metadata['model_architecture'] = str(model_architecture)
+    metadata['model_architecture'] = model_architecture
 
 
     metadata['model_summary'] = model_summary_pd.to_json()
 
     metadata['memory_size'] = model_size
+    metadata['memory_size_method'] = memory_size_method
 
     metadata['epochs'] = epochs
 
@@ -737,7 +994,166 @@ def _keras_to_onnx(model, transfer_learning=None,
     
     meta = onx.metadata_props.add()
     meta.key = 'model_metadata'
-    meta.value = str(metadata)
+    meta.value = _dump_metadata(metadata)
+
+    return onx
+
+
+def _store_weights(data, weights_format):
+    '''Stores native model weights in the local content addressed artifact 
+    store and returns (model_weights, weights_artifact) for the model metadata.
+
+    Weights that cannot be stored are embedded in the metadata instead, so 
+    they are never dropped.'''
+
+    key = hashlib.sha256(data).hexdigest()
+
+    if not get_artifact_store().put(key, data):
+        warnings.warn("Model weights (" + str(round(len(data)/1e6)) + " MB) could not be stored in the "
+                      "artifact store, they are embedded in the ONNX file instead. Increase "
+                      "AIMODELSHARE_ARTIFACT_MAX_SIZE to keep them out of the ONNX file.")
+        return data, None
+
+    return None, {'sha256': key, 'format': weights_format, 'size': len(data)}
+
+
+def _weights_available(onx):
+    '''Returns whether the weights artifact referenced by an ONNX object is stored locally.'''
+
+    for prop in onx.metadata_props:
+        if prop.key == 'model_metadata':
+            weights_artifact = _load_metadata(prop.value).get('weights_artifact')
+            return weights_artifact is None or get_artifact_store().path(weights_artifact['sha256']) is not None
+
+    return True
+
+
+def _local_weights_artifact(weights_artifact):
+    '''Returns local path of the weights artifact of a model that is about to be uploaded.
+
+    Raises ValueError when it is not in the local artifact store, e.g. for
+    models converted on another machine, as they would be uploaded untrained.'''
+
+    path = get_artifact_store().path(weights_artifact['sha256'])
+
+    if path is None:
+        raise ValueError("Model weights are not in the local artifact store, the model would be uploaded "
+                         "untrained. Pass the model object or convert it again with model_to_onnx.")
+
+    return path
+
+
+def _weights_artifact_path(weights_artifact, url, temp_dir):
+    '''Returns local path of a weights artifact, from the local store or 
+    downloaded from url into temp_dir and verified against its hash.'''
+
+    path = get_artifact_store().path(weights_artifact['sha256'])
+
+    if path is not None:
+        return path
+
+    path = os.path.join(temp_dir, weights_artifact['sha256'] + '.weights')
+    http_session.download_file(url, out=path)
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(8 * 1024**2), b''):
+            digest.update(chunk)
+
+    if digest.hexdigest() != weights_artifact['sha256']:
+        raise ValueError("Downloaded model weights do not match the submitted model.")
+
+    return path
+
+
+# safetensors dtype codes of torch tensor dtypes
+_TORCH_STATE_DTYPES = {'float64': 'F64', 'float32': 'F32', 'float16': 'F16', 'bfloat16': 'BF16',
+                       'int64': 'I64', 'int32': 'I32', 'int16': 'I16', 'int8': 'I8',
+                       'uint8': 'U8', 'bool': 'BOOL'}
+
+
+def save_torch_state(model, filepath):
+    '''Writes state dict of pytorch model to filepath in safetensors format: 
+    8 byte header length, json header with dtype, shape and offsets of every 
+    tensor, followed by the raw tensor bytes.'''
+
+    torch = _import_framework('torch')
+
+    tensors = []
+    header = {'__metadata__': {'format': 'pt'}}
+    offset = 0
+
+    for name, tensor in model.state_dict().items():
+        tensor = tensor.detach().cpu().contiguous()
+        dtype = str(tensor.dtype).replace('torch.', '')
+        n_bytes = tensor.numel() * tensor.element_size()
+        header[name] = {'dtype': _TORCH_STATE_DTYPES[dtype],
+                        'shape': list(tensor.shape),
+                        'data_offsets': [offset, offset + n_bytes]}
+        tensors.append(tensor)
+        offset += n_bytes
+
+    header = json.dumps(header, separators=(',', ':')).encode()
+    # pad header so tensor data starts 8 byte aligned
+    header += b' ' * (-len(header) % 8)
+
+    with open(filepath, 'wb') as f:
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        for tensor in tensors:
+            if tensor.numel():
+                # raw bytes view, numpy has no bfloat16
+                f.write(memoryview(tensor.reshape(-1).view(torch.uint8).numpy()))
+
+    return filepath
+
+
+def load_torch_state(filepath):
+    '''Loads state dict written by save_torch_state. Tensors are views into a 
+    copy-on-write memory map of the file, so no tensor data is copied.'''
+
+    import mmap
+    from collections import OrderedDict
+
+    torch = _import_framework('torch')
+    torch_dtypes = {code: getattr(torch, dtype) for dtype, code in _TORCH_STATE_DTYPES.items()}
+
+    with open(filepath, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    header_size = int.from_bytes(buffer[:8], 'little')
+    header = json.loads(buffer[8:8 + header_size].decode())
+    data_start = 8 + header_size
+
+    state_dict = OrderedDict()
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        begin, end = info['data_offsets']
+        dtype = torch_dtypes[info['dtype']]
+        if end > begin:
+            tensor = torch.frombuffer(buffer, dtype=dtype, offset=data_start + begin,
+                                      count=(end - begin) // torch.empty((), dtype=dtype).element_size())
+        else:
+            tensor = torch.empty(0, dtype=dtype)
+        state_dict[name] = tensor.reshape(info['shape'])
+
+    return state_dict
+
+
+def _export_torch_model(model, model_input, **kwargs):
+    '''Exports pytorch model to a private temp dir and loads it, torch writes 
+    initializers of models over 2GB to external data files next to the model.'''
+
+    export = _import_framework('torch.onnx').export
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        temp_path = os.path.join(temp_dir, 'model.onnx')
+        export(model, model_input, temp_path, **kwargs)
+        onx = onnx.load(temp_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
     return onx
 
@@ -751,16 +1167,47 @@ def _pytorch_to_onnx(model, model_input, transfer_learning=None,
     # TODO check whether this is a fitted pytorch model
     # isinstance...
 
-    # generate tempfile for onnx object 
-    temp_dir = tempfile.gettempdir()
-    temp_path = os.path.join(temp_dir, 'temp_file_name')
+    torch = _import_framework('torch')
+    import pandas as pd
+
+    if isinstance(model_input, tuple):
+        model_inputs = model_input
+    else:
+        model_inputs = (model_input,)
 
-    # generate onnx file and save it to temporary path
-    export(model, model_input, temp_path)
+    # probe runs in eval mode like the export, so batchnorm statistics and dropout are left untouched
+    training = model.training
+    model.eval()
+    try:
+        with torch.no_grad():
+            model_output = model(*model_inputs)
+    finally:
+        model.train(training)
+    output_count = len(model_output) if isinstance(model_output, (tuple, list)) else 1
+
+    input_names = ['input'] if len(model_inputs) == 1 else ['input_' + str(i) for i in range(len(model_inputs))]
+    output_names = ['output'] if output_count == 1 else ['output_' + str(i) for i in range(output_count)]
+
+    # symbolic batch axis everywhere, symbolic sequence axis for token id inputs
+    dynamic_axes = {}
+    for name, x in zip(input_names, model_inputs):
+        dynamic_axes[name] = {0: 'batch'}
+        if not torch.is_floating_point(x) and x.dim() >= 2:
+            dynamic_axes[name][1] = 'sequence'
+    for name in output_names:
+        dynamic_axes[name] = {0: 'batch'}
+
+    onx = _export_torch_model(model, model_input, input_names=input_names, 
+                              output_names=output_names, dynamic_axes=dynamic_axes)
         #operator_export_type=torch.onnx.OperatorExportTypes.ONNX_ATEN_FALLBACK)
 
-    # load onnx file from temporary path
-    onx = onnx.load(temp_path)
+    # models that hardcode the batch size, e.g. in reshapes, are exported with fixed shapes
+    batch_axis = 'dynamic'
+    if not _check_dynamic_batch(onx, [x.detach().cpu().numpy() for x in model_inputs]):
+        batch_axis = 'static'
+        warnings.warn("Model does not run with a dynamic batch size, exporting with fixed input shapes.")
+
+        onx = _export_torch_model(model, model_input)
 
     # generate metadata dict 
     metadata = {}
@@ -795,8 +1242,17 @@ def _pytorch_to_onnx(model, model_input, transfer_learning=None,
     # get model config dict from pytorch model object
     metadata['model_config'] = str(model.__dict__)
 
-    # get model state from pytorch model object
-    metadata['model_state'] = str(model.state_dict())
+    # get model state from pytorch model object, stored next to the onnx file
+    metadata['model_state'] = None
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        with open(save_torch_state(model, os.path.join(temp_dir, 'model_state.safetensors')), 'rb') as f:
+            metadata['model_weights'], metadata['weights_artifact'] = _store_weights(f.read(), 'safetensors')
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    metadata['batch_axis'] = batch_axis
 
 
     name_list, layer_list, param_list, weight_list, activation_list = torch_metadata(model)
@@ -818,12 +1274,12 @@ def _pytorch_to_onnx(model, model_input, transfer_learning=None,
                   'loss': None,
                   'optimizer': None}
 
-    metadata['model_architecture'] = str(model_architecture)
+    metadata['model_architecture'] = model_architecture
 
     metadata['model_summary'] = model_summary_pd.to_json()
 
 
-    metadata['memory_size'] = asizeof.asizeof(model)    
+    metadata['memory_size'], metadata['memory_size_method'] = estimate_memory_size(model)
     metadata['epochs'] = epochs
 
     # placeholder, needs evaluation engine
@@ -836,15 +1292,467 @@ def _pytorch_to_onnx(model, model_input, transfer_learning=None,
     # add metadata dict to onnx object
     meta = onx.metadata_props.add()
     meta.key = 'model_metadata'
-    meta.value = str(metadata)
+    meta.value = _dump_metadata(metadata)
     
 
     return onx
 
 
+@functools.lru_cache(maxsize=None)
+def _validation_session_options():
+    '''Returns onnxruntime session options for validating converted models.
+    Graph optimizations are skipped since the session is discarded right away.'''
+
+    rt = _import_framework('onnxruntime')
+
+    sess_options = rt.SessionOptions()
+    sess_options.graph_optimization_level = rt.GraphOptimizationLevel.ORT_DISABLE_ALL
+
+    return sess_options
+
+
+# version 1 is the legacy str(dict) format read with ast.literal_eval
+METADATA_SCHEMA_VERSION = 2
+
+# expected types of model metadata fields, other fields are free form
+_METADATA_SCHEMA = {'schema_version': int,
+                    'ml_framework': str,
+                    'model_type': str,
+                    'model_config': (str, type(None)),
+                    'model_architecture': (dict, type(None)),
+                    'metadata_onnx': (dict, type(None)),
+                    'weights_artifact': (dict, type(None))}
+
+
+def _metadata_default(obj):
+    '''Encodes numpy values and bytes that json cannot serialize.'''
+
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(obj).decode('ascii')}
+
+    return str(obj)
+
+
+def _metadata_object_hook(obj):
+
+    if len(obj) == 1 and '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+
+    return obj
+
+
+def _validate_metadata(metadata):
+    '''Raises ValueError if model metadata does not match the schema.'''
+
+    for key in ['ml_framework', 'model_type']:
+        if key not in metadata:
+            raise ValueError("Model metadata is missing required field '" + key + "'.")
+
+    for key, types in _METADATA_SCHEMA.items():
+        if key in metadata and not isinstance(metadata[key], types):
+            raise ValueError("Model metadata field '" + key + "' has invalid type " 
+                             + type(metadata[key]).__name__ + ".")
+
+
+def _dump_metadata(metadata):
+    '''Serializes model metadata dict to a versioned json string.'''
+
+    metadata = dict(metadata, schema_version=METADATA_SCHEMA_VERSION)
+    _validate_metadata(metadata)
+
+    return json.dumps(metadata, default=_metadata_default)
+
+
+def _load_metadata(value):
+    '''Parses model metadata string written by _dump_metadata, or by earlier 
+    versions as python literal.'''
+
+    try:
+        metadata = json.loads(value, object_hook=_metadata_object_hook)
+    except ValueError:
+        metadata = ast.literal_eval(value)
+        metadata['schema_version'] = 1
+
+        for key in ['model_architecture', 'metadata_onnx']:
+            if isinstance(metadata.get(key), str):
+                metadata[key] = ast.literal_eval(metadata[key])
+
+    if metadata.get('schema_version', 1) > METADATA_SCHEMA_VERSION:
+        warnings.warn("Model metadata was written by a newer version of aimodelshare, please upgrade.")
+
+    _validate_metadata(metadata)
+
+    return metadata
+
+
+def _update_model_metadata(onx, **updates):
+    '''Adds updates to model metadata dict saved in ONNX object.'''
+
+    for prop in onx.metadata_props:
+        if prop.key == 'model_metadata':
+            metadata = _load_metadata(prop.value)
+            metadata.update(updates)
+            prop.value = _dump_metadata(metadata)
+
+
+def _copy_metadata_props(source, target, **updates):
+    '''Copies metadata props of source to rewritten ONNX object target and 
+    adds updates to its model metadata dict.'''
+
+    del target.metadata_props[:]
+    for prop in source.metadata_props:
+        meta = target.metadata_props.add()
+        meta.key = prop.key
+        meta.value = prop.value
+
+    _update_model_metadata(target, **updates)
+
+
+def _ort_session_options(optimization_level):
+    '''Returns onnxruntime session options for an optimization level name.'''
+
+    rt = _import_framework('onnxruntime')
+
+    levels = {'basic': rt.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+              'extended': rt.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+              'all': rt.GraphOptimizationLevel.ORT_ENABLE_ALL}
+
+    assert optimization_level in levels, \
+    'Please choose "basic", "extended" or "all" as optimization level.'
+
+    sess_options = rt.SessionOptions()
+    sess_options.graph_optimization_level = levels[optimization_level]
+
+    return sess_options
+
+
+def _save_optimized_model(onx, sess_options, file_name, load=None):
+    '''Lets onnxruntime write its optimized graph to a private temp dir and 
+    returns the file bytes, or the result of load(file path) if passed.'''
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        sess_options.optimized_model_filepath = os.path.join(temp_dir, file_name)
+        _inference_session(onx, sess_options=sess_options, providers=['CPUExecutionProvider'])
+
+        if load is not None:
+            return load(sess_options.optimized_model_filepath)
+
+        with open(sess_options.optimized_model_filepath, 'rb') as f:
+            model_bytes = f.read()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return model_bytes
+
+
+def optimize_onnx(onx, optimization_level='extended'):
+
+    '''Applies onnxruntime's graph optimizations (constant folding, node fusion,
+    redundant node elimination) offline, so they are not repeated at every 
+    prediction runtime cold start. The chosen level is recorded in the 
+    model metadata as 'onnx_optimization_level'.
+
+    Parameters:
+    onx: ONNX model object
+
+    optimization_level: {"basic", "extended", "all"}, default="extended"
+    "extended" adds onnxruntime specific fused operators for the cpu,
+    "all" also applies layout changes specific to the cpu the optimization runs on.
+
+    Returns:
+    optimized ONNX object with the metadata props of onx
+    '''
+
+    sess_options = _ort_session_options(optimization_level)
+    if _needs_external_data(onx):
+        sess_options.add_session_config_entry('session.optimized_model_external_initializers_file_name', 
+                                              EXTERNAL_DATA_LOCATION)
+
+    optimized = _save_optimized_model(onx, sess_options, 'optimized_model.onnx', load=onnx.load)
+
+    # keep metadata of original model and record optimization level
+    _copy_metadata_props(onx, optimized, onnx_optimization_level=optimization_level)
+
+    return optimized
+
+
+def onnx_to_ort(onx, optimization_level=None):
+
+    '''Converts ONNX model object to onnxruntime's ORT format, which prediction 
+    runtimes load without parsing or optimizing the graph again.
+
+    Parameters:
+    onx: ONNX model object
+
+    optimization_level: {"basic", "extended", "all"}, default=None
+    Defaults to the level recorded by optimize_onnx, "basic" for models
+    that were not optimized.
+
+    Returns:
+    ORT format model as bytes
+    '''
+
+    if optimization_level is None:
+        try:
+            optimization_level = _get_metadata(onx).get('onnx_optimization_level')
+        except Exception:
+            pass
+
+    if optimization_level is None:
+        optimization_level = 'basic'
+
+    if _needs_external_data(onx):
+        raise ModelConversionError("ORT format does not support models larger than 2GB.")
+
+    sess_options = _ort_session_options(optimization_level)
+    sess_options.add_session_config_entry('session.save_model_format', 'ORT')
+
+    return _save_optimized_model(onx, sess_options, 'model.ort')
+
+
+def _example_array(example_data):
+    '''Returns example model input as numpy array.'''
+
+    if hasattr(example_data, 'detach'):
+        example_data = example_data.detach().cpu().numpy()
+
+    return np.asarray(example_data)
+
+
+def _run_onnx(onx, example_data):
+    '''Returns first output of onx for example data.'''
+
+    sess = _inference_session(onx, providers=['CPUExecutionProvider'])
+    model_input = sess.get_inputs()[0]
+
+    X = _example_array(example_data)
+    if model_input.type == 'tensor(float)':
+        X = X.astype(np.float32)
+
+    return sess.run([sess.get_outputs()[0].name], {model_input.name: X})[0]
+
+
+def _output_divergence(float_output, quantized_output):
+    '''Returns max absolute error relative to the output range for numeric outputs,
+    share of changed predictions for labels.'''
+
+    float_output = np.asarray(float_output)
+    quantized_output = np.asarray(quantized_output)
+
+    if float_output.dtype.kind in 'fc':
+        scale = np.abs(float_output).max()
+        if scale == 0:
+            scale = 1.0
+        return float(np.abs(float_output - quantized_output).max() / scale)
+
+    return float(np.mean(float_output != quantized_output))
+
+
+def quantize_onnx(onx, example_data, quantization='dynamic', tolerance=0.01):
+
+    '''Quantizes model weights to int8 with onnxruntime's quantization tools and 
+    checks the quantized model against the float model on example data.
+
+    Parameters:
+    onx: ONNX model object
+
+    example_data: array_like
+    Preprocessed example of X data in the format the model expects.
+    Also used for calibration in static mode.
+
+    quantization: {"dynamic", "static"}, default="dynamic"
+    "dynamic" quantizes weights ahead of time and activations on the fly,
+    "static" also quantizes activations with ranges calibrated on example_data.
+
+    tolerance: float, default=0.01
+    Maximum accepted divergence between float and quantized outputs, measured 
+    as max absolute error relative to the output range (share of changed 
+    predictions for models that output labels).
+
+    Returns:
+    quantized ONNX object, raises QuantizationAccuracyError if divergence exceeds tolerance
+    '''
+
+    assert quantization in ['dynamic', 'static'], \
+    'Please choose "dynamic" or "static" quantization.'
+
+    quantization_tools = _import_framework('onnxruntime.quantization')
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        float_path = os.path.join(temp_dir, 'float_model.onnx')
+        quantized_path = os.path.join(temp_dir, 'quantized_model.onnx')
+        save_onnx(onx, float_path)
+
+        if quantization == 'dynamic':
+            quantization_tools.quantize_dynamic(float_path, quantized_path, 
+                                                weight_type=quantization_tools.QuantType.QInt8,
+                                                use_external_data_format=_needs_external_data(onx))
+        else:
+            input_name = _inference_session(onx, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+            class ExampleDataReader(quantization_tools.CalibrationDataReader):
+                def __init__(self):
+                    self.batches = iter([{input_name: _example_array(example_data).astype(np.float32)}])
+
+                def get_next(self):
+                    return next(self.batches, None)
+
+            quantization_tools.quantize_static(float_path, quantized_path, ExampleDataReader(),
+                                               weight_type=quantization_tools.QuantType.QInt8,
+                                               use_external_data_format=_needs_external_data(onx))
+
+        quantized = onnx.load(quantized_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    divergence = _output_divergence(_run_onnx(onx, example_data), _run_onnx(quantized, example_data))
+
+    if divergence > tolerance:
+        raise QuantizationAccuracyError("Quantized model output diverges from float model by " 
+                                        + str(round(divergence, 4)) + ", which exceeds tolerance of " 
+                                        + str(tolerance) + ". Please submit the float model or raise the tolerance.")
+
+    _copy_metadata_props(onx, quantized, quantization={'mode': quantization, 
+                                                       'weight_type': 'int8', 
+                                                       'divergence': divergence, 
+                                                       'tolerance': tolerance})
+
+    return quantized
+
+
+INFERENCE_PROFILE_COLUMNS = ['latency_p50_ms', 'latency_p99_ms', 'rows_per_sec', 'peak_memory_mb']
+
+
+def profile_onnx(onx, example_data=None, batch_sizes=(1, 64), repeats=20):
+
+    '''Benchmarks ONNX model in onnxruntime on the cpu.
+
+    Parameters:
+    onx: ONNX model object
+
+    example_data: array_like, default=None
+    Preprocessed example of X data, rows are repeated to fill each batch.
+    Zero filled inputs of the model's input shape are used if None.
+
+    batch_sizes: tuple of int, default=(1, 64)
+    Batch sizes to benchmark. Models with a fixed batch size are only run at their own.
+
+    repeats: int, default=20
+    Timed runs per batch size, after one warmup run.
+
+    Returns:
+    dict with per batch size latency percentiles and throughput, and summary values:
+    latency_p50_ms and latency_p99_ms at the smallest batch size, rows_per_sec at 
+    the largest batch size and peak_memory_mb, the resident memory added by the session.
+    '''
+
+    import psutil
+
+    rt = _import_framework('onnxruntime')
+    process = psutil.Process(os.getpid())
+
+    if isinstance(example_data, tuple):
+        example_data = [_example_array(i) for i in example_data]
+    elif example_data is not None:
+        example_data = [_example_array(example_data)]
+
+    baseline_memory = process.memory_info().rss
+    peak_memory = baseline_memory
+
+    sess = _inference_session(onx, providers=['CPUExecutionProvider'])
+    output_names = [sess.get_outputs()[0].name]
+
+    # fixed batch dimension of model input limits the batch sizes to benchmark
+    batch_dim = sess.get_inputs()[0].shape[0] if sess.get_inputs()[0].shape else None
+    if isinstance(batch_dim, int):
+        batch_sizes = [batch_dim]
+
+    batches = {}
+    for n in batch_sizes:
+        feeds = _batch_feeds(sess, n, example_data)
+        sess.run(output_names, feeds)
+
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            sess.run(output_names, feeds)
+            latencies.append(time.perf_counter() - start)
+        peak_memory = max(peak_memory, process.memory_info().rss)
+
+        p50 = float(np.percentile(latencies, 50))
+        batches[n] = {'latency_p50_ms': round(p50 * 1000, 4),
+                      'latency_p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 4),
+                      'rows_per_sec': round(n / p50, 2) if p50 > 0 else None}
+
+    profile = {'batch_sizes': batches,
+               'latency_p50_ms': batches[min(batches)]['latency_p50_ms'],
+               'latency_p99_ms': batches[min(batches)]['latency_p99_ms'],
+               'rows_per_sec': batches[max(batches)]['rows_per_sec'],
+               'peak_memory_mb': round((peak_memory - baseline_memory) / 1024**2, 2)}
+
+    return profile
+
+
+def _convert_to_onnx(model, framework, model_input=None, initial_types=None,
+                     transfer_learning=None, deep_learning=None, task_type=None, 
+                     epochs=None, spark_session=None, optimization_level=None, zipmap=True):
+    '''Dispatches model to its framework converter and validates the result.'''
+
+    if framework == 'sklearn':
+        onx = _sklearn_to_onnx(model, initial_types=initial_types, 
+                                transfer_learning=transfer_learning, 
+                                deep_learning=deep_learning, 
+                                task_type=task_type,
+                                zipmap=zipmap)
+    elif framework == 'xgboost':
+        onx = _misc_to_onnx(model, initial_types=initial_types, 
+                                transfer_learning=transfer_learning, 
+                                deep_learning=deep_learning, 
+                                task_type=task_type)
+        
+    elif framework == 'keras':
+        onx = _keras_to_onnx(model, transfer_learning=transfer_learning, 
+                              deep_learning=deep_learning, 
+                              task_type=task_type,
+                              epochs=epochs)
+
+        
+    elif framework == 'pytorch':
+
+        onx = _pytorch_to_onnx(model, model_input=model_input,
+                                transfer_learning=transfer_learning, 
+                                deep_learning=deep_learning, 
+                                task_type=task_type,
+                                epochs=epochs)
+
+    elif framework == 'pyspark':
+        onx = _pyspark_to_onnx(model, initial_types=initial_types, 
+                                transfer_learning=transfer_learning, 
+                                deep_learning=deep_learning, 
+                                task_type=task_type,
+                                spark_session=spark_session)
+
+    if optimization_level is not None:
+        onx = optimize_onnx(onx, optimization_level)
+
+    try: 
+        _inference_session(onx, sess_options=_validation_session_options())
+    except Exception as e: 
+        print(e)
+
+    return onx
+
+
 def model_to_onnx(model, framework=None, model_input=None, initial_types=None,
                   transfer_learning=None, deep_learning=None, task_type=None, 
-                  epochs=None, spark_session=None):
+                  epochs=None, spark_session=None, use_cache=True, optimization_level=None,
+                  quantization=None, quantization_tolerance=0.01, zipmap=True, profile=False):
     
     '''Transforms sklearn, keras, or pytorch model object into ONNX format 
     and extracts model metadata dictionary. The model metadata dictionary 
@@ -871,6 +1779,32 @@ def model_to_onnx(model, framework=None, model_input=None, initial_types=None,
     task_type: {"classification", "regression"}
     Indicates whether the model is a classification model or
     a regression model.
+
+    use_cache: bool, default=True
+    Reuses the ONNX file of a previous conversion of an identical model 
+    (same weights, hyperparameters, framework version and options).
+
+    optimization_level: {"basic", "extended", "all"}, default=None
+    Applies onnxruntime graph optimizations offline, see optimize_onnx.
+    Models are stored unoptimized if None.
+
+    quantization: {"dynamic", "static"}, default=None
+    Quantizes model weights to int8, see quantize_onnx. Requires model_input
+    to compare the quantized model against the float model.
+
+    quantization_tolerance: float, default=0.01
+    Maximum output divergence accepted for the quantized model.
+
+    zipmap: bool, default=True
+    Only used for sklearn classifiers. If False, class probabilities are 
+    returned as a float tensor of shape (n_rows, n_classes) instead of a 
+    list of {class: probability} dicts, which is much faster for large batches.
+
+    profile: bool, default=False
+    Benchmarks latency, throughput and memory of the converted model in 
+    onnxruntime, see profile_onnx. Results are shown on the leaderboard.
+    The profile is cached with the model, cache hits are not benchmarked
+    again.
     
     Returns:
     ONNX object with model metadata saved in metadata props
@@ -879,12 +1813,8 @@ def model_to_onnx(model, framework=None, model_input=None, initial_types=None,
     # if no framework was passed, extract framework 
     if model and framework==None:
         framework = model.__module__.split(".")[0]
-        try:
-            import torch
-            if isinstance(model, torch.nn.Module):
-                framework = "pytorch"
-        except:
-            pass
+        if _is_torch_model(model):
+            framework = "pytorch"
 
     # assert that framework exists
     frameworks = ['sklearn', 'keras', 'pytorch', 'xgboost', 'pyspark']
@@ -898,7 +1828,8 @@ def model_to_onnx(model, framework=None, model_input=None, initial_types=None,
     
     # assert initialtypes 
     if initial_types != None:
-        assert isinstance(initial_types[0][1], (skl2onnx.common.data_types.FloatTensorType)), \
+        FloatTensorType = _import_framework('skl2onnx.common.data_types').FloatTensorType
+        assert isinstance(initial_types[0][1], (FloatTensorType)), \
         'Please use FloatTensorType as initial types.'
         
     # assert transfer_learning
@@ -915,123 +1846,191 @@ def model_to_onnx(model, framework=None, model_input=None, initial_types=None,
     if task_type != None:
         assert task_type in ['classification', 'regression'], \
         'Please specify task type as "classification" or "regression".'
-    
 
-    if framework == 'sklearn':
-        onnx = _sklearn_to_onnx(model, initial_types=initial_types, 
-                                transfer_learning=transfer_learning, 
-                                deep_learning=deep_learning, 
-                                task_type=task_type)
-    elif framework == 'xgboost':
-        onnx = _misc_to_onnx(model, initial_types=initial_types, 
-                                transfer_learning=transfer_learning, 
-                                deep_learning=deep_learning, 
-                                task_type=task_type)
-        
-    elif framework == 'keras':
-        onnx = _keras_to_onnx(model, transfer_learning=transfer_learning, 
-                              deep_learning=deep_learning, 
-                              task_type=task_type,
-                              epochs=epochs)
+    # return previous conversion of identical model if available
+    cache_key = None
+    if use_cache:
+        conversion_options = {'initial_types': initial_types,
+                              'model_input': (getattr(model_input, 'shape', None), 
+                                              getattr(model_input, 'dtype', None)),
+                              'transfer_learning': transfer_learning,
+                              'deep_learning': deep_learning,
+                              'task_type': task_type,
+                              'epochs': epochs,
+                              'optimization_level': optimization_level,
+                              'zipmap': zipmap}
+        cache_key = model_fingerprint(model, framework, conversion_options)
+
+    onx = None
+    if cache_key is not None:
+        onnx_bytes = get_conversion_cache().get(cache_key)
+        if onnx_bytes is not None:
+            onx = onnx.load_from_string(onnx_bytes)
+
+        # converted models whose weights artifact was evicted are converted again
+        if onx is not None and not _weights_available(onx):
+            onx = None
+
+    cache_outdated = onx is None
+    if onx is None:
+        onx = _convert_to_onnx(model, framework, model_input=model_input, 
+                               initial_types=initial_types, 
+                               transfer_learning=transfer_learning, 
+                               deep_learning=deep_learning, 
+                               task_type=task_type, epochs=epochs, 
+                               spark_session=spark_session, 
+                               optimization_level=optimization_level,
+                               zipmap=zipmap)
+
+    # the float model is profiled once and cached with its profile, cache hits skip the benchmark
+    if profile and quantization is None and not _has_inference_profile(onx):
+        cache_outdated = _profile_model(onx, model_input) or cache_outdated
+
+    if cache_outdated and cache_key is not None and not _needs_external_data(onx):
+        get_conversion_cache().put(cache_key, onx.SerializeToString())
+
+    # quantized models depend on the example data, so only the float model is cached
+    if quantization is not None:
+        assert model_input is not None, \
+        'Please pass example data as model_input to validate the quantized model.'
+        onx = quantize_onnx(onx, model_input, quantization=quantization, 
+                            tolerance=quantization_tolerance)
+
+        if profile:
+            _profile_model(onx, model_input)
 
-        
-    elif framework == 'pytorch':
+    return onx
 
-        onnx = _pytorch_to_onnx(model, model_input=model_input,
-                                transfer_learning=transfer_learning, 
-                                deep_learning=deep_learning, 
-                                task_type=task_type,
-                                epochs=epochs)
 
-    elif framework == 'pyspark':
-        try:
-            import pyspark
-            from pyspark.sql import SparkSession
-            from pyspark.ml import PipelineModel, Model
-            from pyspark.ml.tuning import CrossValidatorModel, TrainValidationSplitModel
-            from onnxmltools import convert_sparkml
-        except:
-            print("Warning: Please install pyspark to enable pyspark features")
-        onnx = _pyspark_to_onnx(model, initial_types=initial_types, 
-                                transfer_learning=transfer_learning, 
-                                deep_learning=deep_learning, 
-                                task_type=task_type,
-                                spark_session=spark_session)
+def _has_inference_profile(onx):
+    '''Returns whether model metadata of ONNX object holds an inference profile.'''
 
-    try: 
-        rt.InferenceSession(onnx.SerializeToString())   
-    except Exception as e: 
-        print(e)
+    for prop in onx.metadata_props:
+        if prop.key == 'model_metadata':
+            return bool(_load_metadata(prop.value).get('inference_profile'))
+
+    return False
+
+
+def _profile_model(onx, model_input):
+    '''Benchmarks ONNX object on this machine and saves the profile in its metadata.'''
 
-    return onnx
+    try:
+        _update_model_metadata(onx, inference_profile=profile_onnx(onx, model_input))
+        return True
+    except Exception as e:
+        print("Model profiling unsuccessful: " + str(e))
+        return False
 
 
 
-def model_to_onnx_timed(model_filepath, force_onnx=False, timeout=60, model_input=None): 
+def model_to_onnx_timed(model_filepath, force_onnx=False, timeout=60, model_input=None, max_memory=None,
+                        profile=False):
+    '''Converts model to ONNX in a separate worker process that is killed once
+    conversion exceeds timeout seconds or max_memory bytes. Falls back to
+    submitting predictions only (returns None) when conversion is interrupted.
+    profile is passed on to model_to_onnx.'''
 
     if not (model_filepath == None or isinstance(model_filepath, str) or isinstance(model_filepath, onnx.ModelProto)): 
 
+        if _is_torch_model(model_filepath):
+            kwargs = {'model_input': model_input, 'profile': profile}
+        else:
+            kwargs = {'profile': profile}
+
         if force_onnx:
-            try:
-                import torch
-                if isinstance(model_filepath, torch.nn.Module):
-                    onnx_model = model_to_onnx(model_filepath, model_input=model_input)
-            except:
-                onnx_model = model_to_onnx(model_filepath)
-            model_filepath = onnx_model
+            model_filepath = model_to_onnx(model_filepath, **kwargs)
 
         else:
+            executor = get_conversion_executor()
+
+            try:
+                model_filepath = executor.convert(model_filepath, timeout=timeout, max_memory=max_memory,
+                                                  **kwargs)
+
+            except (ConversionTimeoutError, ConversionMemoryError, ConversionCancelledError) as err:
+                print(str(err) + " This can be the case for big models.")
+                print("Submitting predictions only. Set onnx_timeout=False to force ONNX conversion.")
+                print()
+                model_filepath = None
+
+    return model_filepath
+
+ConversionResult = namedtuple('ConversionResult', ['onnx_model', 'error', 'seconds'])
+
+
+def _model_to_onnx_bytes(model, kwargs):
+    '''Converts single model for model_to_onnx_many and never raises.'''
+
+    start = time.time()
+
+    try:
+        onx = model_to_onnx(model, **kwargs)
+        return _dump_for_transfer(onx), None, time.time() - start
+    except Exception as err:
+        return None, repr(err), time.time() - start
+
+
+def model_to_onnx_many(models, framework=None, n_jobs=None, backend='thread', **kwargs):
 
+    '''Converts a collection of fitted models, e.g. the candidates of a 
+    hyperparameter search, to ONNX on a pool of workers.
 
-            try: # try needed because signal.alarm not available on windows
-                # interrupt if onnx conversion is taking too long
-                def timeout_handler(num, stack):
-                    raise Exception("timeout")
+    Per-framework setup (framework imports, onnx ir_version lookup, layer 
+    names, onnxruntime session options) is done once per worker and reused 
+    for all models it converts. A failing model does not stop the batch.
 
-                signal.alarm(timeout)
-            except:
-                pass
+    Parameters:
+    models: iterable of fitted sklearn, keras, pytorch, xgboost or pyspark model objects
 
+    framework: {"sklearn", "keras", "pytorch", "xgboost", "pyspark"}, default=None
+    Inferred from each model object if not passed.
 
+    n_jobs: int, default=None
+    Number of workers, defaults to the number of cpus.
+
+    backend: {"thread", "process"}, default="thread"
+    "process" gives full parallelism but requires picklable models.
+
+    kwargs: passed on to model_to_onnx for every model. Passing
+    profile=True is not recommended, as benchmarks running side by side on
+    the pool are not comparable.
+
+    Returns:
+    list of ConversionResult(onnx_model, error, seconds) in the order of models,
+    onnx_model is None and error is set for models that failed to convert.
+    '''
+
+    assert backend in ['thread', 'process'], \
+    'Please choose "thread" or "process" as backend.'
+
+    models = list(models)
+    kwargs['framework'] = framework
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, len(models)))
+
+    if backend == 'process':
+        pool = ProcessPoolExecutor(max_workers=n_jobs, 
+                                   mp_context=multiprocessing.get_context('spawn'))
+    else:
+        pool = ThreadPoolExecutor(max_workers=n_jobs)
+
+    with pool:
+        futures = [pool.submit(_model_to_onnx_bytes, model, kwargs) for model in models]
+
+        results = []
+        for future in futures:
             try:
-                try:
-                    import torch
-                    if isinstance(model_filepath, torch.nn.Module):
-                        onnx_model = model_to_onnx(model_filepath, model_input=model_input)
-                    else:
-                        onnx_model = model_to_onnx(model_filepath)
-                except:
-                    onnx_model = model_to_onnx(model_filepath)
-                model_filepath = onnx_model
-
-            except:
-                print("Timeout: Model to ONNX conversion is taking longer than expected. This can be the case for big models.")
-                response = ''
-                while response not in {"1", "2"}:
-                    response = input("Do you want to keep trying (1) or submit predictions only (2)? ")
-
-                if response == "1":
-                    try:
-                        import torch
-                        if isinstance(model_filepath, torch.nn.Module):
-                            onnx_model = model_to_onnx(model_filepath, model_input=model_input)
-                        else:
-                            onnx_model = model_to_onnx(model_filepath)
-                    except:
-                        onnx_model = model_to_onnx(model_filepath)
-                    model_filepath = onnx_model
-
-                elif response == "2":
-                    model_filepath = None
-
-            finally:
-                print()
-                try: # try needed because signal.alarm not available on windows
-                    signal.alarm(0)
-                except:
-                    pass
+                onnx_bytes, error, seconds = future.result()
+            except Exception as err: # model could not be sent to worker process
+                onnx_bytes, error, seconds = None, repr(err), 0.0
 
-    return model_filepath
+            onx = _load_from_transfer(onnx_bytes) if onnx_bytes is not None else None
+            results.append(ConversionResult(onx, error, seconds))
+
+    return results
 
 def _get_metadata(onnx_model):
     '''Fetches previously extracted model metadata from ONNX object
@@ -1041,46 +2040,27 @@ def _get_metadata(onnx_model):
     #assert(isinstance(onnx_model, onnx.onnx_ml_pb2.ModelProto)), \
      #"Please pass a onnx model object."
     
-    try: 
-        onnx_meta = onnx_model.metadata_props
-
-        onnx_meta_dict = {'model_metadata': ''}
+    onnx_meta_dict = {'model_metadata': ''}
 
-        for i in onnx_meta:
-            onnx_meta_dict[i.key] = i.value
-
-        onnx_meta_dict = ast.literal_eval(onnx_meta_dict['model_metadata'])
-        
-        #if onnx_meta_dict['model_config'] != None and \
-        #onnx_meta_dict['ml_framework'] != 'pytorch':
-        #    onnx_meta_dict['model_config'] = ast.literal_eval(onnx_meta_dict['model_config'])
-        
-        if onnx_meta_dict['model_architecture'] != None:
-            onnx_meta_dict['model_architecture'] = ast.literal_eval(onnx_meta_dict['model_architecture'])
-            
-        if onnx_meta_dict['metadata_onnx'] != None:
-            onnx_meta_dict['metadata_onnx'] = ast.literal_eval(onnx_meta_dict['metadata_onnx'])
-        
-        # onnx_meta_dict['model_image'] = onnx_to_image(onnx_model)
+    for i in onnx_model.metadata_props:
+        onnx_meta_dict[i.key] = i.value
 
-    except Exception as e:
-    
-        print(e)
-        
-        onnx_meta_dict = ast.literal_eval(onnx_meta_dict)
+    # json metadata with schema version, or python literal written by earlier versions
+    onnx_meta_dict = _load_metadata(onnx_meta_dict['model_metadata'])
         
     return onnx_meta_dict
 
 
 
-def _get_leaderboard_data(onnx_model, eval_metrics=None):
+def _get_leaderboard_data(onnx_model, eval_metrics=None, meta_dict=None):
     
     if eval_metrics is not None:
         metadata = eval_metrics
     else:
         metadata = dict()
-        
-    metadata_raw = _get_metadata(onnx_model)
+
+    # metadata already parsed by the caller is reused
+    metadata_raw = meta_dict if meta_dict is not None else _get_metadata(onnx_model)
 
     # get list of current layer types 
     layer_list_keras, activation_list_keras = _get_layer_names()
@@ -1095,6 +2075,11 @@ def _get_leaderboard_data(onnx_model, eval_metrics=None):
     metadata['deep_learning'] = metadata_raw['deep_learning']
     metadata['model_type'] = metadata_raw['model_type']
 
+    # get inference cost measured at conversion
+    inference_profile = metadata_raw.get('inference_profile') or {}
+    for i in INFERENCE_PROFILE_COLUMNS:
+        metadata[i] = inference_profile.get(i)
+
 
     # get neural network metrics
     if metadata_raw['ml_framework'] in ['keras', 'pytorch'] or metadata_raw['model_type'] in ['MLPClassifier', 'MLPRegressor']:
@@ -1163,6 +2148,8 @@ def _model_summary(meta_dict, from_onnx=False):
     assert('model_architecture' in meta_dict.keys()), \
     "Please make sure model architecture data is included."
 
+    import pandas as pd
+
     if from_onnx == True:
         model_summary = pd.read_json(meta_dict['metadata_onnx']["model_summary"])
     else:
@@ -1174,6 +2161,8 @@ def _model_summary(meta_dict, from_onnx=False):
 
 def onnx_to_image(model):
     '''Creates model graph image in pydot format.'''
+
+    from onnx.tools.net_drawer import GetPydotGraph, GetOpNodeProducer
     
     OP_STYLE = {
     'shape': 'box',
@@ -1196,6 +2185,8 @@ def onnx_to_image(model):
 
 
 def inspect_model(apiurl, version=None, naming_convention = None, submission_type="competition"):
+    import pandas as pd
+
     if all(["username" in os.environ, 
            "password" in os.environ]):
         pass
@@ -1214,7 +2205,7 @@ def inspect_model(apiurl, version=None, naming_convention = None, submission_typ
 
     apiurl_eval=apiurl[:-1]+"eval"
 
-    inspect_json = requests.post(apiurl_eval,headers=headers,data=json.dumps(post_dict)) 
+    inspect_json = http_session.post(apiurl_eval,headers=headers,data=json.dumps(post_dict),idempotent=True) 
 
     inspect_pd = pd.DataFrame(json.loads(inspect_json.text))
 
@@ -1224,6 +2215,8 @@ def inspect_model(apiurl, version=None, naming_convention = None, submission_typ
 
 def color_pal_assign(val, naming_convention=None):
 
+    import pandas as pd
+
     # find path of color mapping
     path =  Path(__file__).parent
     if naming_convention == "keras":
@@ -1242,6 +2235,9 @@ def color_pal_assign(val, naming_convention=None):
 
 def stylize_model_comparison(comp_dict_out, naming_convention=None):
 
+    from pandas.io.formats.style import Styler
+    from IPython.display import display, HTML
+
     for i in comp_dict_out.keys():
 
         if i == 'nn':
@@ -1289,6 +2285,8 @@ def stylize_model_comparison(comp_dict_out, naming_convention=None):
 
 def compare_models(apiurl, version_list="None", 
     by_model_type=None, best_model=None, verbose=1, naming_convention=None, submission_type="competition"):
+    import pandas as pd
+
     if all(["username" in os.environ, 
            "password" in os.environ]):
         pass
@@ -1310,7 +2308,7 @@ def compare_models(apiurl, version_list="None",
 
     apiurl_eval=apiurl[:-1]+"eval"
 
-    compare_json = requests.post(apiurl_eval,headers=headers,data=json.dumps(post_dict)) 
+    compare_json = http_session.post(apiurl_eval,headers=headers,data=json.dumps(post_dict),idempotent=True) 
 
     compare_dict = json.loads(compare_json.text)
 
@@ -1320,31 +2318,25 @@ def compare_models(apiurl, version_list="None",
 
 
 def _get_onnx_from_string(onnx_string):
-    # generate tempfile for onnx object 
-    temp_dir = tempfile.gettempdir()
-    temp_path = os.path.join(temp_dir, 'temp_file_name')
 
-    # save onnx to temporary path
-    with open(temp_path, "wb") as f:
-        f.write(onnx_string)
-
-    # load onnx file from temporary path
-    onx = onnx.load(temp_path)
+    onx = onnx.load_from_string(onnx_string)
     return onx
 
-def _get_onnx_from_bucket(apiurl, aws_client, version=None):
+
+def _get_onnx_from_bucket(apiurl, aws_client, version=None, header_only=False):
+    '''Returns onnx model from bucket, or only its header read with ranged 
+    requests when header_only is True.'''
 
     # generate name of onnx model in bucket
     onnx_model_name = "/onnx_model_v{version}.onnx".format(version = version)
 
     # Get bucket and model_id for user
-    response, error = run_function_on_lambda(
-        apiurl, **{"delete": "FALSE", "versionupdateget": "TRUE"}
-    )
-    if error is not None:
-        raise error
+    bucket, model_id = resolve_playground(apiurl)
 
-    _, bucket, model_id = json.loads(response.content.decode("utf-8"))
+    if header_only:
+        url = aws_client["client"].generate_presigned_url(
+            "get_object", Params={"Bucket": bucket, "Key": model_id + onnx_model_name})
+        return read_onnx_header(url)
 
     try:
         onnx_string = aws_client["client"].get_object(
@@ -1362,7 +2354,28 @@ def _get_onnx_from_bucket(apiurl, aws_client, version=None):
 
 
 
-def instantiate_model(apiurl, version=None, trained=False, reproduce=False, submission_type="competition"):
+def _get_model_weights(model_metadata, resp_dict, version):
+    '''Returns native weights of a submitted model, from its weights artifact 
+    or from the metadata of models submitted before weights artifacts.'''
+
+    weights_artifact = model_metadata.get('weights_artifact')
+
+    if weights_artifact is None:
+        # only the metadata at the end of the file is fetched, not the graph
+        onnx_header = read_onnx_header(resp_dict['model_weight_url'], graph=False)
+        return _get_metadata(onnx_header)['model_weights']
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        with open(_weights_artifact_path(weights_artifact, resp_dict['model_artifact_url'], temp_dir), 'rb') as f:
+            return f.read()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def instantiate_model(apiurl, version=None, trained=False, reproduce=False, submission_type="competition", model=None):
+    import requests
+
     # Confirm that creds are loaded, print warning if not
     if all(["username" in os.environ, 
           "password" in os.environ]):
@@ -1390,7 +2403,7 @@ def instantiate_model(apiurl, version=None, trained=False, reproduce=False, subm
 
     apiurl_eval=apiurl[:-1]+"eval"
 
-    resp = requests.post(apiurl_eval,headers=headers,data=json.dumps(post_dict)) 
+    resp = http_session.post(apiurl_eval,headers=headers,data=json.dumps(post_dict),idempotent=True) 
 
     # Missing Check for response from Lambda. 
     try :
@@ -1415,7 +2428,6 @@ def instantiate_model(apiurl, version=None, trained=False, reproduce=False, subm
     print("Instantiate the model from metadata..")
     
     model_metadata = resp_dict['model_metadata']
-    model_weight_url = resp_dict['model_weight_url']
     model_config = ast.literal_eval(model_metadata['model_config'])
     ml_framework = model_metadata['ml_framework']
 
@@ -1426,30 +2438,13 @@ def instantiate_model(apiurl, version=None, trained=False, reproduce=False, subm
             model = model_class(**model_config)
 
         elif trained == True:
-            model_pkl = None
-            temp = tempfile.mkdtemp()
-            temp_path = temp + "/" + "onnx_model_v{}.onnx".format(version)
-            
-            # Get leaderboard
-            status = wget.download(model_weight_url, out=temp_path)
-            onnx_model = onnx.load(temp_path)
-            model_pkl = _get_metadata(onnx_model)['model_weights']
-        
-            temp_dir = tempfile.gettempdir()
-            temp_path = os.path.join(temp_dir, 'temp_file_name')
-
-            with open(temp_path, "wb") as f:
-                f.write(model_pkl)
+            model_pkl = _get_model_weights(model_metadata, resp_dict, version)
 
-            with open(temp_path, 'rb') as f:
-                model = pickle.load(f)
+            model = pickle.loads(model_pkl)
 
     if ml_framework == 'pyspark':
-        try:
-            if pyspark is None:
-                raise("Error: Please install pyspark to enable pyspark features")
-        except:
-            raise("Error: Please install pyspark to enable pyspark features")
+        _import_framework('pyspark')
+        from pyspark.sql import SparkSession
 
         if not trained or reproduce:
             print("Pyspark model can only be instantiated in trained mode.")
@@ -1459,29 +2454,8 @@ def instantiate_model(apiurl, version=None, trained=False, reproduce=False, subm
         # pyspark model object is always trained. The unfitted / untrained one 
         # is the estimator and cannot be treated as model. 
         # Model is transformer and created by estimator
-        model_pkl = None
-        temp = tempfile.mkdtemp()
-        temp_path = temp + "/" + "onnx_model_v{}.onnx".format(version)
-        
-        # Get leaderboard
-        status = wget.download(model_weight_url, out=temp_path)
-        onnx_model = onnx.load(temp_path)
-        model_pkl = _get_metadata(onnx_model)['model_weights']
-
-        temp_dir = tempfile.gettempdir()
-        temp_path_zip = os.path.join(temp_dir, 'temp_pyspark_model.zip')
-        temp_path = os.path.join(temp_dir, 'temp_pyspark_model')
-        
-        if not os.path.exists(temp_path):
-            os.mkdir(temp_path)
+        model_pkl = _get_model_weights(model_metadata, resp_dict, version)
 
-        with open(temp_path_zip, "wb") as f:
-            f.write(model_pkl)
-        
-        dirname_idx = -1
-        with ZipFile(temp_path_zip, 'r') as zip_file:
-            zip_file.extractall(temp_path)
-        
         model_type = model_metadata['model_type']
         model_class = pyspark_model_from_string(model_type)
         # model_config is for the Estimator not the Transformer / Model
@@ -1493,40 +2467,80 @@ def instantiate_model(apiurl, version=None, trained=False, reproduce=False, subm
             .appName('Pyspark Model') \
             .getOrCreate()
 
-        model = model.load(temp_path)
+        # pyspark can only load models from a directory
+        temp_dir = tempfile.mkdtemp()
+        temp_path = os.path.join(temp_dir, 'temp_pyspark_model')
 
-        # clean up temp directory files for future runs
         try:
-            shutil.rmtree(temp_path)
-            os.remove(temp_path_zip)
-        except:
-            pass
+            with ZipFile(io.BytesIO(model_pkl), 'r') as zip_file:
+                zip_file.extractall(temp_path)
+
+            model = model.load(temp_path)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
 
     if ml_framework == 'keras':
+        tf = _import_framework('tensorflow')
+
         if trained == False or reproduce == True:
             model = tf.keras.Sequential().from_config(model_config)
 
         elif trained == True:
-            model_weights = None
-            temp = tempfile.mkdtemp()
-            temp_path = temp + "/" + "onnx_model_v{}.onnx".format(version)
-        
-            # Get leaderboard
-            status = wget.download(model_weight_url, out=temp_path)
-            onnx_model = onnx.load(temp_path)
-            import pickle
-            model_weights=pickle.loads(_get_metadata(onnx_model)['model_weights'])
+            model_weights = pickle.loads(_get_model_weights(model_metadata, resp_dict, version))
             
             model = tf.keras.Sequential().from_config(model_config)
 
             model.set_weights(model_weights)
 
+    if ml_framework == 'pytorch':
+
+        # pytorch architectures are code, only their weights can be restored
+        if not trained or reproduce:
+            print("Pytorch model can only be instantiated in trained mode.")
+            print("Please rerun the function with proper parameters.")
+            return None
+
+        temp_dir = tempfile.mkdtemp()
+
+        try:
+            # tensors are memory mapped, the file may be removed once it is mapped
+            if model_metadata.get('weights_artifact') is None:
+                # weights embedded in the onnx file
+                weights_path = os.path.join(temp_dir, 'model_state.safetensors')
+                with open(weights_path, 'wb') as f:
+                    f.write(_get_model_weights(model_metadata, resp_dict, version))
+            else:
+                weights_path = _weights_artifact_path(model_metadata['weights_artifact'],
+                                                      resp_dict['model_artifact_url'], temp_dir)
+            state_dict = load_torch_state(weights_path)
+        except Exception:
+            print("Trained pytorch weights are not available for this model version.")
+            return None
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        if model is None:
+            print("Pass a model with the submitted architecture as model to load the weights, returning state dict.")
+            return state_dict
+
+        model.load_state_dict(state_dict)
+
     print("Your model is successfully instantiated.")
     return model
 
 
 def _get_layer_names():
 
+    layer_list, activation_list = _get_layer_names_cached()
+
+    return list(layer_list), list(activation_list)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_layer_names_cached():
+
+    tf = _import_framework('tensorflow')
+
     activation_list = [i for i in dir(tf.keras.activations)]
     activation_list = [i for i in activation_list if callable(getattr(tf.keras.activations, i))]
     activation_list = [i for i in activation_list if  not i.startswith("_")]
@@ -1542,11 +2556,19 @@ def _get_layer_names():
     layer_list = [i for i in layer_list if re.match('^[A-Z]', i)]
     layer_list = [i for i in layer_list if i.lower() not in [i.lower() for i in activation_list]]
 
-    return layer_list, activation_list
+    return tuple(layer_list), tuple(activation_list)
 
 
 def _get_layer_names_pytorch():
 
+    layer_list, activation_list = _get_layer_names_pytorch_cached()
+
+    return list(layer_list), list(activation_list)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_layer_names_pytorch_cached():
+
     activation_list = ['ELU', 'Hardshrink', 'Hardsigmoid', 'Hardtanh', 'Hardswish', 'LeakyReLU', 'LogSigmoid', 
                     'MultiheadAttention', 'PReLU', 'ReLU', 'ReLU6', 'RReLU', 'SELU', 'CELU', 'GELU', 'Sigmoid',
                     'SiLU', 'Mish', 'Softplus', 'Softshrink', 'Softsign', 'Tanh', 'Tanhshrink', 'Threshold',
@@ -1560,67 +2582,24 @@ def _get_layer_names_pytorch():
         pass
 
 
-    return layer_list, activation_list
+    return tuple(layer_list), tuple(activation_list)
 
 
 def _get_sklearn_modules():
-    
-    import sklearn
-
-    sklearn_modules = ['ensemble', 'gaussian_process', 'isotonic',
-                       'linear_model', 'mixture', 'multiclass', 'naive_bayes',
-                       'neighbors', 'neural_network', 'svm', 'tree']
-
-    models_modules_dict = {}
 
-    for i in sklearn_modules:
-        models_list = [j for j in dir(eval('sklearn.'+i)) if callable(getattr(eval('sklearn.'+i), j))]
-        models_list = [j for j in models_list if re.match('^[A-Z]', j)]
-
-        for k in models_list: 
-            models_modules_dict[k] = 'sklearn.'+i
-    
-    return models_modules_dict
+    return estimator_modules('sklearn', scan=True)
 
 
 def model_from_string(model_type):
-    models_modules_dict = _get_sklearn_modules()
-    module = models_modules_dict[model_type]
-    model_class = getattr(importlib.import_module(module), model_type)
-    return model_class
+    return estimator_class(model_type, 'sklearn')
 
 def _get_pyspark_modules():
-    try:
-        if pyspark is None:
-            raise Exception("Error: Please install pyspark to enable pyspark features")
-    except:
-        raise Exception("Error: Please install pyspark to enable pyspark features")
 
-    pyspark_modules = ['ml', 'ml.feature', 'ml.classification', 'ml.clustering', 'ml.regression']
-
-    models_modules_dict = {}
-
-    for i in pyspark_modules:
-        models_list = [j for j in dir(eval('pyspark.'+i)) if callable(getattr(eval('pyspark.'+i), j))]
-        models_list = [j for j in models_list if re.match('^[A-Z]', j)]
-
-        for k in models_list: 
-            models_modules_dict[k] = 'pyspark.'+i
-    
-    return models_modules_dict
+    return estimator_modules('pyspark', scan=True)
 
 
 def pyspark_model_from_string(model_type):
-    try:
-        if pyspark is None:
-            raise Exception("Error: Please install pyspark to enable pyspark features")
-    except:
-        raise Exception("Error: Please install pyspark to enable pyspark features")
-
-    models_modules_dict = _get_pyspark_modules()
-    module = models_modules_dict[model_type]
-    model_class = getattr(importlib.import_module(module), model_type)
-    return model_class
+    return estimator_class(model_type, 'pyspark')
 
 
 def print_y_stats(y_stats): 
@@ -1649,7 +2628,7 @@ def inspect_y_test(apiurl, submission_type):
 
   apiurl_eval=apiurl[:-1]+"eval"
 
-  y_stats = requests.post(apiurl_eval,headers=headers,data=json.dumps(post_dict)) 
+  y_stats = http_session.post(apiurl_eval,headers=headers,data=json.dumps(post_dict),idempotent=True) 
 
   y_stats_dict = json.loads(y_stats.text)
 
@@ -1659,153 +2638,153 @@ def inspect_y_test(apiurl, submission_type):
 
 
 
-def model_summary_keras(model):
+LayerInfo = namedtuple('LayerInfo', ['name', 'layer', 'shape', 'params', 'weight_shapes', 'connect', 'activation'])
+ModelStructure = namedtuple('ModelStructure', ['framework', 'layers', 'top_layers', 'edges'])
 
-    # extract model architecture metadata 
-    layer_names = []
-    layer_types = []
-    layer_n_params = []
-    layer_shapes = []
-    layer_connect = []
-    activations = []
+# structures are computed once per model object and dropped with the model
+_model_structures = weakref.WeakKeyDictionary()
 
-    keras_layers = keras_unpack(model)
 
-    for i in keras_layers: 
+def _iter_leaf_layers(children, is_container, get_children):
+    '''Yields (key, layer) for leaf layers of nested models in depth first order.'''
 
-        try:
-            layer_names.append(i.name)
-        except:
-            layer_names.append(None)
+    stack = [iter(children)]
 
-        try:
-            layer_types.append(i.__class__.__name__)
-        except:
-            layer_types.append(None)
+    while stack:
+        for key, layer in stack[-1]:
+            if is_container(layer):
+                stack.append(iter(get_children(layer)))
+                break
+            yield key, layer
+        else:
+            stack.pop()
 
-        try:
-            layer_shapes.append(i.output_shape)
-        except:
-            layer_shapes.append(None)
 
-        try:
-            layer_n_params.append(i.count_params())
-        except:
-            layer_n_params.append(None)
+def _keras_children(model):
+    return [(None, layer) for layer in model.layers]
+
 
+def _keras_layer_info(layer):
+
+    def attribute(getter):
         try:
-            if isinstance(i.inbound_nodes[0].inbound_layers, list):
-              layer_connect.append([x.name for x in i.inbound_nodes[0].inbound_layers])
-            else: 
-              layer_connect.append(i.inbound_nodes[0].inbound_layers.name)
-        except:
-            layer_connect.append(None)
+            return getter()
+        except Exception:
+            return None
 
-        try: 
-            activations.append(i.activation.__name__)
-        except:
-            activations.append(None)
+    def connect():
+        inbound_layers = layer.inbound_nodes[0].inbound_layers
+        if isinstance(inbound_layers, list):
+            return [x.name for x in inbound_layers]
+        return inbound_layers.name
 
+    return LayerInfo(name=attribute(lambda: layer.name),
+                     layer=attribute(lambda: layer.__class__.__name__),
+                     shape=attribute(lambda: layer.output_shape),
+                     params=attribute(layer.count_params),
+                     weight_shapes=attribute(lambda: tuple(tuple(w.shape) for w in layer.weights)),
+                     connect=attribute(connect),
+                     activation=attribute(lambda: layer.activation.__name__))
 
-    model_summary = pd.DataFrame({"Name": layer_names,
-    "Layer": layer_types,
-    "Shape": layer_shapes,
-    "Params": layer_n_params,
-    "Connect": layer_connect,
-    "Activation": activations})
 
-    return model_summary
+def _torch_layer_info(name, module):
 
+    params = list(module.parameters())
 
+    return LayerInfo(name=name,
+                     layer=module._get_name(),
+                     shape=None,
+                     params=sum([np.prod(p.size()) for p in params]),
+                     weight_shapes=tuple([tuple(p.size()) for p in params]),
+                     connect=None,
+                     activation=None)
 
-def model_graph_keras(model):
 
-    # extract model architecture metadata 
-    layer_names = []
-    layer_types = []
-    layer_n_params = []
-    layer_shapes = []
-    layer_connect = []
-    activations = []
+def _describe_model(model, refresh=False):
+    '''Returns ModelStructure of a keras or pytorch model, computed in a single
+    traversal of its nested layers and cached for the lifetime of the model.'''
 
-    graph_nodes = []
-    graph_edges = []
+    if not refresh:
+        try:
+            return _model_structures[model]
+        except (KeyError, TypeError):
+            pass
+
+    if _is_torch_model(model):
+        layers = [_torch_layer_info(key, module) for module, key in zip(*torch_unpack(model))]
+        top_layers = layers
+        edges = [(a.name, b.name) for a, b in zip(layers[:-1], layers[1:])]
+        framework = 'pytorch'
 
+    else:
+        leaf_layers = keras_unpack(model)
+        infos = {id(layer): _keras_layer_info(layer) for layer in leaf_layers}
+        layers = [infos[id(layer)] for layer in leaf_layers]
+        top_layers = [infos.get(id(layer)) or _keras_layer_info(layer) for layer in model.layers]
+        edges = []
+        for info in top_layers:
+            for source in (info.connect if isinstance(info.connect, list) else [info.connect]):
+                if source is not None:
+                    edges.append((source, info.name))
+        framework = 'keras'
+
+    structure = ModelStructure(framework=framework,
+                               layers=tuple(layers),
+                               top_layers=tuple(top_layers),
+                               edges=tuple(edges))
 
-    for i in model.layers: 
+    try:
+        _model_structures[model] = structure
+    except TypeError:
+        pass
 
-        try:
-            layer_name = i.name
-        except:
-            layer_name = None
-        finally:
-            layer_names.append(layer_name)
+    return structure
 
 
-        try:
-            layer_type = i.__class__.__name__
-        except:
-            layer_type = None
-        finally:
-            layer_types.append(layer_type)
+def model_summary_keras(model):
 
-        try:
-            layer_shape = i.output_shape
-        except:
-            layer_shape = None
-        finally:
-            layer_shapes.append(layer_shape)
+    import pandas as pd
 
+    # extract model architecture metadata 
+    layers = _describe_model(model).layers
 
-        try:
-            layer_params = i.count_params()
-        except:
-            layer_params = None
-        finally:
-            layer_n_params.append(layer_params)
+    model_summary = pd.DataFrame({"Name": [i.name for i in layers],
+    "Layer": [i.layer for i in layers],
+    "Shape": [i.shape for i in layers],
+    "Params": [i.params for i in layers],
+    "Connect": [i.connect for i in layers],
+    "Activation": [i.activation for i in layers]})
 
+    return model_summary
 
-        try:
-            if isinstance(i.inbound_nodes[0].inbound_layers, list):
-              layer_input = [x.name for x in i.inbound_nodes[0].inbound_layers]
-            else: 
-              layer_input = i.inbound_nodes[0].inbound_layers.name
-        except:
-            layer_connect = None
-        finally:
-            layer_connect.append(layer_input)
 
 
-        try: 
-            activation = i.activation.__name__
-        except:
-            activation = None
-        finally:
-            activations.append(activation)
+def model_graph_keras(model):
 
-        layer_color = color_pal_assign(layer_type)
+    structure = _describe_model(model)
+
+    graph_nodes = []
+
+    for i in structure.top_layers: 
+
+        layer_color = color_pal_assign(i.layer)
         layer_color =  layer_color.split(' ')[-1]
 
+        graph_nodes.append((i.name, {"label": i.layer + '\n' + str(i.shape),
+                                     "URL": "https://keras.io/search.html?query="+i.layer.lower(),
+                                     "color": layer_color,
+                                     "style": "bold",
+                                     "Name": i.name,
+                                     "Layer": i.layer,
+                                     "Shape": i.shape,
+                                     "Params": i.params,
+                                     "Activation": i.activation}))
 
-        graph_nodes.append((layer_name, {"label": layer_type + '\n' + str(layer_shape),
-                                         "URL": "https://keras.io/search.html?query="+layer_type.lower(),
-                                         "color": layer_color,
-                                         "style": "bold",
-                                    "Name": layer_name,
-                                    "Layer": layer_type,
-                                    "Shape": layer_shape,
-                                    "Params": layer_params,
-                                    "Activation": activation}))
-        
-        if isinstance(layer_input, list):
-            for i in layer_input:
-                graph_edges.append((i, layer_name))
-        else:
-            graph_edges.append((layer_input, layer_name))
+    nx = _import_framework('networkx')
 
     G = nx.DiGraph()
     G.add_nodes_from(graph_nodes)
-    G.add_edges_from(graph_edges)
+    G.add_edges_from(structure.edges)
 
     G_pydot = nx.drawing.nx_pydot.to_pydot(G)
 
@@ -1814,6 +2793,8 @@ def model_graph_keras(model):
 
 def plot_keras(model):
 
+    from IPython.display import display, SVG
+
     G =  model_graph_keras(model)
 
     display(SVG(G.create_svg()))
@@ -1821,46 +2802,27 @@ def plot_keras(model):
 
 
 def torch_unpack(model):
-    
-    layers = []
+
     keys = []
-    
-    for key, module in model._modules.items():
-                
-        if len(module._modules):
-            
-            layers_out, keys_out = torch_unpack(module)
-            
-            layers = layers + layers_out
-            keys = keys + keys_out
-            
-            
-        else:
-            
-            layers.append(module)
-            keys.append(key)
-            
+    layers = []
+
+    for key, module in _iter_leaf_layers(model._modules.items(),
+                                         lambda module: len(module._modules),
+                                         lambda module: module._modules.items()):
+        layers.append(module)
+        keys.append(key)
+
     return layers, keys
 
-    
+
 def keras_unpack(model):
-    
-    layers = []
-    
-    for module in model.layers:
-                
-        if isinstance(module, (tf.keras.Model, tf.keras.Sequential)):
-            
-            layers_out = keras_unpack(module)
-            
-            layers = layers + layers_out
-            
-            
-        else:
-            
-            layers.append(module)
-            
-    return layers
+
+    tf = _import_framework('tensorflow')
+
+    return [layer for _, layer in
+            _iter_leaf_layers(_keras_children(model),
+                              lambda layer: isinstance(layer, (tf.keras.Model, tf.keras.Sequential)),
+                              _keras_children)]
 
 
 def torch_metadata(model):
@@ -1870,31 +2832,24 @@ def torch_metadata(model):
     param_list = []
     weight_list = []
     activation_list = []
-    
-    layers, name_list = torch_unpack(model)
 
     layer_names, activation_names = _get_layer_names_pytorch()
 
-    for module, name in zip(layers, name_list):
-
-        module_name = module._get_name()
-
+    for info in _describe_model(model).layers:
 
-        if module_name in layer_names:
+        if info.layer in layer_names:
 
-                name_list_out.append(name)
+                name_list_out.append(info.name)
 
-                layer_list.append(module_name)
+                layer_list.append(info.layer)
 
-                params = sum([np.prod(p.size()) for p in module.parameters()])
-                param_list.append(params)
+                param_list.append(info.params)
 
-                weights = tuple([tuple(p.size()) for p in module.parameters()])
-                weight_list.append(weights)
+                weight_list.append(info.weight_shapes)
 
-        if module_name in activation_names: 
+        if info.layer in activation_names: 
 
-                activation_list.append(module_name)
+                activation_list.append(info.layer)
 
     return name_list_out, layer_list, param_list, weight_list, activation_list
 
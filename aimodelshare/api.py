@@ -6,7 +6,7 @@ import random
 import tempfile
 import functools
 import json
-import requests
+from aimodelshare import http_session
 import math
 from zipfile import ZipFile
 from string import Template
@@ -23,6 +23,7 @@ except ImportError:
 from . import main  # relative-import the *package* containing the templates
 
 from .utils import *
+from .estimator_registry import SKLEARN_ESTIMATOR_MODULES, PYSPARK_ESTIMATOR_MODULES
 
 class create_prediction_api_class():
 
@@ -188,12 +189,14 @@ class create_prediction_api_class():
                 newdata = t.substitute(
                     bucket_name=os.environ.get("BUCKET_NAME"),
                     unique_model_id=self.unique_model_id,
-                    labels=self.labels
+                    labels=self.labels,
+                    pyspark_estimator_modules=repr(PYSPARK_ESTIMATOR_MODULES)
                 )
             else:
                 newdata = t.substitute(
                     bucket_name=os.environ.get("BUCKET_NAME"),
-                    unique_model_id=self.unique_model_id
+                    unique_model_id=self.unique_model_id,
+                    pyspark_estimator_modules=repr(PYSPARK_ESTIMATOR_MODULES)
                 )
 
         with open(os.path.join(self.file_objects_folder_path, 'model.py'), 'w') as file:
@@ -213,7 +216,8 @@ class create_prediction_api_class():
 
         t = Template(pkg_resources.read_text(main, 'eval_lambda.txt').replace("$apikey",api_key).replace("$task_type",self.task_type))
         
-        data = t.substitute(bucket_name = self.bucket_name, unique_model_id = self.unique_model_id, task_type = self.task_type)
+        data = t.substitute(bucket_name = self.bucket_name, unique_model_id = self.unique_model_id, task_type = self.task_type,
+                            sklearn_estimator_modules = repr(SKLEARN_ESTIMATOR_MODULES))
         with open(os.path.join(self.temp_dir, 'main.py'), 'w') as file:
             file.write(data)
         with ZipFile(os.path.join(self.temp_dir, 'archive2.zip'), 'a') as z:
@@ -621,7 +625,7 @@ def delete_deployment(apiurl, confirmation=True):
     apiurl: string of API URL the user wishes to delete
     WARNING: User must supply high-level credentials in order to delete an API. 
     """
-    from aimodelshare.aws import run_function_on_lambda
+    from aimodelshare.aws import resolve_playground, invalidate_playground
 
     if confirmation==True:
         # Provide Warning & Have user confirm deletion 
@@ -648,7 +652,6 @@ def delete_deployment(apiurl, confirmation=True):
 
             delplaygroundstring="delete_deployment('"+apiurl+"',"+",confirmation=False)"
             import base64
-            import requests
             import json
 
             api_url = "https://z4kvag4sxdnv2mvs2b6c4thzj40bxnuw.lambda-url.us-east-2.on.aws/"
@@ -656,7 +659,7 @@ def delete_deployment(apiurl, confirmation=True):
             data = json.dumps({"code": """from aimodelshare.api import delete_deployment;"""+delplaygroundstring, "zipfilename": "","username":os.environ.get("username"), "password":os.environ.get("password"),"token":os.environ.get("JWT_AUTHORIZATION_TOKEN"),"s3keyid":"xrjpv1i7xe"})
 
             headers = {"Content-Type": "application/json"}
-            response = requests.request("POST", api_url, headers = headers, data=data)
+            response = http_session.request("POST", api_url, headers = headers, data=data, timeout=None)
             # Print response
             result=json.loads(response.text)
 
@@ -687,13 +690,8 @@ def delete_deployment(apiurl, confirmation=True):
             s3 = user_sess.resource('s3')
 
             # Get bucket and model_id subfolder for user based on apiurl {{{
-            response, error = run_function_on_lambda(
-                apiurl, **{"delete": "FALSE", "versionupdateget": "TRUE"}
-            )
-            if error is not None:
-                raise error
+            api_bucket, model_id = resolve_playground(apiurl)
             import json
-            _, api_bucket, model_id = json.loads(response.content.decode("utf-8"))
             # }}} 
 
             #Confirm username in bucket name
@@ -750,7 +748,7 @@ def delete_deployment(apiurl, confirmation=True):
             api_response = client.delete_rest_api(
                 restApiId=api_id
             )
-            import requests
+            invalidate_playground(apiurl)
 
             # delete api page on front end
             bodydata = {'apiurl': apiurl,
@@ -759,7 +757,7 @@ def delete_deployment(apiurl, confirmation=True):
             headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("JWT_AUTHORIZATION_TOKEN"), 'Access-Control-Allow-Headers':
                                           'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
 
-            requests.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+            http_session.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                           json=bodydata, headers=headers_with_authentication)
             
             # delete competition posting
@@ -772,7 +770,7 @@ def delete_deployment(apiurl, confirmation=True):
             headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("AWS_TOKEN"), 'Access-Control-Allow-Headers':
                                             'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
             # competitiondata lambda function invoked through below url to update model submissions and contributors
-            requests.post("https://o35jwfakca.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+            http_session.post("https://o35jwfakca.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                           json=bodydata, headers=headers_with_authentication)
 
             # delete experiment posting
@@ -785,7 +783,7 @@ def delete_deployment(apiurl, confirmation=True):
             headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("AWS_TOKEN"), 'Access-Control-Allow-Headers':
                                             'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
             # competitiondata lambda function invoked through below url to update model submissions and contributors
-            requests.post("https://o35jwfakca.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+            http_session.post("https://o35jwfakca.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                           json=bodydata, headers=headers_with_authentication)    
             
             # Delete competition data container image
@@ -1,10 +1,11 @@
 import os
 import boto3
 import botocore
-import requests
+from aimodelshare import http_session
 import json
 from aimodelshare.exceptions import AuthorizationError, AWSAccessError
 from aimodelshare.modeluser import get_jwt_token
+from aimodelshare.ttl_cache import TTLCache
 
 def set_credentials(credential_file=None, type="submit_model", apiurl="apiurl", manual = True, cloud="aws"):
   import os
@@ -359,7 +360,7 @@ def run_function_on_lambda(url, **kwargs):
         "authorizationToken": os.environ.get("AWS_TOKEN"),
     }
 
-    response = requests.post(
+    response = http_session.post(
         "https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
         json=kwargs,
         headers=headers_with_authentication,
@@ -377,6 +378,69 @@ def run_function_on_lambda(url, **kwargs):
     return response, None
 
 
+DEFAULT_PLAYGROUND_CACHE_TTL = 3600
+
+_playground_cache = None
+
+
+def get_playground_cache():
+    '''Returns process wide cache of playground url resolutions.
+
+    Entries live for AIMODELSHARE_PLAYGROUND_CACHE_TTL seconds (0 disables
+    caching) and are also written to AIMODELSHARE_PLAYGROUND_CACHE_FILE
+    when it is set.'''
+
+    global _playground_cache
+
+    if _playground_cache is None:
+        _playground_cache = TTLCache(
+            ttl=float(os.environ.get("AIMODELSHARE_PLAYGROUND_CACHE_TTL", DEFAULT_PLAYGROUND_CACHE_TTL)),
+            path=os.environ.get("AIMODELSHARE_PLAYGROUND_CACHE_FILE"))
+
+    return _playground_cache
+
+
+def _playground_cache_key(apiurl):
+
+    return str(os.environ.get("username")) + " " + apiurl
+
+
+def resolve_playground(apiurl, refresh=False):
+    '''Returns (api_bucket, model_id) of a playground url.
+
+    The answer does not change for a given playground, so it is cached per
+    user and only fetched from the modeldata lambda once per TTL, or again
+    when refresh is True.'''
+
+    cache = get_playground_cache()
+    key = _playground_cache_key(apiurl)
+
+    resolution = None if refresh else cache.get(key)
+
+    if resolution is None:
+        response, error = run_function_on_lambda(
+            apiurl, **{"delete": "FALSE", "versionupdateget": "TRUE"}
+        )
+        if error is not None:
+            raise error
+
+        resolution = json.loads(response.content.decode("utf-8"))
+        cache.put(key, resolution)
+
+    _, api_bucket, model_id = resolution
+
+    return api_bucket, model_id
+
+
+def invalidate_playground(apiurl=None):
+    '''Drops cached resolution of apiurl, or of all playgrounds when apiurl is None.'''
+
+    if apiurl is None:
+        get_playground_cache().invalidate()
+    else:
+        get_playground_cache().invalidate(_playground_cache_key(apiurl))
+
+
 def get_token(username, password):
       #get token for access to prediction lambas or to submit predictions to generate model evaluation metrics
       tokenstring = '{\"username\": \"$usernamestring\", \"password\": \"$passwordstring\"}'
@@ -386,7 +450,7 @@ def get_token(username, password):
           usernamestring=username, passwordstring=password)
       api_url='https://xgwe1d6wai.execute-api.us-east-1.amazonaws.com/dev' 
       headers={ 'Content-Type':'application/json'}
-      token =requests.post(api_url,headers=headers,data=json.dumps({"action": "login", "request":newdata}))
+      token =http_session.post(api_url,headers=headers,data=json.dumps({"action": "login", "request":newdata}))
       return token.text
 
 def configure_credentials(): 
@@ -420,6 +484,8 @@ __all__ = [
     get_aws_token,
     get_aws_client,
     run_function_on_lambda,
+    resolve_playground,
+    invalidate_playground,
     get_s3_iam_client,
     set_credentials,
     configure_credentials,
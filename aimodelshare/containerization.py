@@ -10,7 +10,7 @@ import boto3
 import importlib_resources as pkg_resources
 
 import uuid
-import requests
+from aimodelshare import http_session
 
 time_delay=2
 
@@ -642,7 +642,7 @@ def clone_base_image(user_session, repository, image_tag, source_account_id, api
                                        'Access-Control-Allow-Origin': '*'}
 
         # modeltoapi lambda function invoked through below url to return new prediction api in response
-        response = requests.post(api_endpoint, json=bodydata, headers=headers_with_authentication)
+        response = http_session.post(api_endpoint, json=bodydata, headers=headers_with_authentication)
         time.sleep(5)
 
         # Delete registry policy
@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import pickle
+import hashlib
+import inspect
+import tempfile
+import threading
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".aimodelshare", "onnx_cache")
+DEFAULT_MAX_SIZE = 2 * 1024**3
+
+DEFAULT_ARTIFACT_DIR = os.path.join(os.path.expanduser("~"), ".aimodelshare", "artifacts")
+DEFAULT_ARTIFACT_MAX_SIZE = 8 * 1024**3
+
+
+class _HashWriter:
+    '''File-like object that feeds pickled bytes straight into a digest.'''
+
+    def __init__(self, digest):
+        self.digest = digest
+
+    def write(self, data):
+        self.digest.update(data)
+
+
+def _framework_version(module_name):
+
+    module = sys.modules.get(module_name)
+
+    return str(getattr(module, "__version__", None))
+
+
+def _update_with_array(digest, array):
+
+    import numpy as np
+
+    array = np.ascontiguousarray(array)
+    digest.update(str(array.dtype).encode())
+    digest.update(str(array.shape).encode())
+    digest.update(array.tobytes())
+
+
+def _update_with_classes(digest, modules, method_name, framework_packages):
+    '''Adds qualified name and source of every user defined class in modules.
+
+    Classes whose source is not available, e.g. ones defined in a notebook,
+    are hashed by the bytecode of their method_name. Raises ValueError
+    when neither is available.'''
+
+    classes = {type(module) for module in modules}
+    classes = [cls for cls in classes if cls.__module__.split(".")[0] not in framework_packages]
+
+    for cls in sorted(classes, key=lambda cls: cls.__module__ + "." + cls.__qualname__):
+        digest.update((cls.__module__ + "." + cls.__qualname__).encode())
+
+        try:
+            digest.update(inspect.getsource(cls).encode())
+            continue
+        except (OSError, TypeError):
+            pass
+
+        code = getattr(getattr(cls, method_name, None), "__code__", None)
+        if code is None:
+            raise ValueError("Code of " + cls.__qualname__ + " is not available.")
+
+        digest.update(code.co_code)
+        digest.update(repr(code.co_consts).encode())
+        digest.update(repr(code.co_names).encode())
+
+
+def model_fingerprint(model, framework, options=None):
+    '''Returns stable content hash of a fitted model object.
+
+    The hash covers the model weights, its hyperparameters, the code of
+    user defined keras and pytorch classes, the framework and onnx versions
+    and the converter options. Returns None when the model cannot be
+    fingerprinted, in which case it should not be cached.'''
+
+    digest = hashlib.sha256()
+    digest.update(framework.encode())
+    digest.update(_framework_version("onnx").encode())
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+
+    try:
+        if framework in ["sklearn", "xgboost"]:
+            digest.update(_framework_version(framework).encode())
+            pickle.dump(model, _HashWriter(digest), protocol=4)
+
+        elif framework == "keras":
+            digest.update(_framework_version("tensorflow").encode())
+            digest.update(json.dumps(model.get_config(), sort_keys=True, default=str).encode())
+            # subclassed models and layers are defined by their call method, not their config
+            _update_with_classes(digest, [model] + list(getattr(model, "submodules", [])), "call",
+                                 ["keras", "tensorflow", "tf_keras"])
+            for weights in model.get_weights():
+                _update_with_array(digest, weights)
+
+        elif framework == "pytorch":
+            digest.update(_framework_version("torch").encode())
+            digest.update(repr(model).encode())
+            # architectures are defined by their forward method, which repr does not show
+            _update_with_classes(digest, model.modules(), "forward", ["torch"])
+            for name, tensor in model.state_dict().items():
+                digest.update(name.encode())
+                _update_with_array(digest, tensor.detach().cpu().numpy())
+
+        else:
+            return None
+
+    except Exception:
+        return None
+
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    '''On-disk, size bounded cache of serialized ONNX models.
+
+    Entries are keyed by model fingerprint and evicted least recently
+    used first once the cache grows beyond max_size bytes. The same store
+    keeps native model weight artifacts keyed by their sha256 hash.'''
+
+    def __init__(self, cache_dir=None, max_size=None, suffix=".onnx"):
+
+        if cache_dir is None:
+            cache_dir = os.environ.get("AIMODELSHARE_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+        if max_size is None:
+            max_size = int(os.environ.get("AIMODELSHARE_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE))
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.suffix = suffix
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def _entries(self):
+
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(self.suffix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, file_name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file_name))
+
+        return entries
+
+    def get(self, key):
+        '''Returns cached ONNX bytes for key or None on a miss.'''
+
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as f:
+                onnx_bytes = f.read()
+            # mark entry as recently used for eviction
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+
+        return onnx_bytes
+
+    def path(self, key):
+        '''Returns file path of entry for key or None if it is not stored.'''
+
+        path = self._path(key)
+
+        if not os.path.exists(path):
+            return None
+
+        return path
+
+    def put(self, key, onnx_bytes):
+        '''Stores ONNX bytes under key and evicts old entries if needed.
+
+        Returns False if the entry could not be stored, e.g. because it is
+        larger than max_size.'''
+
+        if len(onnx_bytes) > self.max_size:
+            return False
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # write to private temp file first so concurrent readers never see partial files
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(onnx_bytes)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        self._evict()
+
+        return True
+
+    def _evict(self):
+
+        entries = sorted(self._entries())
+        total_size = sum(size for _, size, _ in entries)
+
+        for _, size, file_name in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, file_name))
+            except OSError:
+                continue
+            total_size -= size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        '''Removes all cached entries.'''
+
+        for _, _, file_name in self._entries():
+            try:
+                os.remove(os.path.join(self.cache_dir, file_name))
+            except OSError:
+                pass
+
+    def stats(self):
+        '''Returns hit/miss statistics and current cache size.'''
+
+        entries = self._entries()
+
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "size": sum(size for _, size, _ in entries),
+                "max_size": self.max_size,
+                "cache_dir": self.cache_dir}
+
+
+_conversion_cache = None
+
+
+def get_conversion_cache():
+    '''Returns process wide conversion cache.'''
+
+    global _conversion_cache
+
+    if _conversion_cache is None:
+        _conversion_cache = ConversionCache()
+
+    return _conversion_cache
+
+
+_artifact_store = None
+
+
+def get_artifact_store():
+    '''Returns process wide store of native model weight artifacts.'''
+
+    global _artifact_store
+
+    if _artifact_store is None:
+        _artifact_store = ConversionCache(
+            cache_dir=os.environ.get("AIMODELSHARE_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR),
+            max_size=int(os.environ.get("AIMODELSHARE_ARTIFACT_MAX_SIZE", DEFAULT_ARTIFACT_MAX_SIZE)),
+            suffix=".weights")
+
+    return _artifact_store
+
+
+__all__ = [
+    ConversionCache,
+    get_conversion_cache,
+    get_artifact_store,
+    model_fingerprint
+]
@@ -0,0 +1,263 @@
+import time
+import atexit
+import pickle
+import warnings
+import threading
+import traceback
+import multiprocessing
+
+import psutil
+
+from aimodelshare.exceptions import ModelConversionError, ConversionTimeoutError, \
+    ConversionMemoryError, ConversionCancelledError
+
+
+def _conversion_worker(conn):
+    '''Runs model_to_onnx for every job received on conn until it is closed.'''
+
+    from aimodelshare.aimsonnx import model_to_onnx, _dump_for_transfer
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        if job is None:
+            break
+
+        # classes defined in a notebook's __main__ cannot be imported in the worker
+        try:
+            model, kwargs = pickle.loads(job)
+        except BaseException as err:
+            conn.send(("unpickle", str(err)))
+            continue
+
+        try:
+            onx = model_to_onnx(model, **kwargs)
+            conn.send(("ok", _dump_for_transfer(onx)))
+        except MemoryError:
+            conn.send(("memory", "Model conversion to onnx ran out of memory."))
+        except BaseException as err:
+            conn.send(("error", str(err) + "\n" + traceback.format_exc()))
+
+
+def _convert_in_thread(model, kwargs, timeout):
+    '''Runs model_to_onnx in a daemon thread of this process, raising on timeout.
+
+    The thread cannot be killed, a timed out conversion keeps running in
+    the background until it finishes.'''
+
+    from aimodelshare.aimsonnx import model_to_onnx
+
+    warnings.warn("Model cannot be sent to the conversion worker, converting it in this process. "
+                  "Memory limit and cancel are not enforced.")
+
+    result = {}
+
+    def run():
+        try:
+            result["ok"] = model_to_onnx(model, **kwargs)
+        except BaseException as err:
+            result["error"] = err
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+
+    if thread.is_alive():
+        raise ConversionTimeoutError("Timeout: Model to ONNX conversion took longer than "
+                                     + str(timeout) + " seconds.")
+    if "error" in result:
+        raise result["error"]
+
+    return result["ok"]
+
+
+class ConversionExecutor:
+    '''Converts models to ONNX in a separate worker process.
+
+    The worker is killed when a conversion exceeds its wall-clock timeout
+    or memory limit, or when it is cancelled, which returns all of its
+    memory to the OS. The worker is reused for consecutive conversions and
+    restarted on demand after it was killed, or when the memory limit
+    changed since it was started. Models whose classes cannot be imported
+    in the worker, e.g. ones defined in a notebook, are converted in a
+    thread of this process with a warning. Only the timeout is enforced
+    for them.
+
+    Parameters:
+    timeout: float, default=60
+    Wall-clock limit in seconds for a single conversion. None disables it.
+
+    max_memory: int, default=None
+    Resident memory limit of the worker in bytes. None disables it.
+    '''
+
+    def __init__(self, timeout=60, max_memory=None, poll_interval=0.1):
+
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.poll_interval = poll_interval
+
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._process_max_memory = None
+        self._conn = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def _start(self, max_memory):
+
+        parent_conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(target=_conversion_worker, args=(child_conn,), daemon=True)
+        self._process.start()
+        self._process_max_memory = max_memory
+        child_conn.close()
+        self._conn = parent_conn
+
+    def _kill(self):
+
+        if self._process is not None:
+            try:
+                self._process.kill()
+            except AttributeError:
+                self._process.terminate()
+            self._process.join()
+
+        if self._conn is not None:
+            self._conn.close()
+
+        self._process = None
+        self._conn = None
+
+    def _worker_memory(self):
+
+        try:
+            return psutil.Process(self._process.pid).memory_info().rss
+        except psutil.Error:
+            return 0
+
+    def convert(self, model, timeout=None, max_memory=None, **kwargs):
+        '''Converts model with model_to_onnx in the worker process.
+
+        timeout and max_memory override the limits of the executor for this
+        call. Keyword arguments are passed on to model_to_onnx. Returns the
+        ONNX model object and raises ConversionTimeoutError,
+        ConversionMemoryError, ConversionCancelledError or
+        ModelConversionError on failure.'''
+
+        if timeout is None:
+            timeout = self.timeout
+        if max_memory is None:
+            max_memory = self.max_memory
+
+        # models that cannot be sent to another process are converted in process
+        try:
+            job = pickle.dumps((model, kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return _convert_in_thread(model, kwargs, timeout)
+
+        with self._lock:
+            self._cancelled.clear()
+
+            # a worker that grew under a larger budget is not reused for a smaller one
+            if self._process is not None and self._process_max_memory != max_memory:
+                self._kill()
+
+            if self._process is None or not self._process.is_alive():
+                self._start(max_memory)
+
+            start = time.time()
+            self._conn.send(job)
+
+            while True:
+
+                # results arriving after the timeout are rejected, however short it is
+                remaining = None if timeout is None else timeout - (time.time() - start)
+                if remaining is not None and remaining <= 0:
+                    self._kill()
+                    raise ConversionTimeoutError("Timeout: Model to ONNX conversion took longer than "
+                                                 + str(timeout) + " seconds.")
+
+                if self._conn.poll(self.poll_interval if remaining is None
+                                   else min(self.poll_interval, remaining)):
+                    if timeout is None or time.time() - start <= timeout:
+                        break
+                    continue
+
+                if self._cancelled.is_set():
+                    self._kill()
+                    raise ConversionCancelledError("Model to ONNX conversion was cancelled.")
+
+                if max_memory is not None and self._worker_memory() > max_memory:
+                    self._kill()
+                    raise ConversionMemoryError("Model to ONNX conversion exceeded memory limit of "
+                                                + str(round(max_memory/1e6)) + " MB.")
+
+                if not self._process.is_alive():
+                    self._kill()
+                    raise ModelConversionError("Model to ONNX conversion worker exited unexpectedly.")
+
+            try:
+                status, result = self._conn.recv()
+            except (EOFError, OSError):
+                self._kill()
+                raise ModelConversionError("Model to ONNX conversion worker exited unexpectedly.")
+
+        if status == "ok":
+            from aimodelshare.aimsonnx import _load_from_transfer
+            return _load_from_transfer(result)
+        elif status == "unpickle":
+            remaining = None if timeout is None else max(0, timeout - (time.time() - start))
+            return _convert_in_thread(model, kwargs, remaining)
+        elif status == "memory":
+            self._kill()
+            raise ConversionMemoryError(result)
+        else:
+            raise ModelConversionError(result)
+
+    def cancel(self):
+        '''Cancels running conversion, can be called from another thread.'''
+
+        self._cancelled.set()
+
+    def shutdown(self):
+        '''Stops worker process.'''
+
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.send(None)
+                except (OSError, ValueError):
+                    pass
+            if self._process is not None:
+                self._process.join(timeout=5)
+            self._kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+_conversion_executor = None
+
+
+def get_conversion_executor():
+    '''Returns process wide conversion executor.'''
+
+    global _conversion_executor
+
+    if _conversion_executor is None:
+        _conversion_executor = ConversionExecutor()
+        atexit.register(_conversion_executor.shutdown)
+
+    return _conversion_executor
+
+
+__all__ = [
+    ConversionExecutor,
+    get_conversion_executor
+]
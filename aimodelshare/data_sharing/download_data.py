@@ -4,7 +4,7 @@ import gzip
 from io import BytesIO
 import json
 import shutil
-import requests
+from aimodelshare import http_session
 import tempfile
 import tarfile
 import urllib3
@@ -14,7 +14,7 @@ from aimodelshare.data_sharing.utils import redo_with_write
 urllib3.disable_warnings()
 
 def get_auth_head_no_aws_auth(auth_url, registry, repository, type):
-	resp = requests.get('{}?service={}&scope=repository:{}:pull'.format(auth_url, registry, repository), verify=False)
+	resp = http_session.get('{}?service={}&scope=repository:{}:pull'.format(auth_url, registry, repository), verify=False)
 	access_token = resp.json()['token']
 	auth_head = {'Authorization':'Bearer '+ access_token, 'Accept': type}
 	return auth_head
@@ -87,10 +87,10 @@ def pull_image(image_uri):
 
 	auth_head = get_auth_head(auth_url, registry, repository)
 
-	resp = requests.get('https://{}/v2/{}/manifests/{}'.format(registry, repository, tag), headers=auth_head, verify=False)
+	resp = http_session.get('https://{}/v2/{}/manifests/{}'.format(registry, repository, tag), headers=auth_head, verify=False)
     
 	config = resp.json()['config']['digest']
-	config_resp = requests.get('https://{}/v2/{}/blobs/{}'.format(registry, repository, config), headers=auth_head, verify=False)
+	config_resp = http_session.get('https://{}/v2/{}/blobs/{}'.format(registry, repository, config), headers=auth_head, verify=False)
 
 	tmp_img_dir = tempfile.gettempdir() + '/' + 'tmp_{}_{}'.format(image, tag)
 	os.mkdir(tmp_img_dir)
@@ -114,7 +114,7 @@ def pull_image(image_uri):
 		layer_count += 1
 
 		auth_head = get_auth_head(auth_url, registry, repository) # done to keep from expiring
-		blobs_resp = requests.get('https://{}/v2/{}/blobs/{}'.format(registry, repository, layer['digest']), headers=auth_head, stream=True, verify=False)
+		blobs_resp = http_session.get('https://{}/v2/{}/blobs/{}'.format(registry, repository, layer['digest']), headers=auth_head, stream=True, verify=False)
 
 		layer_id, layer_dir = download_layer(layer, layer_count, tmp_img_dir, blobs_resp)
 		content[0]['Layers'].append(layer_id + '/layer.tar')
@@ -10,7 +10,7 @@ import time
 import json
 import boto3
 import tempfile
-import requests
+from aimodelshare import http_session
 import uuid
 
 delay=3
@@ -331,7 +331,7 @@ def share_dataset(data_directory="folder_file_path",classification="default", pr
     headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("JWT_AUTHORIZATION_TOKEN"), 'Access-Control-Allow-Headers':
                                    'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
     # modeltoapi lambda function invoked through below url to return new prediction api in response
-    response=requests.post("https://jyz9nn0joe.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+    response=http_session.post("https://jyz9nn0joe.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                   json=bodydata, headers=headers_with_authentication)
     return "Your dataset has been shared to modelshare.org."
 
@@ -1,6 +1,6 @@
 import boto3
 import os
-import requests
+from aimodelshare import http_session
 import uuid
 import json
 import math
@@ -182,14 +182,14 @@ def deploy_custom_lambda(input_json_exampledata, output_json_exampledata, lambda
                                    'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
     
     # modeltoapi lambda function invoked through below url to return new prediction api in response
-    requests.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+    http_session.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                   json=bodydata, headers=headers_with_authentication)
 
     # Get the response
     headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("JWT_AUTHORIZATION_TOKEN"), 'Access-Control-Allow-Headers':
                                    'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
     # modeltoapi lambda function invoked through below url to return new prediction api in response
-    response = requests.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+    response = http_session.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                               json=bodydata, headers=headers_with_authentication)
     response_string = response.text
     response_string = response_string[1:-1]
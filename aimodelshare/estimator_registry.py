@@ -0,0 +1,318 @@
+import re
+import functools
+import importlib
+
+
+# Estimator names and the modules they are imported from, precomputed so 
+# that looking up a model type does not scan whole packages. The same 
+# tables are rendered into the evaluation and prediction lambdas.
+SKLEARN_ESTIMATOR_MODULES = {
+    'ABCMeta': 'sklearn.naive_bayes',
+    'ARDRegression': 'sklearn.linear_model',
+    'AdaBoostClassifier': 'sklearn.ensemble',
+    'AdaBoostRegressor': 'sklearn.ensemble',
+    'BaggingClassifier': 'sklearn.ensemble',
+    'BaggingRegressor': 'sklearn.ensemble',
+    'BallTree': 'sklearn.neighbors',
+    'BaseDecisionTree': 'sklearn.tree',
+    'BaseEnsemble': 'sklearn.ensemble',
+    'BaseEstimator': 'sklearn.naive_bayes',
+    'BayesianGaussianMixture': 'sklearn.mixture',
+    'BayesianRidge': 'sklearn.linear_model',
+    'BernoulliNB': 'sklearn.naive_bayes',
+    'BernoulliRBM': 'sklearn.neural_network',
+    'CategoricalNB': 'sklearn.naive_bayes',
+    'ClassifierMixin': 'sklearn.naive_bayes',
+    'ComplementNB': 'sklearn.naive_bayes',
+    'DecisionTreeClassifier': 'sklearn.tree',
+    'DecisionTreeRegressor': 'sklearn.tree',
+    'DistanceMetric': 'sklearn.neighbors',
+    'ElasticNet': 'sklearn.linear_model',
+    'ElasticNetCV': 'sklearn.linear_model',
+    'ExtraTreeClassifier': 'sklearn.tree',
+    'ExtraTreeRegressor': 'sklearn.tree',
+    'ExtraTreesClassifier': 'sklearn.ensemble',
+    'ExtraTreesRegressor': 'sklearn.ensemble',
+    'GammaRegressor': 'sklearn.linear_model',
+    'GaussianMixture': 'sklearn.mixture',
+    'GaussianNB': 'sklearn.naive_bayes',
+    'GaussianProcessClassifier': 'sklearn.gaussian_process',
+    'GaussianProcessRegressor': 'sklearn.gaussian_process',
+    'GradientBoostingClassifier': 'sklearn.ensemble',
+    'GradientBoostingRegressor': 'sklearn.ensemble',
+    'Hinge': 'sklearn.linear_model',
+    'HistGradientBoostingClassifier': 'sklearn.ensemble',
+    'HistGradientBoostingRegressor': 'sklearn.ensemble',
+    'Huber': 'sklearn.linear_model',
+    'HuberRegressor': 'sklearn.linear_model',
+    'IsolationForest': 'sklearn.ensemble',
+    'IsotonicRegression': 'sklearn.isotonic',
+    'KDTree': 'sklearn.neighbors',
+    'KNeighborsClassifier': 'sklearn.neighbors',
+    'KNeighborsRegressor': 'sklearn.neighbors',
+    'KNeighborsTransformer': 'sklearn.neighbors',
+    'KernelDensity': 'sklearn.neighbors',
+    'LabelBinarizer': 'sklearn.naive_bayes',
+    'Lars': 'sklearn.linear_model',
+    'LarsCV': 'sklearn.linear_model',
+    'Lasso': 'sklearn.linear_model',
+    'LassoCV': 'sklearn.linear_model',
+    'LassoLars': 'sklearn.linear_model',
+    'LassoLarsCV': 'sklearn.linear_model',
+    'LassoLarsIC': 'sklearn.linear_model',
+    'LinearRegression': 'sklearn.linear_model',
+    'LinearSVC': 'sklearn.svm',
+    'LinearSVR': 'sklearn.svm',
+    'LocalOutlierFactor': 'sklearn.neighbors',
+    'Log': 'sklearn.linear_model',
+    'LogisticRegression': 'sklearn.linear_model',
+    'LogisticRegressionCV': 'sklearn.linear_model',
+    'MLPClassifier': 'sklearn.neural_network',
+    'MLPRegressor': 'sklearn.neural_network',
+    'MetaEstimatorMixin': 'sklearn.multiclass',
+    'ModifiedHuber': 'sklearn.linear_model',
+    'MultiOutputMixin': 'sklearn.multiclass',
+    'MultiTaskElasticNet': 'sklearn.linear_model',
+    'MultiTaskElasticNetCV': 'sklearn.linear_model',
+    'MultiTaskLasso': 'sklearn.linear_model',
+    'MultiTaskLassoCV': 'sklearn.linear_model',
+    'MultinomialNB': 'sklearn.naive_bayes',
+    'NearestCentroid': 'sklearn.neighbors',
+    'NearestNeighbors': 'sklearn.neighbors',
+    'NeighborhoodComponentsAnalysis': 'sklearn.neighbors',
+    'NotFittedError': 'sklearn.multiclass',
+    'NuSVC': 'sklearn.svm',
+    'NuSVR': 'sklearn.svm',
+    'OneClassSVM': 'sklearn.svm',
+    'OneVsOneClassifier': 'sklearn.multiclass',
+    'OneVsRestClassifier': 'sklearn.multiclass',
+    'OrthogonalMatchingPursuit': 'sklearn.linear_model',
+    'OrthogonalMatchingPursuitCV': 'sklearn.linear_model',
+    'OutputCodeClassifier': 'sklearn.multiclass',
+    'Parallel': 'sklearn.multiclass',
+    'PassiveAggressiveClassifier': 'sklearn.linear_model',
+    'PassiveAggressiveRegressor': 'sklearn.linear_model',
+    'Perceptron': 'sklearn.linear_model',
+    'PoissonRegressor': 'sklearn.linear_model',
+    'QuantileRegressor': 'sklearn.linear_model',
+    'RANSACRegressor': 'sklearn.linear_model',
+    'RadiusNeighborsClassifier': 'sklearn.neighbors',
+    'RadiusNeighborsRegressor': 'sklearn.neighbors',
+    'RadiusNeighborsTransformer': 'sklearn.neighbors',
+    'RandomForestClassifier': 'sklearn.ensemble',
+    'RandomForestRegressor': 'sklearn.ensemble',
+    'RandomTreesEmbedding': 'sklearn.ensemble',
+    'RegressorMixin': 'sklearn.isotonic',
+    'Ridge': 'sklearn.linear_model',
+    'RidgeCV': 'sklearn.linear_model',
+    'RidgeClassifier': 'sklearn.linear_model',
+    'RidgeClassifierCV': 'sklearn.linear_model',
+    'SGDClassifier': 'sklearn.linear_model',
+    'SGDOneClassSVM': 'sklearn.linear_model',
+    'SGDRegressor': 'sklearn.linear_model',
+    'SVC': 'sklearn.svm',
+    'SVR': 'sklearn.svm',
+    'SquaredLoss': 'sklearn.linear_model',
+    'StackingClassifier': 'sklearn.ensemble',
+    'StackingRegressor': 'sklearn.ensemble',
+    'TheilSenRegressor': 'sklearn.linear_model',
+    'TransformerMixin': 'sklearn.isotonic',
+    'TweedieRegressor': 'sklearn.linear_model',
+    'VotingClassifier': 'sklearn.ensemble',
+    'VotingRegressor': 'sklearn.ensemble'}
+
+PYSPARK_ESTIMATOR_MODULES = {
+    'AFTSurvivalRegression': 'pyspark.ml.regression',
+    'AFTSurvivalRegressionModel': 'pyspark.ml.regression',
+    'Binarizer': 'pyspark.ml.feature',
+    'BisectingKMeans': 'pyspark.ml.clustering',
+    'BisectingKMeansModel': 'pyspark.ml.clustering',
+    'BucketedRandomProjectionLSH': 'pyspark.ml.feature',
+    'BucketedRandomProjectionLSHModel': 'pyspark.ml.feature',
+    'Bucketizer': 'pyspark.ml.feature',
+    'ChiSqSelector': 'pyspark.ml.feature',
+    'ChiSqSelectorModel': 'pyspark.ml.feature',
+    'CountVectorizer': 'pyspark.ml.feature',
+    'CountVectorizerModel': 'pyspark.ml.feature',
+    'DCT': 'pyspark.ml.feature',
+    'DecisionTreeClassificationModel': 'pyspark.ml.classification',
+    'DecisionTreeClassifier': 'pyspark.ml.classification',
+    'DecisionTreeRegressionModel': 'pyspark.ml.regression',
+    'DecisionTreeRegressor': 'pyspark.ml.regression',
+    'DistributedLDAModel': 'pyspark.ml.clustering',
+    'ElementwiseProduct': 'pyspark.ml.feature',
+    'Estimator': 'pyspark.ml',
+    'FMClassificationModel': 'pyspark.ml.classification',
+    'FMClassifier': 'pyspark.ml.classification',
+    'FMRegressionModel': 'pyspark.ml.regression',
+    'FMRegressor': 'pyspark.ml.regression',
+    'FeatureHasher': 'pyspark.ml.feature',
+    'GBTClassificationModel': 'pyspark.ml.classification',
+    'GBTClassifier': 'pyspark.ml.classification',
+    'GBTRegressionModel': 'pyspark.ml.regression',
+    'GBTRegressor': 'pyspark.ml.regression',
+    'GaussianMixture': 'pyspark.ml.clustering',
+    'GaussianMixtureModel': 'pyspark.ml.clustering',
+    'GeneralizedLinearRegression': 'pyspark.ml.regression',
+    'GeneralizedLinearRegressionModel': 'pyspark.ml.regression',
+    'HashingTF': 'pyspark.ml.feature',
+    'IDF': 'pyspark.ml.feature',
+    'IDFModel': 'pyspark.ml.feature',
+    'Imputer': 'pyspark.ml.feature',
+    'ImputerModel': 'pyspark.ml.feature',
+    'IndexToString': 'pyspark.ml.feature',
+    'Interaction': 'pyspark.ml.feature',
+    'IsotonicRegression': 'pyspark.ml.regression',
+    'IsotonicRegressionModel': 'pyspark.ml.regression',
+    'KMeans': 'pyspark.ml.clustering',
+    'KMeansModel': 'pyspark.ml.clustering',
+    'LDA': 'pyspark.ml.clustering',
+    'LDAModel': 'pyspark.ml.clustering',
+    'LinearRegression': 'pyspark.ml.regression',
+    'LinearRegressionModel': 'pyspark.ml.regression',
+    'LinearSVC': 'pyspark.ml.classification',
+    'LinearSVCModel': 'pyspark.ml.classification',
+    'LocalLDAModel': 'pyspark.ml.clustering',
+    'LogisticRegression': 'pyspark.ml.classification',
+    'LogisticRegressionModel': 'pyspark.ml.classification',
+    'MaxAbsScaler': 'pyspark.ml.feature',
+    'MaxAbsScalerModel': 'pyspark.ml.feature',
+    'MinHashLSH': 'pyspark.ml.feature',
+    'MinHashLSHModel': 'pyspark.ml.feature',
+    'MinMaxScaler': 'pyspark.ml.feature',
+    'MinMaxScalerModel': 'pyspark.ml.feature',
+    'Model': 'pyspark.ml',
+    'MultilayerPerceptronClassificationModel': 'pyspark.ml.classification',
+    'MultilayerPerceptronClassifier': 'pyspark.ml.classification',
+    'NGram': 'pyspark.ml.feature',
+    'NaiveBayes': 'pyspark.ml.classification',
+    'NaiveBayesModel': 'pyspark.ml.classification',
+    'Normalizer': 'pyspark.ml.feature',
+    'OneHotEncoder': 'pyspark.ml.feature',
+    'OneHotEncoderModel': 'pyspark.ml.feature',
+    'OneVsRest': 'pyspark.ml.classification',
+    'OneVsRestModel': 'pyspark.ml.classification',
+    'PCA': 'pyspark.ml.feature',
+    'PCAModel': 'pyspark.ml.feature',
+    'Pipeline': 'pyspark.ml',
+    'PipelineModel': 'pyspark.ml',
+    'PolynomialExpansion': 'pyspark.ml.feature',
+    'PowerIterationClustering': 'pyspark.ml.clustering',
+    'PredictionModel': 'pyspark.ml',
+    'Predictor': 'pyspark.ml',
+    'QuantileDiscretizer': 'pyspark.ml.feature',
+    'RFormula': 'pyspark.ml.feature',
+    'RFormulaModel': 'pyspark.ml.feature',
+    'RandomForestClassificationModel': 'pyspark.ml.classification',
+    'RandomForestClassifier': 'pyspark.ml.classification',
+    'RandomForestRegressionModel': 'pyspark.ml.regression',
+    'RandomForestRegressor': 'pyspark.ml.regression',
+    'RegexTokenizer': 'pyspark.ml.feature',
+    'RobustScaler': 'pyspark.ml.feature',
+    'RobustScalerModel': 'pyspark.ml.feature',
+    'SQLTransformer': 'pyspark.ml.feature',
+    'StandardScaler': 'pyspark.ml.feature',
+    'StandardScalerModel': 'pyspark.ml.feature',
+    'StopWordsRemover': 'pyspark.ml.feature',
+    'StringIndexer': 'pyspark.ml.feature',
+    'StringIndexerModel': 'pyspark.ml.feature',
+    'Tokenizer': 'pyspark.ml.feature',
+    'Transformer': 'pyspark.ml',
+    'UnaryTransformer': 'pyspark.ml',
+    'UnivariateFeatureSelector': 'pyspark.ml.feature',
+    'UnivariateFeatureSelectorModel': 'pyspark.ml.feature',
+    'VarianceThresholdSelector': 'pyspark.ml.feature',
+    'VarianceThresholdSelectorModel': 'pyspark.ml.feature',
+    'VectorAssembler': 'pyspark.ml.feature',
+    'VectorIndexer': 'pyspark.ml.feature',
+    'VectorIndexerModel': 'pyspark.ml.feature',
+    'VectorSizeHint': 'pyspark.ml.feature',
+    'VectorSlicer': 'pyspark.ml.feature',
+    'Word2Vec': 'pyspark.ml.feature',
+    'Word2VecModel': 'pyspark.ml.feature'}
+
+_ESTIMATOR_MODULES = {'sklearn': SKLEARN_ESTIMATOR_MODULES,
+                      'pyspark': PYSPARK_ESTIMATOR_MODULES}
+
+_ESTIMATOR_PACKAGES = {'sklearn': ['sklearn.ensemble', 'sklearn.gaussian_process', 'sklearn.isotonic',
+                                   'sklearn.linear_model', 'sklearn.mixture', 'sklearn.multiclass',
+                                   'sklearn.naive_bayes', 'sklearn.neighbors', 'sklearn.neural_network',
+                                   'sklearn.svm', 'sklearn.tree'],
+                       'pyspark': ['pyspark.ml', 'pyspark.ml.feature', 'pyspark.ml.classification',
+                                   'pyspark.ml.clustering', 'pyspark.ml.regression']}
+
+
+@functools.lru_cache(maxsize=None)
+def _scan_estimator_modules(framework):
+    '''Scans framework packages for estimator classes, used for names missing 
+    from the precomputed tables, e.g. estimators added in newer versions.'''
+
+    from aimodelshare.aimsonnx import _import_framework
+
+    models_modules_dict = {}
+
+    for module_name in _ESTIMATOR_PACKAGES[framework]:
+        module = _import_framework(module_name)
+        for name in dir(module):
+            if re.match('^[A-Z]', name) and callable(getattr(module, name)):
+                models_modules_dict[name] = module_name
+
+    return models_modules_dict
+
+
+def estimator_modules(framework='sklearn', scan=False):
+    '''Returns dict of estimator names and their modules for sklearn or pyspark.
+
+    Parameters:
+    framework: str, 'sklearn' or 'pyspark'
+    scan: bool, default=False
+    If True, adds estimators found by scanning the installed framework.
+    '''
+
+    models_modules_dict = dict(_ESTIMATOR_MODULES[framework])
+
+    if scan:
+        for name, module_name in _scan_estimator_modules(framework).items():
+            models_modules_dict.setdefault(name, module_name)
+
+    return models_modules_dict
+
+
+@functools.lru_cache(maxsize=None)
+def estimator_class(model_type, framework='sklearn'):
+    '''Returns estimator class for model type name.'''
+
+    module_name = _ESTIMATOR_MODULES[framework].get(model_type)
+
+    if module_name is None:
+        module_name = _scan_estimator_modules(framework)[model_type]
+
+    return getattr(importlib.import_module(module_name), model_type)
+
+
+@functools.lru_cache(maxsize=None)
+def _default_params(model_type, framework):
+
+    default = estimator_class(model_type, framework)()
+
+    if framework == 'pyspark':
+        # parameter map of the estimator, sorted to match stored model configs
+        return tuple(sorted((key.name, value) for key, value in default.extractParamMap().items()))
+
+    return tuple(default.get_params().items())
+
+
+def default_params(model_type, framework='sklearn'):
+    '''Returns dict of default hyperparameters of an estimator, the estimator 
+    is instantiated once per process and model type.'''
+
+    return dict(_default_params(model_type, framework))
+
+
+__all__ = [
+    SKLEARN_ESTIMATOR_MODULES,
+    PYSPARK_ESTIMATOR_MODULES,
+    estimator_modules,
+    estimator_class,
+    default_params
+]
@@ -9,3 +9,23 @@ class AWSAccessError(Exception):
 class AWSUploadError(Exception):
     def __init__(self, error):
         Exception.__init__(self, error)
+
+class ModelConversionError(Exception):
+    def __init__(self, error):
+        Exception.__init__(self, error)
+
+class ConversionTimeoutError(ModelConversionError):
+    def __init__(self, error):
+        ModelConversionError.__init__(self, error)
+
+class ConversionMemoryError(ModelConversionError):
+    def __init__(self, error):
+        ModelConversionError.__init__(self, error)
+
+class ConversionCancelledError(ModelConversionError):
+    def __init__(self, error):
+        ModelConversionError.__init__(self, error)
+
+class QuantizationAccuracyError(ModelConversionError):
+    def __init__(self, error):
+        ModelConversionError.__init__(self, error)
@@ -4,7 +4,7 @@ import botocore
 import os
 import jwt
 from numpy.core.fromnumeric import var
-import requests
+from aimodelshare import http_session
 import uuid
 import json
 import math
@@ -19,7 +19,7 @@ import mimetypes
 import numpy as np
 import pandas as pd
 from aimodelshare.tools import extract_varnames_fromtrainingdata, _get_extension_from_filepath
-from aimodelshare.aws import get_s3_iam_client, run_function_on_lambda, get_token, get_aws_token, get_aws_client
+from aimodelshare.aws import get_s3_iam_client, resolve_playground, get_token, get_aws_token, get_aws_client
 from aimodelshare.bucketpolicy import _custom_upload_policy
 from aimodelshare.exceptions import AuthorizationError, AWSAccessError, AWSUploadError
 from aimodelshare.api import get_api_json
@@ -27,7 +27,8 @@ from aimodelshare.modeluser import create_user_getkeyandpassword
 from aimodelshare.preprocessormodules import upload_preprocessor
 from aimodelshare.model import _get_predictionmodel_key, _extract_model_metadata
 from aimodelshare.data_sharing.share_data import share_data_codebuild
-from aimodelshare.aimsonnx import _get_metadata
+from aimodelshare.aimsonnx import _get_metadata, onnx_to_ort, save_onnx, _needs_external_data, EXTERNAL_DATA_LOCATION
+from aimodelshare.aimsonnx import _local_weights_artifact
 from aimodelshare.utils import HiddenPrints
 
 def take_user_info_and_generate_api(model_filepath, model_type, categorical,labels, preprocessor_filepath,
@@ -124,13 +125,20 @@ def take_user_info_and_generate_api(model_filepath, model_type, categorical,labe
         model = model_filepath
         temp_prep=tempfile.mkdtemp()
         Filepath = temp_prep+"/model.onnx"
-        with open(Filepath, "wb") as f:
-            f.write(model.SerializeToString())
+        save_onnx(model, Filepath)
     else:
         Filepath = model_filepath
         model = onnx.load(model_filepath)
+    external_data_filepath = os.path.join(os.path.dirname(os.path.abspath(Filepath)), EXTERNAL_DATA_LOCATION)
     metadata = _extract_model_metadata(model)
     input_shape = metadata["input_shape"]
+
+    # native weights live in the local artifact store, the onnx file only references them
+    try:
+        weights_artifact = _get_metadata(model).get('weights_artifact')
+    except Exception:
+        weights_artifact = None
+    weights_filepath = _local_weights_artifact(weights_artifact) if weights_artifact is not None else None
     #tab_imports ='./tabular_imports.pkl'
     #img_imports ='./image_imports.pkl'
     file_extension = _get_extension_from_filepath(Filepath)
@@ -145,6 +153,29 @@ def take_user_info_and_generate_api(model_filepath, model_type, categorical,labe
         s3["client"].upload_file(Filepath, os.environ.get("BUCKET_NAME"),  file_key)
         s3["client"].upload_file(Filepath, os.environ.get("BUCKET_NAME"),  versionfile_key)
 
+        # models larger than 2GB keep their tensors in a separate external data file
+        if os.path.exists(external_data_filepath):
+            s3["client"].upload_file(external_data_filepath, os.environ.get("BUCKET_NAME"),  file_key + ".data")
+            s3["client"].upload_file(external_data_filepath, os.environ.get("BUCKET_NAME"),  versionfile_key + ".data")
+
+        if weights_filepath is not None:
+            s3["client"].upload_file(weights_filepath, os.environ.get("BUCKET_NAME"),  unique_model_id + "/runtime_model.weights")
+
+        # upload pre-optimized ORT format model for models optimized with optimize_onnx
+        try:
+            optimization_level = _get_metadata(model).get('onnx_optimization_level')
+        except Exception:
+            optimization_level = None
+
+        # ORT format models are limited to 2GB like serialized onnx models
+        if optimization_level is not None and _needs_external_data(model):
+            optimization_level = None
+
+        if optimization_level is not None:
+            s3["client"].put_object(Body=onnx_to_ort(model, optimization_level),
+                                    Bucket=os.environ.get("BUCKET_NAME"),
+                                    Key=unique_model_id + "/runtime_model.ort")
+
         # preprocessor upload
         #s3["client"].upload_file(tab_imports, os.environ.get("BUCKET_NAME"),  'tabular_imports.pkl')
         #s3["client"].upload_file(img_imports, os.environ.get("BUCKET_NAME"),  'image_imports.pkl')
@@ -171,6 +202,9 @@ def take_user_info_and_generate_api(model_filepath, model_type, categorical,labe
             runtime_preprocessor_type = "others"
         runtime_data = {}
         runtime_data["runtime_model"] = {"name": "runtime_model.onnx"}
+        if optimization_level is not None:
+            runtime_data["runtime_model"]["ort_name"] = "runtime_model.ort"
+            runtime_data["runtime_model"]["optimization_level"] = optimization_level
         runtime_data["runtime_preprocessor"] = runtime_preprocessor_type
             
         #runtime_data = {"runtime_model": {"name": "runtime_model.onnx"},"runtime_preprocessor": runtime_preprocessor_type }
@@ -240,7 +274,8 @@ def upload_model_metadata(model, s3, bucket, model_id):
     model_metadata = {
         "model_config": meta_dict["model_config"],
         "ml_framework": meta_dict["ml_framework"],
-        "model_type": meta_dict["model_type"]
+        "model_type": meta_dict["model_type"],
+        "weights_artifact": meta_dict.get("weights_artifact")
     }
 
     temp = tempfile.mkdtemp()
@@ -342,7 +377,7 @@ def send_model_data_to_dyndb_and_return_api(api_info, private, categorical, prep
     headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("JWT_AUTHORIZATION_TOKEN"), 'Access-Control-Allow-Headers':
                                    'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
     # modeltoapi lambda function invoked through below url to return new prediction api in response
-    response = requests.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+    response = http_session.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                               json=bodydata, headers=headers_with_authentication)
     response_string = response.text
     response_string = response_string[1:-1]
@@ -606,13 +641,7 @@ def create_competition(apiurl, data_directory, y_test, eval_metric_filepath=None
     s3, iam, region = get_s3_iam_client(os.environ.get("AWS_ACCESS_KEY_ID_AIMS"), os.environ.get("AWS_SECRET_ACCESS_KEY_AIMS"), os.environ.get("AWS_REGION_AIMS"))
     
     # Get bucket and model_id subfolder for user based on apiurl {{{
-    response, error = run_function_on_lambda(
-        apiurl, **{"delete": "FALSE", "versionupdateget": "TRUE"}
-    )
-    if error is not None:
-        raise error
-
-    _, api_bucket, model_id = json.loads(response.content.decode("utf-8"))
+    api_bucket, model_id = resolve_playground(apiurl)
     # }}} 
     
     # upload y_test data: 
@@ -711,7 +740,7 @@ def create_competition(apiurl, data_directory, y_test, eval_metric_filepath=None
     headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("JWT_AUTHORIZATION_TOKEN"), 'Access-Control-Allow-Headers':
                                    'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
     # modeltoapi lambda function invoked through below url to return new prediction api in response
-    requests.post("https://o35jwfakca.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+    http_session.post("https://o35jwfakca.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                   json=bodydata, headers=headers_with_authentication)
 
       
@@ -771,13 +800,7 @@ def create_experiment(apiurl, data_directory, y_test, eval_metric_filepath=None,
     s3, iam, region = get_s3_iam_client(os.environ.get("AWS_ACCESS_KEY_ID_AIMS"), os.environ.get("AWS_SECRET_ACCESS_KEY_AIMS"), os.environ.get("AWS_REGION_AIMS"))
     
     # Get bucket and model_id subfolder for user based on apiurl {{{
-    response, error = run_function_on_lambda(
-        apiurl, **{"delete": "FALSE", "versionupdateget": "TRUE"}
-    )
-    if error is not None:
-        raise error
-
-    _, api_bucket, model_id = json.loads(response.content.decode("utf-8"))
+    api_bucket, model_id = resolve_playground(apiurl)
     # }}} 
     
     # upload y_test data: 
@@ -877,7 +900,7 @@ def create_experiment(apiurl, data_directory, y_test, eval_metric_filepath=None,
     headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("JWT_AUTHORIZATION_TOKEN"), 'Access-Control-Allow-Headers':
                                    'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
     # modeltoapi lambda function invoked through below url to return new prediction api in response
-    requests.post("https://o35jwfakca.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+    http_session.post("https://o35jwfakca.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                   json=bodydata, headers=headers_with_authentication)
 
       
@@ -918,13 +941,7 @@ def _create_public_private_split_json(apiurl, split=0.5, submission_type='compet
       s3 = user_sess.resource('s3')
 
       # Get bucket and model_id for user based on apiurl {{{
-      response, error = run_function_on_lambda(
-          apiurl, **{"delete": "FALSE", "versionupdateget": "TRUE"}
-      )
-      if error is not None:
-          raise error
-
-      _, api_bucket, model_id = json.loads(response.content.decode("utf-8"))
+      api_bucket, model_id = resolve_playground(apiurl)
       # }}}
       
       import json  
@@ -962,13 +979,7 @@ def _create_competitionuserauth_json(apiurl, email_list=[],public=False, datauri
       s3 = user_sess.resource('s3')
 
       # Get bucket and model_id for user based on apiurl {{{
-      response, error = run_function_on_lambda(
-          apiurl, **{"delete": "FALSE", "versionupdateget": "TRUE"}
-      )
-      if error is not None:
-          raise error
-
-      _, api_bucket, model_id = json.loads(response.content.decode("utf-8"))
+      api_bucket, model_id = resolve_playground(apiurl)
       # }}}
 
       
@@ -1014,7 +1025,7 @@ def update_playground_access_list(apiurl, email_list=[], update_type="Add"):
     headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("JWT_AUTHORIZATION_TOKEN"), 'Access-Control-Allow-Headers':
                                 'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
     # modeltoapi lambda function invoked through below url to return new prediction api in response
-    response = requests.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+    response = http_session.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                             json=bodydata, headers=headers_with_authentication)
     response_string = response.text
     response_string = response_string[1:-1]
@@ -1034,7 +1045,7 @@ def get_playground_access_list(apiurl):
     headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("JWT_AUTHORIZATION_TOKEN"), 'Access-Control-Allow-Headers':
                                 'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
     # modeltoapi lambda function invoked through below url to return new prediction api in response
-    response = requests.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+    response = http_session.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                             json=bodydata, headers=headers_with_authentication)
     response_string = response.text
     response_string = response_string[1:-1]
@@ -1085,13 +1096,7 @@ def update_access_list(apiurl, email_list=[],update_type="Add", submission_type=
       s3 = user_sess.resource('s3')
 
       # Get bucket and model_id for user based on apiurl {{{
-      response, error = run_function_on_lambda(
-          apiurl, **{"delete": "FALSE", "versionupdateget": "TRUE"}
-      )
-      if error is not None:
-          raise error
-
-      _, api_bucket, model_id = json.loads(response.content.decode("utf-8"))
+      api_bucket, model_id = resolve_playground(apiurl)
       # }}}
 
       email_list=json.loads(json.dumps(email_list))
@@ -1172,12 +1177,12 @@ def _confirm_libraries_exist(requirements):
   requirements = requirements.split(",")
   for i in range(len(requirements)):
       requirements[i] = requirements[i].strip(" ")
-      exists = requests.get("https://pypi.org/project/" + requirements[i]) 
+      exists = http_session.get("https://pypi.org/project/" + requirements[i]) 
       if exists.status_code == 404:
           try_again_message = ("The entered library '" + requirements[i] + "' was not found. "
                                 "Please confirm and re-submit library name: ")
           requirements[i] = input(try_again_message)
-          exists = requests.get("https://pypi.org/project/" + requirements[i])
+          exists = http_session.get("https://pypi.org/project/" + requirements[i])
   
           if exists.status_code == 404:
               error_message = ("ModuleNotFoundError: No module named '" + requirements[i] + "' found in the Python Package Index (PyPI). \n"
@@ -0,0 +1,295 @@
+import os
+import time
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import NewConnectionError
+
+
+# Every network call of the client goes through one pooled session, so
+# consecutive calls to API Gateway and S3 reuse their TCP and TLS
+# connections, share timeouts and retry transient failures.
+
+DEFAULT_TIMEOUT = (10, 300)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_POOL_MAXSIZE = 16
+
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'])
+
+
+def _env_timeout():
+
+    value = os.environ.get('AIMODELSHARE_HTTP_TIMEOUT')
+    if value is None:
+        return DEFAULT_TIMEOUT
+
+    return float(value)
+
+
+class HttpSession:
+    '''Pooled HTTP session with timeouts and retries shared by the client.
+
+    All retries happen in request, with exponential backoff and jitter.
+    Connection errors are retried for every method, as the request never
+    reached the server. Responses with a retryable status code and read
+    errors are only retried for idempotent requests without file or
+    streamed bodies. POST requests that only read data can opt in with
+    idempotent=True.
+
+    Parameters:
+    timeout: float or (connect, read) tuple, default=(10, 300)
+    Timeout in seconds used when a call does not pass its own.
+
+    retries: int, default=3
+    Number of retries after the first attempt.
+
+    backoff_factor: float, default=0.5
+    Retry n waits backoff_factor * 2**n seconds plus jitter.
+
+    pool_maxsize: int, default=16
+    Connections kept alive per host, should cover concurrent uploads.
+
+    http2: bool, default=False
+    Send requests without file or streamed bodies over HTTP/2. Needs httpx
+    with its http2 extra, falls back to HTTP/1.1 if it is not installed.
+    Responses and errors are returned as their requests counterparts.
+    '''
+
+    def __init__(self, timeout=None, retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, http2=False):
+
+        self.timeout = timeout if timeout is not None else _env_timeout()
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+        # retries are handled by request only, the adapter sends every attempt once
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=0)
+        self._session = requests.Session()
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+        self._http2_client = None
+        if http2:
+            try:
+                import httpx
+                self._http2_client = httpx.Client(http2=True, timeout=_httpx_timeout(httpx, self.timeout),
+                                                  limits=httpx.Limits(max_keepalive_connections=pool_maxsize))
+            except ImportError:
+                pass
+
+    def _backoff(self, attempt):
+
+        time.sleep(self.backoff_factor * 2**attempt * (1 + random.random()))
+
+    def _send(self, method, url, **kwargs):
+
+        if self._http2_client is not None and _http2_compatible(kwargs):
+            return _send_httpx(self._http2_client, method, url, kwargs)
+
+        return self._session.request(method, url, **kwargs)
+
+    def request(self, method, url, idempotent=None, retries=None, **kwargs):
+        '''Sends request through the pooled session and returns its response.
+
+        retries overrides the number of retries of the session for this request.'''
+
+        if retries is None:
+            retries = self.retries
+
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+
+        kwargs.setdefault('timeout', self.timeout)
+
+        # streamed and file bodies cannot be sent twice once the server read them
+        idempotent = idempotent and not _has_stream_body(kwargs)
+
+        for attempt in range(retries + 1):
+            try:
+                response = self._send(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                if attempt == retries or not (idempotent or _is_connect_error(err)):
+                    raise
+                self._backoff(attempt)
+                continue
+
+            if not idempotent or response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                return response
+
+            self._backoff(attempt)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+
+        self._session.close()
+        if self._http2_client is not None:
+            self._http2_client.close()
+
+
+class _Http2ConnectError(requests.ConnectionError):
+    '''Connection error of the HTTP/2 client raised before the request was sent.'''
+
+
+def _is_connect_error(err):
+    '''Returns whether a request failed before it reached the server.'''
+
+    if isinstance(err, (requests.ConnectTimeout, _Http2ConnectError)):
+        return True
+
+    # requests wraps urllib3 errors, connection failures carry a NewConnectionError reason
+    reason = getattr(err.args[0], 'reason', None) if err.args else None
+
+    return isinstance(reason, NewConnectionError)
+
+
+def _send_httpx(client, method, url, kwargs):
+    '''Sends request with httpx and returns it as requests.Response, raising requests errors.'''
+
+    import httpx
+
+    try:
+        response = client.request(method, url, **_httpx_kwargs(kwargs))
+    except httpx.ConnectTimeout as err:
+        raise requests.ConnectTimeout(str(err))
+    except httpx.ConnectError as err:
+        raise _Http2ConnectError(str(err))
+    except httpx.TimeoutException as err:
+        raise requests.ReadTimeout(str(err))
+    except httpx.TransportError as err:
+        raise requests.ConnectionError(str(err))
+
+    result = requests.Response()
+    result.status_code = response.status_code
+    result.headers = CaseInsensitiveDict(response.headers)
+    result.url = str(response.url)
+    result.reason = response.reason_phrase
+    result.encoding = response.encoding
+    result._content = response.content
+    result._content_consumed = True
+
+    return result
+
+
+def _has_stream_body(kwargs):
+
+    data = kwargs.get('data')
+
+    return kwargs.get('files') is not None or \
+        (data is not None and not isinstance(data, (str, bytes, dict, list, tuple)))
+
+
+def _http2_compatible(kwargs):
+
+    return not _has_stream_body(kwargs) and not kwargs.get('stream') and kwargs.get('verify', True) is True
+
+
+def _httpx_timeout(httpx, timeout):
+
+    if isinstance(timeout, tuple):
+        return httpx.Timeout(timeout[1], connect=timeout[0])
+
+    return httpx.Timeout(timeout)
+
+
+def _httpx_kwargs(kwargs):
+    '''Translates requests keyword arguments to httpx.'''
+
+    import httpx
+
+    kwargs = dict(kwargs)
+    kwargs.pop('verify', None)
+    kwargs.pop('stream', None)
+
+    if 'timeout' in kwargs:
+        kwargs['timeout'] = _httpx_timeout(httpx, kwargs['timeout'])
+
+    # raw bodies are passed as content, form fields stay data
+    if isinstance(kwargs.get('data'), (str, bytes)):
+        kwargs['content'] = kwargs.pop('data')
+
+    return kwargs
+
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session():
+    '''Returns process wide HTTP session.'''
+
+    global _http_session
+
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                _http_session = HttpSession(http2=os.environ.get('AIMODELSHARE_HTTP2', '').lower() in ['1', 'true'])
+
+    return _http_session
+
+
+def configure_http(**kwargs):
+    '''Replaces process wide HTTP session, keyword arguments are passed to HttpSession.'''
+
+    global _http_session
+
+    with _http_session_lock:
+        if _http_session is not None:
+            _http_session.close()
+        _http_session = HttpSession(**kwargs)
+
+    return _http_session
+
+
+def request(method, url, **kwargs):
+    '''Sends request through the process wide HTTP session.'''
+
+    return get_http_session().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    '''Sends GET request through the process wide HTTP session.'''
+
+    return get_http_session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    '''Sends POST request through the process wide HTTP session.'''
+
+    return get_http_session().post(url, **kwargs)
+
+
+def download_file(url, out, chunk_size=1024**2):
+    '''Streams url into file out and returns its path, raises on error responses.'''
+
+    response = get(url, stream=True)
+    try:
+        response.raise_for_status()
+        with open(out, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+    finally:
+        response.close()
+
+    return out
+
+
+__all__ = [
+    HttpSession,
+    get_http_session,
+    configure_http,
+    request,
+    get,
+    post,
+    download_file
+]
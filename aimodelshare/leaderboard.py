@@ -2,9 +2,7 @@ import json
 import numpy as np
 import pandas as pd
 import os
-import requests
-
-import matplotlib.pyplot as plt
+from aimodelshare import http_session
 
 from collections import Counter
 from aimodelshare.aws import run_function_on_lambda, get_aws_client
@@ -37,7 +35,7 @@ def get_leaderboard(apiurl, verbose=3, columns=None, submission_type="competitio
 
     apiurl_eval=apiurl[:-1]+"eval"
 
-    leaderboard_json = requests.post(apiurl_eval,headers=headers,data=json.dumps(post_dict)) 
+    leaderboard_json = http_session.post(apiurl_eval,headers=headers,data=json.dumps(post_dict),idempotent=True) 
 
     leaderboard_pd = pd.DataFrame(json.loads(leaderboard_json.text))
 
@@ -4,22 +4,27 @@ import json
 import onnx
 import numpy as np
 import pandas as pd
-import requests 
+from aimodelshare import http_session
 import json
 import ast
-import tensorflow as tf
 import tempfile as tmp
+import base64
+import hashlib
+from collections import namedtuple
 from datetime import datetime
-try:
-    import torch
-except:
-    pass
 
 from aimodelshare.leaderboard import get_leaderboard
-from aimodelshare.aws import run_function_on_lambda, get_token, get_aws_token, get_aws_client
+from aimodelshare.aws import resolve_playground, get_token, get_aws_token, get_aws_client, DEFAULT_PLAYGROUND_CACHE_TTL
+from aimodelshare.aimsonnx import INFERENCE_PROFILE_COLUMNS
 from aimodelshare.aimsonnx import _get_leaderboard_data, inspect_model, _get_metadata, _model_summary, model_from_string, pyspark_model_from_string, _get_layer_names, _get_layer_names_pytorch
-from aimodelshare.aimsonnx import model_to_onnx
-from aimodelshare.utils import ignore_warning
+from aimodelshare.aimsonnx import model_to_onnx, _is_torch_model, save_onnx, EXTERNAL_DATA_LOCATION
+from aimodelshare.aimsonnx import _update_model_metadata, _local_weights_artifact
+from aimodelshare.onnx_header import read_onnx_header
+from aimodelshare.utils import ignore_warning, presigned_post_job, run_upload_jobs
+from aimodelshare.multipart_upload import multipart_upload_job
+from aimodelshare.prediction_encoding import encode_predictions
+from aimodelshare.ttl_cache import TTLCache
+from aimodelshare.estimator_registry import default_params
 import warnings
 
 
@@ -150,7 +155,7 @@ def _update_leaderboard(
         if not os.path.exists(modelpath):
             raise FileNotFoundError(f"The model file at {modelpath} does not exist")
 
-        model = onnx.load(modelpath)
+        model = read_onnx_header(modelpath, graph=False)
         metadata = _get_leaderboard_data(model, eval_metrics)
 
     else: 
@@ -224,7 +229,7 @@ def _update_leaderboard(
 
 def _update_leaderboard_public(
     modelpath, eval_metrics, s3_presigned_dict, custom_metadata=None, 
-    private=False, leaderboard_type = "competition", onnx_model=None):
+    private=False, leaderboard_type = "competition", onnx_model=None, meta_dict=None):
 
     if private==True:
         mastertable_path = 'model_eval_data_mastertable_private.csv'
@@ -245,11 +250,14 @@ def _update_leaderboard_public(
     model_version=model_versions[0]
     
 
-    if modelpath == None and onnx_model:
+    if meta_dict is not None:
+        metadata = _get_leaderboard_data(None, eval_metrics, meta_dict=meta_dict)
+
+    elif modelpath == None and onnx_model:
         metadata = _get_leaderboard_data(onnx_model, eval_metrics)
 
     elif modelpath is not None:
-        onnx_model = onnx.load(modelpath)
+        onnx_model = read_onnx_header(modelpath, graph=False)
         metadata = _get_leaderboard_data(onnx_model, eval_metrics)
 
     else: 
@@ -281,10 +289,9 @@ def _update_leaderboard_public(
     #Either way something is breaking and the s3 version should still work right??
     # Read existing table {{{
     try:
-        import wget
 
         #Get leaderboard
-        leaderboardfilename = wget.download(s3_presigned_dict['get'][mastertable_path], out=temp+"/"+mastertable_path)
+        leaderboardfilename = http_session.download_file(s3_presigned_dict['get'][mastertable_path], out=temp+"/"+mastertable_path)
         import pandas as pd
         leaderboard=pd.read_csv(temp+"/"+mastertable_path, sep="\t")
 
@@ -301,6 +308,12 @@ def _update_leaderboard_public(
 
     # Update the leaderboard {{{
 
+    # add inference cost columns to leaderboards created before they were measured
+    for col in INFERENCE_PROFILE_COLUMNS:
+        if col in metadata and col not in leaderboard.columns:
+            leaderboard[col] = None
+    columns = leaderboard.columns
+
     metadata_temp = {col: metadata.get(col, None) for col in columns}
     metadata = dict(metadata, **metadata_temp)
     leaderboard.loc[len(leaderboard)] = metadata
@@ -315,38 +328,34 @@ def _update_leaderboard_public(
     metadata.pop("model_config", "pop worked")
 
 
-    try:
-
-      putfilekeys=list(s3_presigned_dict['put'].keys())
-      modelputfiles = [s for s in putfilekeys if str("csv") in s]
-
-      fileputlistofdicts=[]
-      for i in modelputfiles:
-        filedownload_dict=ast.literal_eval(s3_presigned_dict['put'][i])
-        fileputlistofdicts.append(filedownload_dict)
+    # upload errors are raised so that the submission is not recorded without its leaderboard
+    putfilekeys=list(s3_presigned_dict['put'].keys())
+    modelputfiles = [s for s in putfilekeys if str("csv") in s]
 
+    fileputlistofdicts=[]
+    for i in modelputfiles:
+      filedownload_dict=ast.literal_eval(s3_presigned_dict['put'][i])
+      fileputlistofdicts.append(filedownload_dict)
 
-      with open(temp+"/"+mastertable_path, 'rb') as f:
-        files = {'file': (temp+"/"+mastertable_path, f)}
 
-        if private:
+    with open(temp+"/"+mastertable_path, 'rb') as f:
+      files = {'file': (temp+"/"+mastertable_path, f)}
 
-            http_response = requests.post(fileputlistofdicts[1]['url'], data=fileputlistofdicts[1]['fields'], files=files)
+      if private:
 
-        else:
+          http_response = http_session.post(fileputlistofdicts[1]['url'], data=fileputlistofdicts[1]['fields'], files=files)
 
-            http_response = requests.post(fileputlistofdicts[0]['url'], data=fileputlistofdicts[0]['fields'], files=files)
+      else:
 
-        return metadata
+          http_response = http_session.post(fileputlistofdicts[0]['url'], data=fileputlistofdicts[0]['fields'], files=files)
 
-    except Exception as err:
+    http_response.raise_for_status()
 
-        return err
+    return metadata
 
  
 
-def upload_model_dict(modelpath, s3_presigned_dict, bucket, model_id, model_version, placeholder=False, onnx_model=None):
-    import wget
+def upload_model_dict(modelpath, s3_presigned_dict, bucket, model_id, model_version, placeholder=False, onnx_model=None, meta_dict=None):
     import json
     import ast
     temp=tmp.mkdtemp()
@@ -355,9 +364,10 @@ def upload_model_dict(modelpath, s3_presigned_dict, bucket, model_id, model_vers
 
     if placeholder==False: 
 
-        if onnx_model==None:
-            onnx_model = onnx.load(modelpath)
-        meta_dict = _get_metadata(onnx_model)
+        if meta_dict is None:
+            if onnx_model==None:
+                onnx_model = read_onnx_header(modelpath, graph=False)
+            meta_dict = _get_metadata(onnx_model)
 
         if meta_dict['ml_framework'] in ['keras', 'pytorch']:
 
@@ -381,9 +391,7 @@ def upload_model_dict(modelpath, s3_presigned_dict, bucket, model_id, model_vers
 
             try:
                 model_config=ast.literal_eval(stringconfig)
-                model_class = model_from_string(meta_dict['model_type'])
-                default = model_class()
-                default_config = default.get_params().values()
+                default_config = default_params(meta_dict['model_type'], 'sklearn').values()
                 model_configkeys=model_config.keys()
                 model_configvalues=model_config.values()
             except:
@@ -418,17 +426,10 @@ def upload_model_dict(modelpath, s3_presigned_dict, bucket, model_id, model_vers
 
             try:
                 model_config_temp = ast.literal_eval(stringconfig)
-                model_class = pyspark_model_from_string(meta_dict['model_type'])
-                default = model_class()
-
-                # get model config dict from pyspark model object
-                default_config_temp = {}
-                for key, value in default.extractParamMap().items():
-                    default_config_temp[key.name] = value
+                default_config = default_params(meta_dict['model_type'], 'pyspark')
                 
                 # Sort the keys so default and model config key matches each other
                 model_config = dict(sorted(model_config_temp.items()))
-                default_config = dict(sorted(default_config_temp.items()))
                 
                 model_configkeys = model_config.keys()
                 model_configvalues = model_config.values()
@@ -454,7 +455,7 @@ def upload_model_dict(modelpath, s3_presigned_dict, bucket, model_id, model_vers
    
     try:
         #Get inspect json
-        inspectdatafilename = wget.download(s3_presigned_dict['get']['inspect_pd_'+str(model_version)+'.json'], out=temp+"/"+'inspect_pd_'+str(model_version)+'.json')
+        inspectdatafilename = http_session.download_file(s3_presigned_dict['get']['inspect_pd_'+str(model_version)+'.json'], out=temp+"/"+'inspect_pd_'+str(model_version)+'.json')
         
         with open(temp+"/"+'inspect_pd_'+str(model_version)+'.json') as f:
             model_dict  = json.load(f)
@@ -468,35 +469,32 @@ def upload_model_dict(modelpath, s3_presigned_dict, bucket, model_id, model_vers
     with open(temp+"/"+'inspect_pd_'+str(model_version)+'.json', 'w') as outfile:
         json.dump(model_dict, outfile)
 
-    try:
+    putfilekeys=list(s3_presigned_dict['put'].keys())
+    modelputfiles = [s for s in putfilekeys if str('inspect_pd_'+str(model_version)+'.json') in s]
 
-      putfilekeys=list(s3_presigned_dict['put'].keys())
-      modelputfiles = [s for s in putfilekeys if str('inspect_pd_'+str(model_version)+'.json') in s]
+    fileputlistofdicts=[]
+    for i in modelputfiles:
+      filedownload_dict=ast.literal_eval(s3_presigned_dict ['put'][i])
+      fileputlistofdicts.append(filedownload_dict)
 
-      fileputlistofdicts=[]
-      for i in modelputfiles:
-        filedownload_dict=ast.literal_eval(s3_presigned_dict ['put'][i])
-        fileputlistofdicts.append(filedownload_dict)
+    with open(temp+"/"+'inspect_pd_'+str(model_version)+'.json', 'rb') as f:
+      files = {'file': (temp+"/"+'inspect_pd_'+str(model_version)+'.json', f)}
+      http_response = http_session.post(fileputlistofdicts[0]['url'], data=fileputlistofdicts[0]['fields'], files=files)
+    http_response.raise_for_status()
 
-      with open(temp+"/"+'inspect_pd_'+str(model_version)+'.json', 'rb') as f:
-        files = {'file': (temp+"/"+'inspect_pd_'+str(model_version)+'.json', f)}
-        http_response = requests.post(fileputlistofdicts[0]['url'], data=fileputlistofdicts[0]['fields'], files=files)
-    except:
-      pass
     return 1
 
 
-def upload_model_graph(modelpath, s3_presigned_dict, bucket, model_id, model_version, onnx_model=None):
-    import wget
+def upload_model_graph(modelpath, s3_presigned_dict, bucket, model_id, model_version, onnx_model=None, meta_dict=None):
     import json
     import ast
     temp=tmp.mkdtemp()
     # get model summary from onnx
 
-    if onnx_model==None:
-        onnx_model = onnx.load(modelpath)
-
-    meta_dict = _get_metadata(onnx_model)
+    if meta_dict is None:
+        if onnx_model==None:
+            onnx_model = read_onnx_header(modelpath, graph=False)
+        meta_dict = _get_metadata(onnx_model)
 
     if meta_dict['ml_framework'] == 'keras':
 
@@ -514,7 +512,7 @@ def upload_model_graph(modelpath, s3_presigned_dict, bucket, model_id, model_ver
     
     try:
         #Get inspect json
-        modelgraphdatafilename = wget.download(s3_presigned_dict['get']['model_graph_'+str(model_version)+'.json'], out=temp+"/"+'model_graph_'+str(model_version)+'.json')
+        modelgraphdatafilename = http_session.download_file(s3_presigned_dict['get']['model_graph_'+str(model_version)+'.json'], out=temp+"/"+'model_graph_'+str(model_version)+'.json')
 
         with open(temp+"/"+'model_graph_'+str(model_version)+'.json') as f:
             graph_dict  = json.load(f)
@@ -529,23 +527,164 @@ def upload_model_graph(modelpath, s3_presigned_dict, bucket, model_id, model_ver
     with open(temp+"/"+'model_graph_'+str(model_version)+'.json', 'w') as outfile:
         json.dump(graph_dict, outfile)
 
+    putfilekeys=list(s3_presigned_dict['put'].keys())
+    modelputfiles = [s for s in putfilekeys if str('model_graph_'+str(model_version)+'.json') in s]
+
+    fileputlistofdicts=[]
+    for i in modelputfiles:
+      filedownload_dict=ast.literal_eval(s3_presigned_dict ['put'][i])
+      fileputlistofdicts.append(filedownload_dict)
+
+    with open(temp+"/"+'model_graph_'+str(model_version)+'.json', 'rb') as f:
+      files = {'file': (temp+"/"+'model_graph_'+str(model_version)+'.json', f)}
+      http_response = http_session.post(fileputlistofdicts[0]['url'], data=fileputlistofdicts[0]['fields'], files=files)
+    http_response.raise_for_status()
+
+    return 1
+
+
+SubmissionBundle = namedtuple('SubmissionBundle', ['model_filepath', 'external_data_filepath', 'meta_dict',
+                                                   'model_sha256', 'predictions', 'predictions_encoded',
+                                                   'predictions_sha256'])
+
+# base64 encoded predictions up to this size are sent in the eval request body,
+# larger ones are uploaded to the playground bucket first
+PREDICTIONS_BODY_LIMIT = 3555000
+
+# name eval lambdas advertise when they read encode_predictions payloads
+PREDICTION_FORMAT = "aimspred"
+
+_prediction_formats_cache = None
+
+
+def _prediction_formats(apiurl):
+    '''Returns prediction formats the eval lambda of a playground reads.
+
+    Eval lambdas deployed before the compact format do not answer the
+    request and get an empty list. The request is sent once, without
+    retries, as older lambdas may fail on it. The answer is cached like
+    playground resolutions, for AIMODELSHARE_PLAYGROUND_CACHE_TTL seconds.'''
+
+    global _prediction_formats_cache
+
+    if _prediction_formats_cache is None:
+        _prediction_formats_cache = TTLCache(
+            ttl=float(os.environ.get("AIMODELSHARE_PLAYGROUND_CACHE_TTL", DEFAULT_PLAYGROUND_CACHE_TTL)))
+
+    formats = _prediction_formats_cache.get(apiurl)
+
+    if formats is None:
+        headers = { 'Content-Type':'application/json', 'authorizationToken': json.dumps({"token":os.environ.get("AWS_TOKEN"),"eval":"TEST"}), }
+        response = http_session.post(apiurl[:-1]+"eval", headers=headers,
+                                     data=json.dumps({"return_prediction_formats": "True"}), retries=0)
+        formats = []
+        if response.status_code == 200:
+            try:
+                formats = json.loads(response.text)["prediction_formats"]
+            except (ValueError, TypeError, KeyError):
+                pass
+        if not isinstance(formats, list):
+            formats = []
+
+        _prediction_formats_cache.put(apiurl, formats)
+
+    return formats
+
+
+def _legacy_predictions(predictions):
+    '''Returns predictions as json serializable list, read by every eval lambda.'''
+
+    if type(predictions) is not list:
+        predictions = predictions.tolist()
+
+    if all(isinstance(x, (np.float64)) for x in predictions):
+        predictions = [float(i) for i in predictions]
+
+    return predictions
+
+
+def _file_sha256(filepath, chunk_size=1024**2):
+
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _build_submission_bundle(model_filepath, prediction_submission, model_input=None):
+    '''Converts, serializes and parses submitted model and predictions once.
+
+    Every stage of submit_model reads from the returned bundle instead of
+    loading the model or parsing its metadata again. The converted onnx
+    model is only kept on disk, so it is released once it was saved.
+    Predictions are encoded later by _encode_predictions, once the eval
+    lambda is known to read the compact format.'''
+
+    if model_filepath is None:
+        return SubmissionBundle(None, None, None, None, prediction_submission, None, None)
+
+    if not isinstance(model_filepath, str):
+
+        if isinstance(model_filepath, onnx.ModelProto):
+            onnx_model = model_filepath
+        else:
+            print("Transform model object to onnx.")
+            onnx_model = model_to_onnx(model_filepath, model_input=model_input)
+
+        model_filepath = tmp.mkdtemp() + "/model.onnx"
+        save_onnx(onnx_model, model_filepath)
+        del onnx_model
+
+    # models larger than 2GB keep their tensors in a separate external data file
+    external_data_filepath = os.path.join(os.path.dirname(os.path.abspath(model_filepath)), EXTERNAL_DATA_LOCATION)
+    if not os.path.exists(external_data_filepath):
+        external_data_filepath = None
+
+    meta_dict = _get_metadata(read_onnx_header(model_filepath, graph=False))
+
+    return SubmissionBundle(model_filepath, external_data_filepath, meta_dict, _file_sha256(model_filepath),
+                            prediction_submission, None, None)
+
+
+def _encode_predictions(bundle):
+    '''Returns bundle with its predictions encoded to the compact format.
+
+    Predictions the format cannot hold, e.g. labels containing None, are
+    left unencoded and sent as json list instead.'''
+
     try:
+        predictions_encoded = encode_predictions(bundle.predictions)
+    except ValueError:
+        return bundle
 
-      putfilekeys=list(s3_presigned_dict['put'].keys())
-      modelputfiles = [s for s in putfilekeys if str('model_graph_'+str(model_version)+'.json') in s]
+    return bundle._replace(predictions_encoded=predictions_encoded,
+                           predictions_sha256=hashlib.sha256(predictions_encoded).hexdigest())
 
-      fileputlistofdicts=[]
-      for i in modelputfiles:
-        filedownload_dict=ast.literal_eval(s3_presigned_dict ['put'][i])
-        fileputlistofdicts.append(filedownload_dict)
 
-      with open(temp+"/"+'model_graph_'+str(model_version)+'.json', 'rb') as f:
-        files = {'file': (temp+"/"+'model_graph_'+str(model_version)+'.json', f)}
-        http_response = requests.post(fileputlistofdicts[0]['url'], data=fileputlistofdicts[0]['fields'], files=files)
-    except:
-      pass
+def _embed_weights(bundle, weights_filepath):
+    '''Returns bundle whose onnx file carries the native weights in its metadata.
 
-    return 1
+    Used for playgrounds deployed before weights artifacts, so that the
+    trained weights are still submitted. The file is rewritten to a temp
+    dir, the original model file is left untouched.'''
+
+    onnx_model = onnx.load(bundle.model_filepath)
+    with open(weights_filepath, 'rb') as f:
+        _update_model_metadata(onnx_model, model_weights=f.read(), weights_artifact=None)
+
+    model_filepath = tmp.mkdtemp() + "/model.onnx"
+    save_onnx(onnx_model, model_filepath)
+    del onnx_model
+
+    external_data_filepath = os.path.join(os.path.dirname(model_filepath), EXTERNAL_DATA_LOCATION)
+    if not os.path.exists(external_data_filepath):
+        external_data_filepath = None
+
+    return bundle._replace(model_filepath=model_filepath, external_data_filepath=external_data_filepath,
+                           meta_dict=_get_metadata(read_onnx_header(model_filepath, graph=False)),
+                           model_sha256=_file_sha256(model_filepath))
 
 
 def submit_model(
@@ -557,7 +696,8 @@ def submit_model(
     custom_metadata=None,
     submission_type="competition",
     input_dict = None,
-    print_output=True
+    print_output=True,
+    model_input=None
     ):
     """
     Submits model/preprocessor to machine learning competition using live prediction API url generated by AI Modelshare library
@@ -586,6 +726,9 @@ def submit_model(
                                 [OPTIONAL] to be set by the user
                                 "./reproducibility.json" 
                                 file is generated using export_reproducibility_env function from the AI Modelshare library
+    model_input: array_like, default=None
+                                value - example input data of the model
+                                [REQUIRED] for pytorch model objects, which are traced to convert them to onnx
     -----------------
     Returns
     response:   Model version if the model is submitted sucessfully
@@ -594,12 +737,11 @@ def submit_model(
     """
 
     # catch missing model_input for pytorch 
-    try:
-        import torch
-        if isinstance(model_filepath, torch.nn.Module) and model_input==None:
-            raise ValueError("Please submit valid model_input for pytorch model.")
-    except:
-        pass
+    if _is_torch_model(model_filepath) and model_input is None:
+        raise ValueError("Please submit valid model_input for pytorch model.")
+
+    if prediction_submission is None:
+        raise ValueError("Please submit prediction_submission, the predictions of the model for the test data.")
 
 
     # check whether preprocessor is function
@@ -630,43 +772,40 @@ def submit_model(
     apiurl=apiurl.replace('"','')
 
     # Get bucket and model_id for user {{{
-    response, error = run_function_on_lambda(
-        apiurl, **{"delete": "FALSE", "versionupdateget": "TRUE"}
-    )
-    if error is not None:
-        raise error
-
-    _, bucket, model_id = json.loads(response.content.decode("utf-8"))
+    bucket, model_id = resolve_playground(apiurl)
     # }}}
 
-    #begin replacing code here
-    #add call to eval lambda here to retrieve presigned urls and eval metrics
-    if prediction_submission is not None:
-        if type(prediction_submission) is not list:
-            prediction_submission=prediction_submission.tolist()
-        else: 
-            pass
+    # model conversion, serialization and metadata parsing happen once per submission
+    bundle = _build_submission_bundle(model_filepath, prediction_submission, model_input=model_input)
+    model_filepath = bundle.model_filepath
 
-        if all(isinstance(x, (np.float64)) for x in prediction_submission):
-              prediction_submission = [float(i) for i in prediction_submission]
-        else: 
-            pass
+    # native weights live in the local artifact store, the onnx file only references them
+    weights_filepath = None
+    if model_filepath is not None and bundle.meta_dict.get("weights_artifact") is not None:
+        weights_filepath = _local_weights_artifact(bundle.meta_dict["weights_artifact"])
 
     ##---Step 3: Attempt to get eval metrics and file access dict for model leaderboard submission
     #includes checks if returned values a success and errors otherwise
 
-    import os
-    import pickle
-    temp = tmp.mkdtemp()
-    predictions_path = temp + "/" + 'predictions.pkl'
+    # predictions are sent in the compact binary format, base64 encoded inside the json body,
+    # playgrounds deployed before it still get the json list
+    if PREDICTION_FORMAT in _prediction_formats(apiurl):
+        bundle = _encode_predictions(bundle)
+    encoded = bundle.predictions_encoded is not None
+    predictions_base64 = base64.b64encode(bundle.predictions_encoded).decode() if encoded else None
 
-    fileObject = open(predictions_path, 'wb')
-    pickle.dump(prediction_submission, fileObject)
-    predfilesize=os.path.getsize(predictions_path)
+    if not encoded:
 
-    fileObject.close()
+        post_dict = {"y_pred": _legacy_predictions(bundle.predictions),
+                "return_eval": "True",
+                "submission_type": submission_type,
+                "return_y": "False"}
+
+        headers = { 'Content-Type':'application/json', 'authorizationToken': json.dumps({"token":os.environ.get("AWS_TOKEN"),"eval":"TEST"}), } 
+        apiurl_eval=apiurl[:-1]+"eval"
+        prediction = http_session.post(apiurl_eval,headers=headers,data=json.dumps(post_dict)) 
 
-    if predfilesize>3555000:
+    elif len(predictions_base64)>PREDICTIONS_BODY_LIMIT:
 
         post_dict = {"y_pred": [],
               "return_eval_files": "True",
@@ -675,7 +814,7 @@ def submit_model(
 
         headers = { 'Content-Type':'application/json', 'authorizationToken': json.dumps({"token":os.environ.get("AWS_TOKEN"),"eval":"TEST"}), } 
         apiurl_eval=apiurl[:-1]+"eval"
-        predictionfiles = requests.post(apiurl_eval,headers=headers,data=json.dumps(post_dict)) 
+        predictionfiles = http_session.post(apiurl_eval,headers=headers,data=json.dumps(post_dict)) 
         eval_metrics=json.loads(predictionfiles.text)
 
         s3_presigned_dict = {key:val for key, val in eval_metrics.items() if key != 'eval'}
@@ -684,7 +823,7 @@ def submit_model(
         s3_presigned_dict.pop('idempotentmodel_version')
             #upload preprocessor (1s for small upload vs 21 for 306 mbs)
         putfilekeys=list(s3_presigned_dict['put'].keys())
-        modelputfiles = [s for s in putfilekeys if str("pkl") in s]
+        modelputfiles = [s for s in putfilekeys if str("predictions") in s]
 
         fileputlistofdicts=[]
         for i in modelputfiles:
@@ -692,32 +831,30 @@ def submit_model(
           fileputlistofdicts.append(filedownload_dict)
 
 
-        with open(predictions_path , 'rb') as f:
-                files = {'file': (predictions_path , f)} 
-                http_response = requests.post(fileputlistofdicts[0]['url'], data=fileputlistofdicts[0]['fields'], files=files)
-                f.close()
+        files = {'file': ('predictions.bin', bundle.predictions_encoded)}
+        http_response = http_session.post(fileputlistofdicts[0]['url'], data=fileputlistofdicts[0]['fields'], files=files)
 
         post_dict = {"y_pred": [],
-                    "predictionpklname":fileputlistofdicts[0]['fields']['key'].split("/")[2],
+                    "predictionpklname":fileputlistofdicts[0]['fields']['key'].split("/")[-1],
                 "submission_type": submission_type,
                 "return_y": "False",
                 "return_eval": "True"}
 
         headers = { 'Content-Type':'application/json', 'authorizationToken': json.dumps({"token":os.environ.get("AWS_TOKEN"),"eval":"TEST"}), } 
         apiurl_eval=apiurl[:-1]+"eval"
-        prediction = requests.post(apiurl_eval,headers=headers,data=json.dumps(post_dict))
+        prediction = http_session.post(apiurl_eval,headers=headers,data=json.dumps(post_dict))
 
     else:
 
-        post_dict = {"y_pred": prediction_submission,
+        post_dict = {"y_pred": [],
+                "y_pred_encoded": predictions_base64,
                 "return_eval": "True",
                 "submission_type": submission_type,
                 "return_y": "False"}
 
         headers = { 'Content-Type':'application/json', 'authorizationToken': json.dumps({"token":os.environ.get("AWS_TOKEN"),"eval":"TEST"}), } 
         apiurl_eval=apiurl[:-1]+"eval"
-        import requests
-        prediction = requests.post(apiurl_eval,headers=headers,data=json.dumps(post_dict)) 
+        prediction = http_session.post(apiurl_eval,headers=headers,data=json.dumps(post_dict)) 
 
     eval_metrics=json.loads(prediction.text)
 
@@ -761,21 +898,36 @@ def submit_model(
       eval_metrics_private=eval_metrics_private['eval']
 
 
-    #upload preprocessor (1s for small upload vs 21 for 306 mbs)
+    # artifacts are uploaded concurrently once all of them are known, the
+    # modeldata updates below only run after every upload was confirmed
+    upload_jobs = []
+
     putfilekeys=list(s3_presigned_dict['put'].keys())
+
+    weights_artifact = None
+    if weights_filepath is not None:
+        weightsputfiles = [s for s in putfilekeys if s.endswith(".weights")]
+
+        if len(weightsputfiles) == 0:
+            # playgrounds deployed before weights artifacts get the weights inside the onnx file
+            bundle = _embed_weights(bundle, weights_filepath)
+            model_filepath = bundle.model_filepath
+        else:
+            weights_artifact = bundle.meta_dict["weights_artifact"]
+
+    #upload preprocessor (1s for small upload vs 21 for 306 mbs)
     modelputfiles = [s for s in putfilekeys if str("zip") in s]
 
     fileputlistofdicts=[]
     for i in modelputfiles:
       filedownload_dict=ast.literal_eval(s3_presigned_dict ['put'][i])
       fileputlistofdicts.append(filedownload_dict)
-    import requests
+
     if preprocessor is not None: 
-        with open(preprocessor, 'rb') as f:
-          files = {'file': (preprocessor, f)}
-          http_response = requests.post(fileputlistofdicts[0]['url'], data=fileputlistofdicts[0]['fields'], files=files)
+        upload_jobs.append(("preprocessor", os.path.getsize(preprocessor),
+                            multipart_upload_job(apiurl, submission_type, modelputfiles[0],
+                                                 preprocessor, fileputlistofdicts[0])))
 
-    putfilekeys=list(s3_presigned_dict['put'].keys())
     modelputfiles = [s for s in putfilekeys if str("onnx") in s]
 
     fileputlistofdicts=[]
@@ -784,38 +936,21 @@ def submit_model(
       fileputlistofdicts.append(filedownload_dict)
 
 
-    if not (model_filepath == None or isinstance(model_filepath, str)): 
-
-        if isinstance(model_filepath, onnx.ModelProto):
-            onnx_model = model_filepath
-        else:
-            print("Transform model object to onnx.")
-            try:
-                import torch
-                if isinstance(model_filepath, torch.nn.Module) and model_input==None:
-                    onnx_model = model_to_onnx(model_filepath, model_input=model_input)
-            except:
-                onnx_model = model_to_onnx(model_filepath)
-                pass
-
-
-        temp_prep=tmp.mkdtemp()
-        model_filepath = temp_prep+"/model.onnx"
-        with open(model_filepath, "wb") as f:
-            f.write(onnx_model.SerializeToString())
-
-        load_onnx_from_path = False
-    else:
-        load_onnx_from_path = True
-
-
     if model_filepath is not None:
-        with open(model_filepath, 'rb') as f:
-          files = {'file': (model_filepath, f)}
-          http_response = requests.post(fileputlistofdicts[1]['url'], data=fileputlistofdicts[1]['fields'], files=files)
+        upload_jobs.append(("onnx model", os.path.getsize(model_filepath),
+                            multipart_upload_job(apiurl, submission_type, modelputfiles[1],
+                                                 model_filepath, fileputlistofdicts[1])))
+
+        # models larger than 2GB keep their tensors in a separate external data file
+        if bundle.external_data_filepath is not None:
+            dataputfiles = [s for s in putfilekeys if s.endswith(".onnx.data")]
+            assert len(dataputfiles) > 0, "Please redeploy your playground to submit models larger than 2GB."
+            datapost = ast.literal_eval(s3_presigned_dict['put'][dataputfiles[0]])
+            upload_jobs.append(("onnx external data", os.path.getsize(bundle.external_data_filepath),
+                                multipart_upload_job(apiurl, submission_type, dataputfiles[0],
+                                                     bundle.external_data_filepath, datapost)))
 
 
-    putfilekeys=list(s3_presigned_dict['put'].keys())
     modelputfiles = [s for s in putfilekeys if str("reproducibility") in s]
 
     fileputlistofdicts=[]
@@ -824,13 +959,11 @@ def submit_model(
       fileputlistofdicts.append(filedownload_dict)
 
     if reproducibility_env_filepath:
-        with open(reproducibility_env_filepath, 'rb') as f:
-          files = {'file': (reproducibility_env_filepath, f)}
-          http_response = requests.post(fileputlistofdicts[0]['url'], data=fileputlistofdicts[0]['fields'], files=files)
+        upload_jobs.append(("reproducibility env", os.path.getsize(reproducibility_env_filepath),
+                            presigned_post_job(fileputlistofdicts[0], reproducibility_env_filepath)))
 
     # Model metadata upload
     if model_filepath:
-        putfilekeys=list(s3_presigned_dict['put'].keys())
         modelputfiles = [s for s in putfilekeys if str("model_metadata") in s]
 
         fileputlistofdicts=[]
@@ -838,14 +971,20 @@ def submit_model(
             filedownload_dict=ast.literal_eval(s3_presigned_dict ['put'][i])
             fileputlistofdicts.append(filedownload_dict)
 
-        if load_onnx_from_path:
-            onnx_model = onnx.load(model_filepath)
+        meta_dict = bundle.meta_dict
+
+        if weights_artifact is not None:
+            weightspost = ast.literal_eval(s3_presigned_dict['put'][weightsputfiles[0]])
+            upload_jobs.append(("model weights", os.path.getsize(weights_filepath),
+                                multipart_upload_job(apiurl, submission_type, weightsputfiles[0],
+                                                     weights_filepath, weightspost)))
 
-        meta_dict = _get_metadata(onnx_model)
         model_metadata = {
             "model_config": meta_dict["model_config"],
             "ml_framework": meta_dict["ml_framework"],
-            "model_type": meta_dict["model_type"]
+            "model_type": meta_dict["model_type"],
+            "weights_artifact": weights_artifact,
+            "model_sha256": bundle.model_sha256
         }
 
         temp = tmp.mkdtemp()
@@ -853,26 +992,8 @@ def submit_model(
         with open(model_metadata_path, 'w') as outfile:
             json.dump(model_metadata, outfile)
 
-        with open(model_metadata_path, 'rb') as f:
-            files = {'file': (model_metadata_path, f)}
-            http_response = requests.post(fileputlistofdicts[0]['url'], data=fileputlistofdicts[0]['fields'], files=files)
-
-
-    # Upload model metrics and metadata {{{
-    if load_onnx_from_path:
-        modelleaderboarddata = _update_leaderboard_public(
-            model_filepath, eval_metrics, s3_presigned_dict, custom_metadata)
-
-        # Upload model metrics and metadata {{{
-        modelleaderboarddata_private = _update_leaderboard_public(
-            model_filepath, eval_metrics_private, s3_presigned_dict, custom_metadata, private=True)
-    else:
-        modelleaderboarddata = _update_leaderboard_public(
-            None, eval_metrics, s3_presigned_dict, custom_metadata, onnx_model=onnx_model)
-
-        # Upload model metrics and metadata {{{
-        modelleaderboarddata_private = _update_leaderboard_public(
-            None, eval_metrics_private, s3_presigned_dict, custom_metadata, private=True, onnx_model=onnx_model)
+        upload_jobs.append(("model metadata", os.path.getsize(model_metadata_path),
+                            presigned_post_job(fileputlistofdicts[0], model_metadata_path)))
 
 
     model_versions = [os.path.splitext(f)[0].split("_")[-1][1:] for f in s3_presigned_dict['put'].keys()]
@@ -881,22 +1002,32 @@ def submit_model(
     model_versions = list(map(int, model_versions))
     model_version=model_versions[0]
 
+    # Upload model metrics and metadata {{{
+    upload_jobs.append(("leaderboard", 0, lambda: _update_leaderboard_public(
+        model_filepath, eval_metrics, s3_presigned_dict, custom_metadata, meta_dict=bundle.meta_dict)))
+
+    upload_jobs.append(("private leaderboard", 0, lambda: _update_leaderboard_public(
+        model_filepath, eval_metrics_private, s3_presigned_dict, custom_metadata, private=True,
+        meta_dict=bundle.meta_dict)))
 
-    if load_onnx_from_path:
-        if model_filepath is not None:
 
-            upload_model_dict(model_filepath, s3_presigned_dict, bucket, model_id, model_version)
+    if model_filepath is not None:
 
-            upload_model_graph(model_filepath, s3_presigned_dict, bucket, model_id, model_version)
+        upload_jobs.append(("model summary", 0, lambda: upload_model_dict(
+            model_filepath, s3_presigned_dict, bucket, model_id, model_version, meta_dict=bundle.meta_dict)))
 
-        else:
+        upload_jobs.append(("model graph", 0, lambda: upload_model_graph(
+            model_filepath, s3_presigned_dict, bucket, model_id, model_version, meta_dict=bundle.meta_dict)))
 
-            upload_model_dict(model_filepath, s3_presigned_dict, bucket, model_id, model_version, placeholder=True) 
     else:
 
-            upload_model_dict(None, s3_presigned_dict, bucket, model_id, model_version, onnx_model=onnx_model)
+        upload_jobs.append(("model summary", 0, lambda: upload_model_dict(
+            model_filepath, s3_presigned_dict, bucket, model_id, model_version, placeholder=True)))
 
-            upload_model_graph(None, s3_presigned_dict, bucket, model_id, model_version, onnx_model=onnx_model)
+    upload_results = run_upload_jobs(upload_jobs, print_progress=print_output)
+
+    modelleaderboarddata = upload_results["leaderboard"]
+    modelleaderboarddata_private = upload_results["private leaderboard"]
 
     modelpath=model_filepath
 
@@ -908,21 +1039,12 @@ def submit_model(
           result[key] = value
       return result
 
-    if isinstance(modelleaderboarddata, Exception):
-      raise err
-
-    else:
-      dict_str = json.dumps(modelleaderboarddata)
     #convert None type values to string
-      modelleaderboarddata_cleaned = json.loads(dict_str, object_pairs_hook=dict_clean)
+    dict_str = json.dumps(modelleaderboarddata)
+    modelleaderboarddata_cleaned = json.loads(dict_str, object_pairs_hook=dict_clean)
 
-
-    if isinstance(modelleaderboarddata_private, Exception):
-      raise err
-    else:
-      dict_str = json.dumps(modelleaderboarddata_private)
-    #convert None type values to string
-      modelleaderboarddata_private_cleaned = json.loads(dict_str, object_pairs_hook=dict_clean)
+    dict_str = json.dumps(modelleaderboarddata_private)
+    modelleaderboarddata_private_cleaned = json.loads(dict_str, object_pairs_hook=dict_clean)
 
     # Update model version and sample data {{{
     #data_types = None
@@ -969,16 +1091,14 @@ def submit_model(
     headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("AWS_TOKEN"), 'Access-Control-Allow-Headers':
                                     'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
     # competitiondata lambda function invoked through below url to update model submissions and contributors
-    requests.post("https://o35jwfakca.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+    http_session.post("https://o35jwfakca.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                   json=bodydata, headers=headers_with_authentication)
 
 
     if modelpath is not None:
 
         # get model summary from onnx
-        if load_onnx_from_path:
-            onnx_model = onnx.load(modelpath)
-        meta_dict = _get_metadata(onnx_model)
+        meta_dict = bundle.meta_dict
 
         if meta_dict['ml_framework'] == 'keras':
 
@@ -1009,9 +1129,7 @@ def submit_model(
 
             try:
                 model_config=ast.literal_eval(stringconfig)
-                model_class = model_from_string(meta_dict['model_type'])
-                default = model_class()
-                default_config = default.get_params().values()
+                default_config = default_params(meta_dict['model_type'], 'sklearn').values()
                 model_configkeys=model_config.keys()
                 model_configvalues=model_config.values()
             except:
@@ -1048,17 +1166,10 @@ def submit_model(
 
             try:
                 model_config_temp = ast.literal_eval(stringconfig)
-                model_class = pyspark_model_from_string(meta_dict['model_type'])
-                default = model_class()
-
-                # get model config dict from pyspark model object
-                default_config_temp = {}
-                for key, value in default.extractParamMap().items():
-                    default_config_temp[key.name] = value
+                default_config = default_params(meta_dict['model_type'], 'pyspark')
                 
                 # Sort the keys so default and model config key matches each other
                 model_config = dict(sorted(model_config_temp.items()))
-                default_config = dict(sorted(default_config_temp.items()))
                 
                 model_configkeys = model_config.keys()
                 model_configvalues = model_config.values()
@@ -1119,7 +1230,7 @@ def submit_model(
     headers_with_authentication = {'Content-Type': 'application/json', 'authorizationToken': os.environ.get("AWS_TOKEN"), 'Access-Control-Allow-Headers':
                                     'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization', 'Access-Control-Allow-Origin': '*'}
     # competitiondata lambda function invoked through below url to update model submissions and contributors
-    response=requests.post("https://eeqq8zuo9j.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+    response=http_session.post("https://eeqq8zuo9j.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                   json=bodydatamodels_allstrings, headers=headers_with_authentication)
     
     if str(response.status_code)=="200":
@@ -1152,7 +1263,6 @@ def update_runtime_model(apiurl, model_version=None, submission_type="competitio
 
             runtimemodstring="update_runtime_model('"+apiurl+"',"+str(model_version)+",submission_type='"+str(submission_type)+"')"
             import base64
-            import requests
             import json
 
             api_url = "https://z4kvag4sxdnv2mvs2b6c4thzj40bxnuw.lambda-url.us-east-2.on.aws/"
@@ -1161,7 +1271,7 @@ def update_runtime_model(apiurl, model_version=None, submission_type="competitio
 
             headers = {"Content-Type": "application/json"}
 
-            response = requests.request("POST", api_url, headers = headers, data=data)
+            response = http_session.request("POST", api_url, headers = headers, data=data, timeout=None)
             # Print response
             result=json.loads(response.text)
 
@@ -1192,13 +1302,8 @@ def update_runtime_model(apiurl, model_version=None, submission_type="competitio
         s3 = user_sess.resource('s3')
         model_version=str(model_version)
         # Get bucket and model_id for user based on apiurl {{{
-        response, error = run_function_on_lambda(
-            apiurl, **{"delete": "FALSE", "versionupdateget": "TRUE"}
-        )
-        if error is not None:
-            raise error
+        api_bucket, model_id = resolve_playground(apiurl)
         import json
-        _, api_bucket, model_id = json.loads(response.content.decode("utf-8"))
         # }}}
 
         try:
@@ -1240,13 +1345,26 @@ def update_runtime_model(apiurl, model_version=None, submission_type="competitio
                               "versionupdateput":"TRUE",
                               "verified_metrics":"TRUE",
                               "eval_metrics":json.dumps(leaderboardversiondict)}
-        import requests
         headers = { 'Content-Type':'application/json', 'authorizationToken': os.environ.get("AWS_TOKEN"), } 
-        prediction = requests.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",headers=headers,data=json.dumps(bodydatamodelmetrics)) 
+        prediction = http_session.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",headers=headers,data=json.dumps(bodydatamodelmetrics)) 
 
         # overwrite runtime_model.onnx file & runtime_preprocessor.zip files: 
         if (model_source_key in file_list) & (preprocesor_source_key in file_list):
             response = bucket.copy(model_copy_source, model_id+"/"+'runtime_model.onnx')
+            # ORT format model belongs to the previous runtime model
+            response = bucket.Object(model_id+"/"+'runtime_model.ort').delete()
+            # external tensor data travels with models larger than 2GB
+            if model_source_key + ".data" in file_list:
+                response = bucket.copy({'Bucket': api_bucket, 'Key': model_source_key + ".data"},
+                                       model_id+"/"+'runtime_model.onnx.data')
+            else:
+                response = bucket.Object(model_id+"/"+'runtime_model.onnx.data').delete()
+            # native weights of models submitted with a weights artifact
+            if model_source_key[:-len(".onnx")] + ".weights" in file_list:
+                response = bucket.copy({'Bucket': api_bucket, 'Key': model_source_key[:-len(".onnx")] + ".weights"},
+                                       model_id+"/"+'runtime_model.weights')
+            else:
+                response = bucket.Object(model_id+"/"+'runtime_model.weights').delete()
             response = bucket.copy(preprocessor_copy_source, model_id+"/"+'runtime_preprocessor.zip')
             return print('Runtime model & preprocessor for api: '+apiurl+" updated to model version "+model_version+".\n\nModel metrics are now updated and verified for this model playground.")
         else:
@@ -0,0 +1,291 @@
+import os
+import re
+import json
+import base64
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from aimodelshare import http_session
+from aimodelshare.exceptions import AWSUploadError
+from aimodelshare.utils import presigned_post_job
+
+
+# Large artifacts are uploaded as S3 multipart uploads through presigned
+# upload_part urls handed out by the playground eval lambda. Every part is
+# sent with its md5, which S3 checks on receipt. Finished parts are recorded
+# with their ETag and md5 in a local journal so an interrupted upload resumes
+# with the missing parts only.
+
+MULTIPART_THRESHOLD = 100 * 1024**2
+DEFAULT_PART_SIZE = 64 * 1024**2
+DEFAULT_PART_WORKERS = 4
+DEFAULT_JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".aimodelshare", "uploads")
+
+# S3 allows at most 10000 parts per upload
+_MAX_PARTS = 10000
+
+
+def _artifact_name(file_name):
+    '''Returns file_name without its model version, e.g. "onnx_model.onnx".'''
+
+    return re.sub(r"_v\d+(?=\.)", "", file_name)
+
+
+class _UploadJournal:
+    '''Json file recording upload id and finished parts of one multipart upload.
+
+    Journals are keyed on the artifact without its model version, as a
+    retried submission is issued a new version. The file name of the upload
+    is recorded, so uploads started for an earlier version can be aborted.'''
+
+    def __init__(self, journal_dir, apiurl, submission_type, file_name, size):
+
+        key = hashlib.sha256(json.dumps([apiurl, submission_type, _artifact_name(file_name),
+                                         size]).encode()).hexdigest()
+
+        self.journal_dir = journal_dir
+        self.path = os.path.join(journal_dir, key + ".json")
+        self.file_name = file_name
+        self.upload_id = None
+        self.part_size = None
+        self.parts = {}
+        self.digests = {}
+
+        self._lock = threading.Lock()
+
+        try:
+            with open(self.path) as f:
+                entry = json.load(f)
+            self.file_name, self.upload_id, self.part_size = entry["file_name"], entry["upload_id"], entry["part_size"]
+            self.parts, self.digests = entry["parts"], entry["digests"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+
+        with self._lock:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.journal_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"file_name": self.file_name, "upload_id": self.upload_id, "part_size": self.part_size,
+                           "parts": self.parts, "digests": self.digests}, f)
+            os.replace(temp_path, self.path)
+
+    def add_part(self, number, etag, digest):
+
+        with self._lock:
+            self.parts[str(number)] = etag
+            self.digests[str(number)] = digest
+        self.save()
+
+    def remove(self):
+
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _multipart_request(apiurl, submission_type, file_name, operation, **kwargs):
+    '''Sends multipart operation to the playground eval lambda.'''
+
+    post_dict = dict(kwargs, multipart_upload="True", operation=operation,
+                     file_name=file_name, submission_type=submission_type)
+
+    headers = {'Content-Type': 'application/json', 'authorizationToken': json.dumps(
+        {"token": os.environ.get("AWS_TOKEN"), "eval": "TEST"}), }
+
+    response = http_session.post(apiurl[:-1] + "eval", headers=headers, data=json.dumps(post_dict),
+                                 idempotent=operation != "create")
+
+    try:
+        result = json.loads(response.text)
+    except ValueError:
+        result = None
+
+    # playgrounds deployed before multipart support answer with an evaluation instead
+    if operation == "create" and response.status_code == 200 and \
+            not (isinstance(result, dict) and "upload_id" in result):
+        return None
+
+    if response.status_code != 200 or not isinstance(result, dict) or "upload_id" not in result:
+        error = result.get("error") if isinstance(result, dict) else None
+        raise AWSUploadError("Multipart " + operation + " of " + file_name + " failed: " +
+                             str(error or response.text))
+
+    return result
+
+
+def _read_part(filepath, number, part_size):
+
+    with open(filepath, 'rb') as f:
+        f.seek((number - 1) * part_size)
+        return f.read(part_size)
+
+
+def _etag_is_md5(headers):
+    '''Returns whether the ETag of an uploaded part is the md5 of its data.
+
+    S3 returns other ETags for parts encrypted with KMS or customer keys.'''
+
+    encryption = headers.get('x-amz-server-side-encryption', '')
+
+    return not encryption.startswith('aws:kms') and \
+        'x-amz-server-side-encryption-customer-algorithm' not in headers
+
+
+def _upload_part(url, data):
+    '''PUTs one part with its md5 and returns the ETag S3 assigned to it.
+
+    S3 rejects parts whose data do not match the Content-MD5 header. The
+    ETag is compared as well when it is an md5 digest.'''
+
+    md5 = hashlib.md5(data)
+
+    response = http_session.request('PUT', url, data=data,
+                                    headers={'Content-MD5': base64.b64encode(md5.digest()).decode()})
+    response.raise_for_status()
+
+    etag = response.headers.get('ETag', '').strip('"')
+    if _etag_is_md5(response.headers) and etag != md5.hexdigest():
+        raise AWSUploadError("Checksum mismatch for uploaded part.")
+
+    return etag
+
+
+def multipart_upload(apiurl, submission_type, file_name, filepath, part_size=DEFAULT_PART_SIZE,
+                     max_workers=DEFAULT_PART_WORKERS, journal_dir=None):
+    """
+    Upload a submission artifact to the playground bucket in parallel parts.
+
+    Parts already held by S3 from an earlier, interrupted call for the same
+    playground, artifact name and file size are skipped after their md5 was
+    compared with the local file. An interrupted upload of an earlier model
+    version is aborted and started over. The journal is removed once the
+    upload was completed.
+
+    Args:
+        apiurl (str): playground url.
+        submission_type (str): "competition" or "experiment".
+        file_name (str): artifact name, e.g. "onnx_model_v3.onnx".
+        filepath (str): path of the file to upload.
+        part_size (int): size of each part in bytes, at least 5MB.
+        max_workers (int): number of parts uploaded concurrently.
+        journal_dir (str): directory of the upload journals.
+
+    Returns:
+        dict with the upload id and the ETag of each part, or None if the
+        playground does not support multipart uploads
+    """
+
+    if journal_dir is None:
+        journal_dir = os.environ.get("AIMODELSHARE_UPLOAD_JOURNAL_DIR", DEFAULT_JOURNAL_DIR)
+
+    size = os.path.getsize(filepath)
+    journal = _UploadJournal(journal_dir, apiurl, submission_type, file_name, size)
+
+    if journal.part_size is not None:
+        part_size = journal.part_size
+    part_size = max(part_size, -(-size // _MAX_PARTS))
+    part_count = max(1, -(-size // part_size))
+    part_numbers = list(range(1, part_count + 1))
+
+    # S3 uploads are bound to their key, uploads of an earlier version cannot be resumed
+    if journal.upload_id is not None and journal.file_name != file_name:
+        try:
+            _multipart_request(apiurl, submission_type, journal.file_name, "abort", upload_id=journal.upload_id)
+        except Exception:
+            pass
+        journal.file_name, journal.upload_id, journal.parts, journal.digests = file_name, None, {}, {}
+
+    result = None
+    if journal.upload_id is not None:
+        try:
+            result = _multipart_request(apiurl, submission_type, file_name, "resume",
+                                        upload_id=journal.upload_id, part_numbers=part_numbers)
+        except AWSUploadError:
+            # upload expired or was aborted, start over
+            journal.parts, journal.digests = {}, {}
+
+    if result is None:
+        result = _multipart_request(apiurl, submission_type, file_name, "create", part_numbers=part_numbers)
+        if result is None:
+            return None
+        journal.upload_id, journal.part_size, journal.parts, journal.digests = result["upload_id"], part_size, {}, {}
+        journal.save()
+
+    # parts S3 already holds are kept if they were recorded for the same local data
+    done, digests = {}, {}
+    for number, etag in result["parts"].items():
+        if int(number) in part_numbers and journal.parts.get(number) == etag and journal.digests.get(number) == \
+                hashlib.md5(_read_part(filepath, int(number), part_size)).hexdigest():
+            done[number], digests[number] = etag, journal.digests[number]
+    journal.parts, journal.digests = done, digests
+    journal.save()
+
+    def upload(number):
+        data = _read_part(filepath, number, part_size)
+        etag = _upload_part(result["urls"][str(number)], data)
+        journal.add_part(number, etag, hashlib.md5(data).hexdigest())
+        return etag
+
+    missing = [number for number in part_numbers if str(number) not in done]
+    errors = []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing) or 1))) as executor:
+        futures = [executor.submit(upload, number) for number in missing]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as err:
+                errors.append(err)
+
+    if errors:
+        raise AWSUploadError("Upload of " + file_name + " was interrupted, " + str(len(errors)) +
+                             " parts failed. Submitting again resumes it: " + str(errors[0]))
+
+    _multipart_request(apiurl, submission_type, file_name, "complete",
+                       upload_id=journal.upload_id, parts=journal.parts)
+    journal.remove()
+
+    return {"upload_id": journal.upload_id, "parts": journal.parts}
+
+
+def multipart_upload_job(apiurl, submission_type, file_name, filepath, presigned_post):
+    """
+    Create an upload job for run_upload_jobs that picks the upload method by file size.
+
+    Files of at least MULTIPART_THRESHOLD bytes are uploaded in resumable
+    parts, smaller files and playgrounds without multipart support use the
+    presigned POST.
+
+    Args:
+        apiurl (str): playground url.
+        submission_type (str): "competition" or "experiment".
+        file_name (str): artifact name the presigned POST was issued for.
+        filepath (str): path of the file to upload.
+        presigned_post (dict): presigned POST with 'url' and 'fields'.
+
+    Returns:
+        a function that uploads the file and raises on errors
+    """
+
+    post_job = presigned_post_job(presigned_post, filepath)
+
+    def upload():
+        if os.path.getsize(filepath) >= MULTIPART_THRESHOLD:
+            result = multipart_upload(apiurl, submission_type, file_name, filepath)
+            if result is not None:
+                return result
+        return post_job()
+
+    return upload
+
+
+__all__ = [
+    multipart_upload,
+    multipart_upload_job,
+    MULTIPART_THRESHOLD
+]
@@ -0,0 +1,357 @@
+import os
+import re
+from collections import namedtuple
+
+from aimodelshare import http_session
+
+
+# Header-only reader for ONNX files. It walks the protobuf wire format of
+# ModelProto directly and seeks past initializer payloads, so metadata and
+# the op graph of a model are read without materializing any weight tensor,
+# from local files as well as from ranged reads of remote objects.
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+OnnxHeader = namedtuple('OnnxHeader', ['ir_version', 'producer_name', 'producer_version', 'domain',
+                                       'model_version', 'opset_import', 'metadata_props', 'graph'])
+OnnxGraphHeader = namedtuple('OnnxGraphHeader', ['name', 'nodes', 'inputs', 'outputs',
+                                                 'initializer_count', 'initializer_size'])
+OnnxNodeHeader = namedtuple('OnnxNodeHeader', ['name', 'op_type', 'domain', 'inputs', 'outputs'])
+OnnxValueInfo = namedtuple('OnnxValueInfo', ['name', 'elem_type', 'shape'])
+MetadataProp = namedtuple('MetadataProp', ['key', 'value'])
+
+# protobuf wire types
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH_DELIMITED = 2
+_FIXED32 = 5
+
+_CONTENT_RANGE = re.compile(r'bytes \d+-\d+/(\d+)')
+
+
+class _BlockSource:
+    '''Random access byte source that fetches aligned blocks on demand.
+
+    fetch(start, size) returns up to size bytes starting at offset start.
+    Skipped fields are never fetched, so reading the header of a large
+    file costs a handful of small reads.'''
+
+    def __init__(self, fetch, size, block_size=DEFAULT_BLOCK_SIZE):
+
+        self._fetch = fetch
+        self.size = size
+        self.block_size = block_size
+
+        self._buffer = b''
+        self._buffer_start = 0
+
+    def read(self, start, size):
+
+        offset = start - self._buffer_start
+        if 0 <= offset and offset + size <= len(self._buffer):
+            return self._buffer[offset:offset + size]
+
+        data = self._fetch(start, min(max(size, self.block_size), self.size - start))
+        if len(data) < size:
+            raise ValueError("Unexpected end of ONNX file at offset " + str(start) + ".")
+
+        self._buffer = data
+        self._buffer_start = start
+
+        return data[:size]
+
+
+def _file_source(fileobj, block_size):
+
+    def fetch(start, size):
+        fileobj.seek(start)
+        return fileobj.read(size)
+
+    fileobj.seek(0, os.SEEK_END)
+
+    return _BlockSource(fetch, fileobj.tell(), block_size)
+
+
+def _bytes_source(data, block_size):
+
+    data = memoryview(data)
+
+    return _BlockSource(lambda start, size: bytes(data[start:start + size]), len(data), block_size)
+
+
+def _url_source(url, block_size, timeout=60):
+    '''Returns source that reads a remote object with HTTP range requests.'''
+
+    def get_range(start, size):
+        response = http_session.get(url, headers={'Range': 'bytes={}-{}'.format(start, start + size - 1)},
+                                    timeout=timeout)
+        response.raise_for_status()
+        return response
+
+    response = get_range(0, block_size)
+
+    # servers that ignore range requests send the whole object at once
+    if response.status_code != 206:
+        return _bytes_source(response.content, block_size)
+
+    match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+    if match is None:
+        raise ValueError("Could not determine size of remote ONNX file.")
+
+    source = _BlockSource(lambda start, size: get_range(start, size).content,
+                          int(match.group(1)), block_size)
+    source._buffer = response.content
+
+    return source
+
+
+def _read_varint(source, pos, end):
+
+    data = source.read(pos, min(10, end - pos))
+
+    value = 0
+    for i, byte in enumerate(bytearray(data)):
+        value |= (byte & 0x7f) << (7 * i)
+        if not byte & 0x80:
+            return value, pos + i + 1
+
+    raise ValueError("Malformed varint in ONNX file at offset " + str(pos) + ".")
+
+
+def _iter_fields(source, start, end):
+    '''Yields (field_number, wire_type, value, offset) of a protobuf message.
+
+    For length delimited fields value is the payload length and offset its
+    position, the payload itself is only read when the caller asks for it.'''
+
+    pos = start
+    while pos < end:
+        tag, pos = _read_varint(source, pos, end)
+        field_number, wire_type = tag >> 3, tag & 7
+
+        if wire_type == _VARINT:
+            value, pos = _read_varint(source, pos, end)
+            yield field_number, wire_type, value, pos
+        elif wire_type == _LENGTH_DELIMITED:
+            length, pos = _read_varint(source, pos, end)
+            yield field_number, wire_type, length, pos
+            pos += length
+        elif wire_type == _FIXED64:
+            pos += 8
+        elif wire_type == _FIXED32:
+            pos += 4
+        else:
+            raise ValueError("Unsupported protobuf wire type " + str(wire_type) + " in ONNX file.")
+
+    if pos != end:
+        raise ValueError("Truncated protobuf message in ONNX file.")
+
+
+def _read_string(source, length, offset):
+
+    return source.read(offset, length).decode('utf-8')
+
+
+def _read_metadata_prop(source, start, end):
+
+    key, value = '', ''
+    for field_number, wire_type, length, offset in _iter_fields(source, start, end):
+        if field_number == 1 and wire_type == _LENGTH_DELIMITED:
+            key = _read_string(source, length, offset)
+        elif field_number == 2 and wire_type == _LENGTH_DELIMITED:
+            value = _read_string(source, length, offset)
+
+    return MetadataProp(key, value)
+
+
+def _read_opset(source, start, end):
+
+    domain, version = '', 0
+    for field_number, wire_type, value, offset in _iter_fields(source, start, end):
+        if field_number == 1 and wire_type == _LENGTH_DELIMITED:
+            domain = _read_string(source, value, offset)
+        elif field_number == 2 and wire_type == _VARINT:
+            version = value
+
+    return domain, version
+
+
+def _read_node(source, start, end):
+
+    name, op_type, domain, inputs, outputs = '', '', '', [], []
+
+    # attributes (field 5) can hold whole tensors and are skipped
+    for field_number, wire_type, length, offset in _iter_fields(source, start, end):
+        if wire_type != _LENGTH_DELIMITED:
+            continue
+        if field_number == 1:
+            inputs.append(_read_string(source, length, offset))
+        elif field_number == 2:
+            outputs.append(_read_string(source, length, offset))
+        elif field_number == 3:
+            name = _read_string(source, length, offset)
+        elif field_number == 4:
+            op_type = _read_string(source, length, offset)
+        elif field_number == 7:
+            domain = _read_string(source, length, offset)
+
+    return OnnxNodeHeader(name, op_type, domain, inputs, outputs)
+
+
+def _read_tensor_shape(source, start, end):
+
+    shape = []
+    for field_number, wire_type, length, offset in _iter_fields(source, start, end):
+        if field_number != 1 or wire_type != _LENGTH_DELIMITED:
+            continue
+
+        dim = None
+        for dim_field, dim_wire_type, value, dim_offset in _iter_fields(source, offset, offset + length):
+            if dim_field == 1 and dim_wire_type == _VARINT:
+                dim = value
+            elif dim_field == 2 and dim_wire_type == _LENGTH_DELIMITED:
+                dim = _read_string(source, value, dim_offset)
+        shape.append(dim)
+
+    return shape
+
+
+def _read_value_info(source, start, end):
+
+    name, elem_type, shape = '', None, None
+    for field_number, wire_type, length, offset in _iter_fields(source, start, end):
+        if wire_type != _LENGTH_DELIMITED:
+            continue
+        if field_number == 1:
+            name = _read_string(source, length, offset)
+        elif field_number == 2:
+            # TypeProto.tensor_type, other value types only keep their name
+            for type_field, type_wire_type, type_length, type_offset in _iter_fields(source, offset, offset + length):
+                if type_field != 1 or type_wire_type != _LENGTH_DELIMITED:
+                    continue
+                shape = []
+                for tensor_field, tensor_wire_type, value, tensor_offset in \
+                        _iter_fields(source, type_offset, type_offset + type_length):
+                    if tensor_field == 1 and tensor_wire_type == _VARINT:
+                        elem_type = value
+                    elif tensor_field == 2 and tensor_wire_type == _LENGTH_DELIMITED:
+                        shape = _read_tensor_shape(source, tensor_offset, tensor_offset + value)
+
+    return OnnxValueInfo(name, elem_type, shape)
+
+
+def _read_graph(source, start, end):
+
+    name, nodes, inputs, outputs = '', [], [], []
+    initializer_count, initializer_size = 0, 0
+
+    for field_number, wire_type, length, offset in _iter_fields(source, start, end):
+        if wire_type != _LENGTH_DELIMITED:
+            continue
+        if field_number == 1:
+            nodes.append(_read_node(source, offset, offset + length))
+        elif field_number == 2:
+            name = _read_string(source, length, offset)
+        elif field_number in (5, 15):
+            # dense and sparse initializers, payload is skipped
+            initializer_count += 1
+            initializer_size += length
+        elif field_number == 11:
+            inputs.append(_read_value_info(source, offset, offset + length))
+        elif field_number == 12:
+            outputs.append(_read_value_info(source, offset, offset + length))
+
+    return OnnxGraphHeader(name, nodes, inputs, outputs, initializer_count, initializer_size)
+
+
+def _open_source(source, block_size):
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return _bytes_source(source, block_size), None
+
+    if isinstance(source, str) and source.startswith(('http://', 'https://')):
+        return _url_source(source, block_size), None
+
+    if hasattr(source, 'read') and hasattr(source, 'seek'):
+        return _file_source(source, block_size), None
+
+    fileobj = open(source, 'rb')
+
+    return _file_source(fileobj, block_size), fileobj
+
+
+def read_onnx_header(source, graph=True, block_size=DEFAULT_BLOCK_SIZE):
+    '''Reads metadata and op graph of an ONNX model without its weights.
+
+    Initializer payloads are skipped instead of parsed, so the time and
+    memory needed do not depend on the size of the model. The returned
+    header can be passed to _get_metadata in place of a loaded model.
+
+    Parameters:
+    source: path, url, bytes or seekable binary file object
+    ONNX model to read. Remote objects (http/https urls, e.g. presigned
+    urls) are read with ranged GET requests.
+
+    graph: bool, default=True
+    Whether to read nodes, inputs and outputs of the graph. With False only
+    model level fields and metadata_props are read, which needs the fewest
+    reads on remote objects.
+
+    block_size: int, default=65536
+    Minimum number of bytes fetched per read.
+
+    Returns:
+    OnnxHeader namedtuple
+    '''
+
+    source, fileobj = _open_source(source, block_size)
+
+    ir_version, model_version = None, None
+    producer_name, producer_version, domain = '', '', ''
+    opset_import, metadata_props, graph_header = {}, [], None
+
+    try:
+        for field_number, wire_type, value, offset in _iter_fields(source, 0, source.size):
+            if wire_type == _VARINT:
+                if field_number == 1:
+                    ir_version = value
+                elif field_number == 5:
+                    model_version = value
+                continue
+
+            if wire_type != _LENGTH_DELIMITED:
+                continue
+            if field_number == 2:
+                producer_name = _read_string(source, value, offset)
+            elif field_number == 3:
+                producer_version = _read_string(source, value, offset)
+            elif field_number == 4:
+                domain = _read_string(source, value, offset)
+            elif field_number == 7 and graph:
+                graph_header = _read_graph(source, offset, offset + value)
+            elif field_number == 8:
+                opset_domain, opset_version = _read_opset(source, offset, offset + value)
+                opset_import[opset_domain] = opset_version
+            elif field_number == 14:
+                metadata_props.append(_read_metadata_prop(source, offset, offset + value))
+    finally:
+        if fileobj is not None:
+            fileobj.close()
+
+    return OnnxHeader(ir_version, producer_name, producer_version, domain, model_version,
+                      opset_import, metadata_props, graph_header)
+
+
+def read_onnx_metadata(source, block_size=DEFAULT_BLOCK_SIZE):
+    '''Returns metadata_props of an ONNX model as dict, skipping its graph.'''
+
+    header = read_onnx_header(source, graph=False, block_size=block_size)
+
+    return {prop.key: prop.value for prop in header.metadata_props}
+
+
+__all__ = [
+    OnnxHeader,
+    read_onnx_header,
+    read_onnx_metadata
+]
@@ -5,20 +5,16 @@ import boto3
 from aimodelshare.api import get_api_json
 import tempfile
 
-try:
-    import torch
-except:
-    pass
 import onnx
 from aimodelshare.utils import HiddenPrints
 import signal
-from aimodelshare.aimsonnx import model_to_onnx, model_to_onnx_timed
+from aimodelshare.aimsonnx import model_to_onnx, model_to_onnx_timed, quantize_onnx
 from aimodelshare.tools import extract_varnames_fromtrainingdata, _get_extension_from_filepath
 import time
 import numpy as np
 import json
 import pandas
-import requests
+from aimodelshare import http_session
 from aimodelshare.aws import get_aws_token
 
 
@@ -54,7 +50,7 @@ class ModelPlayground:
             post_dict = {"return_task_type": "TRUE"}
             headers = { 'Content-Type':'application/json', 'authorizationToken': os.environ.get("AWS_TOKEN"),} 
             playground_url_eval=playground_url[:-1]+"eval"
-            response = requests.post(playground_url_eval,headers=headers,data=json.dumps(post_dict))
+            response = http_session.post(playground_url_eval,headers=headers,data=json.dumps(post_dict),idempotent=True)
             task_type = json.loads(response.text)['task_type']
         
         if task_type == "classification":
@@ -252,7 +248,7 @@ class ModelPlayground:
     def deploy(self, model_filepath, preprocessor_filepath, y_train, example_data=None, custom_libraries="FALSE",
                image="", reproducibility_env_filepath=None, memory=None, timeout=None, onnx_timeout=60,
                pyspark_support=False,
-               model_input=None, input_dict=None):
+               model_input=None, input_dict=None, quantization=None, quantization_tolerance=0.01):
 
         """
         Launches a live prediction REST API for deploying ML models using model parameters and user credentials, provided by the user
@@ -297,6 +293,12 @@ class ModelPlayground:
              Use to bypass text input boxes Example: {"model_name": "My Model Playground",
                       "model_description": "My Model Description",
                       "tags": "model, classification, awesome"}
+        `quantization`: ``string``
+            "dynamic" or "static" to deploy an int8 quantized model, None to deploy the float model.
+            Requires model_input, the quantized model is only deployed if its predictions on
+            model_input stay within quantization_tolerance of the float model.
+        `quantization_tolerance`: ``float``
+            Maximum accepted output divergence of the quantized model.
 
         Returns:
         --------
@@ -325,6 +327,15 @@ class ModelPlayground:
         model_filepath = model_to_onnx_timed(model_filepath, timeout=onnx_timeout,
                                              force_onnx=force_onnx, model_input=model_input)
 
+        # quantize model, raises QuantizationAccuracyError before anything is deployed
+        if quantization is not None:
+            assert model_input is not None, \
+            'Please pass example data as model_input to validate the quantized model.'
+            if isinstance(model_filepath, str):
+                model_filepath = onnx.load(model_filepath)
+            model_filepath = quantize_onnx(model_filepath, model_input, quantization=quantization,
+                                           tolerance=quantization_tolerance)
+
         import os
         if os.environ.get("cloud_location") is not None:
             cloudlocation = os.environ.get("cloud_location")
@@ -393,7 +404,6 @@ class ModelPlayground:
                   """
                     import json
                     import os
-                    import requests
                     import pandas as pd
                     wkingdir = os.getcwd()
                     if os.path.dirname(model_filepath) == '':
@@ -426,7 +436,7 @@ class ModelPlayground:
                     headers = {'Content-Type': 'application/json', 'authorizationToken': json.dumps(
                         {"token": os.environ.get("AWS_TOKEN"), "eval": "TEST"}), }
                     post_dict = {"return_zip": "True"}
-                    zipfile = requests.post(apiurl_eval, headers=headers, data=json.dumps(post_dict))
+                    zipfile = http_session.post(apiurl_eval, headers=headers, data=json.dumps(post_dict))
 
                     zipfileputlistofdicts = json.loads(zipfile.text)['put']
 
@@ -488,7 +498,7 @@ class ModelPlayground:
                     ### Load zipfile to s3
                     with open(tempdir + "/" + zipfilename, 'rb') as f:
                         files = {'file': (tempdir + "/" + zipfilename, f)}
-                        http_response = requests.post(url, data=fields, files=files)
+                        http_response = http_session.post(url, data=fields, files=files)
                     return zipfilename
 
                 deployzipfilename = upload_playground_zipfile(model_filepath, preprocessor_filepath, y_train,
@@ -510,7 +520,6 @@ class ModelPlayground:
                                                          "") + "." + "deploy('/tmp/" + model_filepath + "','/tmp/" + preprocessor_filepath + "'," + 'y_train' + "," + nonecheck(
                     example_data) + ",input_dict=" + str(input_dict) + ')'
                 import base64
-                import requests
                 import json
 
                 api_url = "https://z4kvag4sxdnv2mvs2b6c4thzj40bxnuw.lambda-url.us-east-2.on.aws/"
@@ -522,7 +531,7 @@ class ModelPlayground:
 
                 headers = {"Content-Type": "application/json"}
 
-                response = requests.request("POST", api_url, headers=headers, data=data)
+                response = http_session.request("POST", api_url, headers=headers, data=data, timeout=None)
                 # Print response
                 global successful_deployment_info340893124738241023
 
@@ -609,7 +618,6 @@ class ModelPlayground:
 
     def get_apikey(self):
         import os
-        import requests
         import json
         if all(["username" in os.environ,
                 "password" in os.environ]):
@@ -623,7 +631,7 @@ class ModelPlayground:
 
         apiurl_eval = self.playground_url[:-1] + "eval"
 
-        api_json = requests.post(apiurl_eval, headers=headers, data=json.dumps(post_dict))
+        api_json = http_session.post(apiurl_eval, headers=headers, data=json.dumps(post_dict), idempotent=True)
 
         return json.loads(api_json.text)['apikey']
 
@@ -875,7 +883,6 @@ class ModelPlayground:
 
                 import json
                 import os
-                import requests
                 import pandas as pd
                 if eval_metric_filepath == None:
                     pass
@@ -891,7 +898,7 @@ class ModelPlayground:
                 headers = {'Content-Type': 'application/json',
                            'authorizationToken': json.dumps({"token": os.environ.get("AWS_TOKEN"), "eval": "TEST"}), }
                 post_dict = {"return_zip": "True"}
-                zipfile = requests.post(apiurl_eval, headers=headers, data=json.dumps(post_dict))
+                zipfile = http_session.post(apiurl_eval, headers=headers, data=json.dumps(post_dict))
 
                 zipfileputlistofdicts = json.loads(zipfile.text)['put']
 
@@ -954,7 +961,7 @@ class ModelPlayground:
                 ### Load zipfile to s3
                 with open(tempdir + "/" + zipfilename, 'rb') as f:
                     files = {'file': (tempdir + "/" + zipfilename, f)}
-                    http_response = requests.post(url, data=fields, files=files)
+                    http_response = http_session.post(url, data=fields, files=files)
                 return zipfilename
 
             compzipfilename = upload_comp_exp_zipfile(data_directory, y_test, eval_metric_filepath, email_list)
@@ -974,7 +981,6 @@ class ModelPlayground:
                 eval_metric_filepath) + "," + 'email_list' + ",input_dict=" + str(input_dict) + ')'
 
             import base64
-            import requests
             import json
 
             api_url = "https://z4kvag4sxdnv2mvs2b6c4thzj40bxnuw.lambda-url.us-east-2.on.aws/"
@@ -986,7 +992,7 @@ class ModelPlayground:
 
             headers = {"Content-Type": "application/json"}
 
-            response = requests.request("POST", api_url, headers=headers, data=data)
+            response = http_session.request("POST", api_url, headers=headers, data=data, timeout=None)
             result = json.loads(response.text)
             printoutlist = json.loads(result['body'])
             printoutlistfinal = printoutlist[2:len(printoutlist)]
@@ -1074,7 +1080,6 @@ class ModelPlayground:
 
                 import json
                 import os
-                import requests
                 import pandas as pd
                 if eval_metric_filepath == None:
                     pass
@@ -1090,7 +1095,7 @@ class ModelPlayground:
                 headers = {'Content-Type': 'application/json',
                            'authorizationToken': json.dumps({"token": os.environ.get("AWS_TOKEN"), "eval": "TEST"}), }
                 post_dict = {"return_zip": "True"}
-                zipfile = requests.post(apiurl_eval, headers=headers, data=json.dumps(post_dict))
+                zipfile = http_session.post(apiurl_eval, headers=headers, data=json.dumps(post_dict))
 
                 zipfileputlistofdicts = json.loads(zipfile.text)['put']
 
@@ -1153,7 +1158,7 @@ class ModelPlayground:
                 ### Load zipfile to s3
                 with open(tempdir + "/" + zipfilename, 'rb') as f:
                     files = {'file': (tempdir + "/" + zipfilename, f)}
-                    http_response = requests.post(url, data=fields, files=files)
+                    http_response = http_session.post(url, data=fields, files=files)
                 return zipfilename
 
             compzipfilename = upload_comp_exp_zipfile(data_directory, y_test, eval_metric_filepath, email_list)
@@ -1173,7 +1178,6 @@ class ModelPlayground:
                 eval_metric_filepath) + "," + 'email_list' + ",input_dict=" + str(input_dict) + ')'
             print(compstring)
             import base64
-            import requests
             import json
 
             api_url = "https://z4kvag4sxdnv2mvs2b6c4thzj40bxnuw.lambda-url.us-east-2.on.aws/"
@@ -1185,7 +1189,7 @@ class ModelPlayground:
 
             headers = {"Content-Type": "application/json"}
 
-            response = requests.request("POST", api_url, headers=headers, data=data)
+            response = http_session.request("POST", api_url, headers=headers, data=data, timeout=None)
             print(response.text)
 
             return (response.text)
@@ -1204,7 +1208,7 @@ class ModelPlayground:
 
     def submit_model(self, model, preprocessor, prediction_submission, submission_type="experiment",
                      sample_data=None, reproducibility_env_filepath=None, custom_metadata=None, input_dict=None,
-                     onnx_timeout=60, model_input=None):
+                     onnx_timeout=60, model_input=None, profile=False):
         """
         Submits model/preprocessor to machine learning competition using live prediction API url generated by AI Modelshare library
         The submitted model gets evaluated and compared with all existing models and a leaderboard can be generated
@@ -1216,6 +1220,9 @@ class ModelPlayground:
             value - predictions for test data
             [REQUIRED] for evaluation metrics of the submitted model
         `preprocessor`: preprocessor function object
+        `profile`: ``bool``, default=False
+            benchmarks the converted model on this machine for the latency
+            and throughput columns of the leaderboard
 
         Returns:
         --------
@@ -1234,7 +1241,7 @@ class ModelPlayground:
         else:
             force_onnx = False
         model = model_to_onnx_timed(model, timeout=onnx_timeout,
-                                    force_onnx=force_onnx, model_input=model_input)
+                                    force_onnx=force_onnx, model_input=model_input, profile=profile)
 
         # create input dict
         if not input_dict:
@@ -1315,7 +1322,7 @@ class ModelPlayground:
 
         return update
 
-    def instantiate_model(self, version=None, trained=False, reproduce=False, submission_type="experiment"):
+    def instantiate_model(self, version=None, trained=False, reproduce=False, submission_type="experiment", model=None):
         """
         Import a model previously submitted to a leaderboard to use in your session
         Parameters:
@@ -1324,6 +1331,8 @@ class ModelPlayground:
             Model version number from competition or experiment leaderboard
         `trained`: ``bool, default=False``
             if True, a trained model is instantiated, if False, the untrained model is instantiated
+        `model`: ``torch.nn.Module, default=None``
+            pytorch model with the architecture of the submitted model, trained weights are loaded into it
         Returns:
         --------
         model: model chosen from leaderboard
@@ -1332,7 +1341,7 @@ class ModelPlayground:
             "You are trying to Instantiate model with ModelPlayground Object, Please use the competition object to Instantiate model")
         from aimodelshare.aimsonnx import instantiate_model
         model = instantiate_model(apiurl=self.playground_url, trained=trained, version=version, reproduce=reproduce,
-                                  submission_type=submission_type)
+                                  submission_type=submission_type, model=model)
         return model
 
     def replicate_model(self, version=None, submission_type="experiment"):
@@ -1441,7 +1450,7 @@ class ModelPlayground:
                                        'Access-Control-Allow-Headers':
                                            'Content-Type,X-Amz-Date,authorizationToken,Access-Control-Allow-Origin,X-Api-Key,X-Amz-Security-Token,Authorization',
                                        'Access-Control-Allow-Origin': '*'}
-        response = requests.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
+        response = http_session.post("https://bhrdesksak.execute-api.us-east-1.amazonaws.com/dev/modeldata",
                                  json=bodydata, headers=headers_with_authentication)
 
         print("Your evaluation data has been updated.")
@@ -1511,19 +1520,13 @@ class ModelPlayground:
         # create temporary folder
         temp_dir = tempfile.gettempdir()
 
-        from aimodelshare.aws import get_s3_iam_client, run_function_on_lambda
+        from aimodelshare.aws import get_s3_iam_client, resolve_playground
         s3, iam, region = get_s3_iam_client(os.environ.get("AWS_ACCESS_KEY_ID_AIMS"),
                                             os.environ.get("AWS_SECRET_ACCESS_KEY_AIMS"),
                                             os.environ.get("AWS_REGION_AIMS"))
 
         # Get bucket and model_id subfolder for user based on apiurl {{{
-        response, error = run_function_on_lambda(
-            self.playground_url, **{"delete": "FALSE", "versionupdateget": "TRUE"}
-        )
-        if error is not None:
-            raise error
-
-        _, api_bucket, model_id = json.loads(response.content.decode("utf-8"))
+        api_bucket, model_id = resolve_playground(self.playground_url)
         # }}}
 
         # upload eval_data data:
@@ -1628,7 +1631,7 @@ class ModelPlayground:
         stylized_compare = stylize_model_comparison(comp_dict_out=compare_dict, naming_convention=naming_convention)
         return (stylized_compare)
 
-    def instantiate_model(self, version=None, trained=False, reproduce=False, submission_type="experiment"):
+    def instantiate_model(self, version=None, trained=False, reproduce=False, submission_type="experiment", model=None):
         """
         Import a model previously submitted to the competition leaderboard to use in your session
         Parameters:
@@ -1637,6 +1640,8 @@ class ModelPlayground:
             Model version number from competition leaderboard
         `trained`: ``bool, default=False``
             if True, a trained model is instantiated, if False, the untrained model is instantiated
+        `model`: ``torch.nn.Module, default=None``
+            pytorch model with the architecture of the submitted model, trained weights are loaded into it
 
         Returns:
         --------
@@ -1644,7 +1649,7 @@ class ModelPlayground:
         """
         from aimodelshare.aimsonnx import instantiate_model
         model = instantiate_model(apiurl=self.playground_url, trained=trained, version=version,
-                                  reproduce=reproduce, submission_type=submission_type)
+                                  reproduce=reproduce, submission_type=submission_type, model=model)
         return model
 
     def inspect_eval_data(self, submission_type="experiment"):
@@ -1681,7 +1686,7 @@ class Competition:
 
     def submit_model(self, model, preprocessor, prediction_submission,
                      sample_data=None, reproducibility_env_filepath=None, custom_metadata=None, input_dict=None,
-                     print_output=True, onnx_timeout=60, model_input=None):
+                     print_output=True, onnx_timeout=60, model_input=None, profile=False):
         """
         Submits model/preprocessor to machine learning competition using live prediction API url generated by AI Modelshare library
         The submitted model gets evaluated and compared with all existing models and a leaderboard can be generated
@@ -1702,6 +1707,9 @@ class Competition:
             "./preprocessor.zip"
             searches for an exported zip preprocessor file in the current directory
             file is generated from preprocessor module using export_preprocessor function from the AI Modelshare library
+        `profile`: ``bool``, default=False
+            benchmarks the converted model on this machine for the latency
+            and throughput columns of the leaderboard
 
         Returns:
         --------
@@ -1716,7 +1724,7 @@ class Competition:
 
         with HiddenPrints():
             model = model_to_onnx_timed(model, timeout=onnx_timeout,
-                                        force_onnx=force_onnx, model_input=model_input)
+                                        force_onnx=force_onnx, model_input=model_input, profile=profile)
 
         from aimodelshare.model import submit_model
         submission = submit_model(model_filepath=model,
@@ -1727,11 +1735,12 @@ class Competition:
                                   custom_metadata=custom_metadata,
                                   submission_type=self.submission_type,
                                   input_dict=input_dict,
-                                  print_output=print_output)
+                                  print_output=print_output,
+                                  model_input=model_input)
 
         return submission
 
-    def instantiate_model(self, version=None, trained=False, reproduce=False):
+    def instantiate_model(self, version=None, trained=False, reproduce=False, model=None):
         """
         Import a model previously submitted to the competition leaderboard to use in your session
         Parameters:
@@ -1740,6 +1749,8 @@ class Competition:
             Model version number from competition leaderboard
         `trained`: ``bool, default=False``
             if True, a trained model is instantiated, if False, the untrained model is instantiated
+        `model`: ``torch.nn.Module, default=None``
+            pytorch model with the architecture of the submitted model, trained weights are loaded into it
 
         Returns:
         --------
@@ -1747,7 +1758,7 @@ class Competition:
         """
         from aimodelshare.aimsonnx import instantiate_model
         model = instantiate_model(apiurl=self.playground_url, trained=trained, version=version,
-                                  reproduce=reproduce, submission_type=self.submission_type)
+                                  reproduce=reproduce, submission_type=self.submission_type, model=model)
         return model
 
     def replicate_model(self, version=None):
@@ -0,0 +1,182 @@
+import io
+import os
+import zlib
+
+import numpy as np
+
+
+# Compact binary format for submitted predictions. Values are stored as npy
+# arrays instead of json lists: floats keep their dtype, labels and integers
+# are label encoded to the smallest unsigned code type with their classes
+# stored once. The payload is compressed and decoded with np.frombuffer, so
+# the eval lambda only copies the data when it is decompressed.
+#
+# Layout: MAGIC, format version byte, codec byte, compressed payload. The
+# payload holds the values or codes npy array followed by the classes npy
+# array for label encoded predictions.
+
+MAGIC = b"AIMSPRED"
+FORMAT_VERSION = 1
+
+# zstd needs zstandard on the client and in the eval lambda, zlib is always available
+DEFAULT_COMPRESSION = "zlib"
+
+_CODECS = {"none": 0, "zlib": 1, "zstd": 2}
+_HEADER_SIZE = len(MAGIC) + 2
+
+# npy headers of written arrays are far smaller, version 1.0 headers are at most 65535 bytes
+_MAX_NPY_HEADER = 65535 + 10
+
+
+def _zstandard():
+
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Error: Please install zstandard to enable zstd compressed predictions")
+
+    return zstandard
+
+
+def _compress(payload, compression, level):
+
+    if compression == "zlib":
+        return zlib.compress(payload, 6 if level is None else level)
+    if compression == "zstd":
+        return _zstandard().ZstdCompressor(level=3 if level is None else level).compress(payload)
+
+    return payload
+
+
+def _decompress(payload, codec):
+
+    if codec == _CODECS["zlib"]:
+        return zlib.decompress(payload)
+    if codec == _CODECS["zstd"]:
+        return _zstandard().ZstdDecompressor().decompress(payload)
+    if codec == _CODECS["none"]:
+        return payload
+
+    raise ValueError("Unknown compression codec " + str(codec) + " in encoded predictions.")
+
+
+def _code_dtype(n_classes):
+
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n_classes <= np.iinfo(dtype).max + 1:
+            return dtype
+
+    return np.uint64
+
+
+def _as_array(predictions):
+
+    values = np.asarray(predictions)
+
+    # object arrays of python scalars are typed again, anything else cannot be stored without pickle
+    if values.dtype.kind == 'O':
+        values = np.array(values.tolist())
+        if values.dtype.kind == 'O':
+            raise ValueError("Predictions must be numbers or labels to be encoded.")
+
+    return values
+
+
+def _write_npy(stream, array):
+
+    np.lib.format.write_array(stream, np.ascontiguousarray(array), allow_pickle=False)
+
+
+def _read_npy(buffer, offset):
+    '''Returns array viewing buffer at offset and the offset after its data.'''
+
+    stream = io.BytesIO(buffer[offset:offset + _MAX_NPY_HEADER])
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+
+    if dtype.hasobject:
+        raise ValueError("Encoded predictions must not contain object arrays.")
+
+    count = int(np.prod(shape))
+    data_offset = offset + stream.tell()
+    array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_offset)
+
+    return array.reshape(shape, order='F' if fortran_order else 'C'), data_offset + count * dtype.itemsize
+
+
+def encode_predictions(predictions, compression=None, level=None):
+    '''Encodes predictions to the compact binary submission format.
+
+    Parameters:
+    predictions: list or array-like
+    Predicted labels or values, one per row of the test data.
+
+    compression: str, default=None
+    "zlib", "zstd" or "none". None uses AIMODELSHARE_PREDICTION_COMPRESSION
+    or zlib. zstd needs the zstandard package in the eval lambda as well.
+
+    level: int, default=None
+    Compression level, None uses the codec default.
+
+    Returns:
+    bytes
+    '''
+
+    if compression is None:
+        compression = os.environ.get("AIMODELSHARE_PREDICTION_COMPRESSION", DEFAULT_COMPRESSION)
+    if compression not in _CODECS:
+        raise ValueError("compression must be one of " + ", ".join(_CODECS) + ".")
+
+    values = _as_array(predictions)
+
+    stream = io.BytesIO()
+    if values.dtype.kind in 'fc':
+        _write_npy(stream, values)
+    else:
+        classes, codes = np.unique(values, return_inverse=True)
+        _write_npy(stream, codes.reshape(values.shape).astype(_code_dtype(len(classes))))
+        _write_npy(stream, classes)
+
+    payload = _compress(stream.getvalue(), compression, level)
+
+    return MAGIC + bytes([FORMAT_VERSION, _CODECS[compression]]) + payload
+
+
+def is_encoded_predictions(data):
+    '''Returns whether data starts like encoded predictions.'''
+
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:len(MAGIC)]) == MAGIC
+
+
+def decode_predictions(data):
+    '''Decodes predictions written by encode_predictions to a numpy array.
+
+    Numeric predictions are returned as read-only views of the decompressed
+    payload, label encoded predictions are mapped back to their classes.'''
+
+    if not is_encoded_predictions(data):
+        raise ValueError("Data are not encoded predictions.")
+
+    version, codec = data[len(MAGIC)], data[len(MAGIC) + 1]
+    if version > FORMAT_VERSION:
+        raise ValueError("Encoded predictions use format version " + str(version) +
+                         ", please update aimodelshare.")
+
+    payload = memoryview(_decompress(memoryview(data)[_HEADER_SIZE:], codec))
+
+    values, offset = _read_npy(payload, 0)
+    if offset < len(payload):
+        classes, _ = _read_npy(payload, offset)
+        values = classes[values]
+
+    return values
+
+
+__all__ = [
+    encode_predictions,
+    decode_predictions,
+    is_encoded_predictions
+]
@@ -3,13 +3,14 @@ import sys
 import json
 import random
 import tempfile
+import shutil
 import pkg_resources
 import requests
+from aimodelshare import http_session
 
 import numpy as np
-import tensorflow as tf
 
-from aimodelshare.aws import get_s3_iam_client, run_function_on_lambda, get_aws_client
+from aimodelshare.aws import get_s3_iam_client, resolve_playground, get_aws_client
 
 def export_reproducibility_env(seed, directory, mode="gpu"):
   # Change the output into json.dumps
@@ -59,6 +60,9 @@ def export_reproducibility_env(seed, directory, mode="gpu"):
   return print("Your reproducibility environment is now saved to 'reproducibility.json'")
 
 def set_reproducibility_env(reproducibility_env):
+  # seed codes reference tensorflow, only import it once they are executed
+  import tensorflow as tf
+
   # Change the input into dict / json
   for global_code in reproducibility_env["global_seed_code"]:
     exec("%s" % (global_code))
@@ -101,7 +105,7 @@ def import_reproducibility_env_from_competition_model(apiurl,version,submission_
 
   apiurl_eval=apiurl[:-1]+"eval"
 
-  resp = requests.post(apiurl_eval,headers=headers,data=json.dumps(post_dict)) 
+  resp = http_session.post(apiurl_eval,headers=headers,data=json.dumps(post_dict),idempotent=True) 
 
   # Check for appropriate response from Lambda. 
   try :
@@ -136,13 +140,7 @@ def import_reproducibility_env_from_model(apiurl):
     reproducibility_env_filename = "/runtime_reproducibility.json"
 
     # Get bucket and model_id for user
-    response, error = run_function_on_lambda(
-        apiurl, **{"delete": "FALSE", "versionupdateget": "TRUE"}
-    )
-    if error is not None:
-        raise error
-
-    _, bucket, model_id = json.loads(response.content.decode("utf-8"))
+    bucket, model_id = resolve_playground(apiurl)
 
     try:
         resp_string = aws_client["client"].get_object(
@@ -155,12 +153,14 @@ def import_reproducibility_env_from_model(apiurl):
         print("This model was not deployed with reproducibility support")
         raise err
 
-    # generate tempfile for onnx object 
-    temp_dir = tempfile.gettempdir()
-    temp_path = os.path.join(temp_dir, 'temp_file_name')
+    # save reproducibility env to private temporary path
+    temp_dir = tempfile.mkdtemp()
+    temp_path = os.path.join(temp_dir, 'reproducibility.json')
 
-    # save onnx to temporary path
-    with open(temp_path, "wb") as f:
-        f.write(reproducibility_env_string)
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(reproducibility_env_string)
 
-    import_reproducibility_env(temp_path)
+        import_reproducibility_env(temp_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import tempfile
+import threading
+
+
+class TTLCache:
+    '''Thread safe cache whose entries expire ttl seconds after they were stored.
+
+    When path is given, entries are also kept in a json file so that they
+    survive the process. Values have to be json serializable.
+
+    Parameters:
+    ttl: float
+    Lifetime of entries in seconds. 0 disables the cache.
+
+    path: str, default=None
+    Json file the entries are persisted to. None keeps them in memory only.
+    '''
+
+    def __init__(self, ttl, path=None):
+
+        self.ttl = ttl
+        self.path = path
+
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+
+        if self._entries is not None:
+            return
+
+        self._entries = {}
+        if self.path is None:
+            return
+
+        try:
+            with open(self.path) as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _save(self):
+
+        if self.path is None:
+            return
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # write to private temp file first so concurrent readers never see partial files
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+    def get(self, key):
+        '''Returns value stored under key or None if it is missing or expired.'''
+
+        if self.ttl <= 0:
+            return None
+
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires < time.time():
+                del self._entries[key]
+                self._save()
+                return None
+
+        return value
+
+    def put(self, key, value):
+        '''Stores value under key for ttl seconds.'''
+
+        if self.ttl <= 0:
+            return
+
+        with self._lock:
+            self._load()
+            self._entries[key] = [time.time() + self.ttl, value]
+            self._save()
+
+    def invalidate(self, key=None):
+        '''Removes entry for key, or all entries when key is None.'''
+
+        with self._lock:
+            self._load()
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._save()
+
+
+__all__ = [
+    TTLCache
+]
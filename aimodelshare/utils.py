@@ -55,3 +55,138 @@ def ignore_warning(warning: Type[Warning]):
         return wrapper
 
     return inner
+
+
+class _MultipartFileStream:
+    '''File-like multipart/form-data body that reads the uploaded file in chunks.'''
+
+    def __init__(self, fields, filepath, boundary, chunk_size=8 * 1024**2):
+        preamble = ''
+        for key, value in fields.items():
+            preamble += '--' + boundary + '\r\nContent-Disposition: form-data; name="' + key + '"\r\n\r\n' + str(value) + '\r\n'
+        preamble += '--' + boundary + '\r\nContent-Disposition: form-data; name="file"; filename="' + \
+                    os.path.basename(filepath) + '"\r\nContent-Type: application/octet-stream\r\n\r\n'
+
+        self._parts = [preamble.encode(), None, ('\r\n--' + boundary + '--\r\n').encode()]
+        self._length = len(self._parts[0]) + os.path.getsize(filepath) + len(self._parts[2])
+        self._filepath = filepath
+        self._chunk_size = chunk_size
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        yield self._parts[0]
+        with open(self._filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(self._chunk_size), b''):
+                yield chunk
+        yield self._parts[2]
+
+    def read(self, size=-1):
+        if not hasattr(self, '_iterator'):
+            self._iterator = iter(self)
+            self._buffer = b''
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._iterator, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def upload_file_presigned_post(url, fields, filepath):
+    """
+    Upload a file with a presigned S3 POST without loading it into memory.
+
+    Args:
+        url (str): presigned POST url.
+        fields (dict): presigned POST form fields.
+        filepath (str): path of the file to upload.
+
+    Returns:
+        the requests response
+    """
+    import uuid
+    from aimodelshare import http_session
+
+    boundary = uuid.uuid4().hex
+    body = _MultipartFileStream(fields, filepath, boundary)
+
+    return http_session.post(url, data=body,
+                         headers={'Content-Type': 'multipart/form-data; boundary=' + boundary})
+
+
+DEFAULT_UPLOAD_WORKERS = 4
+
+
+def presigned_post_job(presigned_post, filepath):
+    """
+    Create an upload job that streams a file to a presigned S3 POST.
+
+    Args:
+        presigned_post (dict): presigned POST with 'url' and 'fields'.
+        filepath (str): path of the file to upload.
+
+    Returns:
+        a function that uploads the file and raises on error responses
+    """
+
+    def upload():
+        response = upload_file_presigned_post(presigned_post['url'], presigned_post['fields'], filepath)
+        response.raise_for_status()
+        return response
+
+    return upload
+
+
+def run_upload_jobs(jobs, max_workers=DEFAULT_UPLOAD_WORKERS, print_progress=True):
+    """
+    Run upload jobs concurrently in a bounded thread pool.
+
+    Larger artifacts are started first so that small ones upload next to
+    them instead of queueing behind. The function only returns once every
+    job has finished.
+
+    Args:
+        jobs (list): (name, size in bytes, function) tuples.
+        max_workers (int): maximum number of concurrent uploads.
+        print_progress (bool): print a line for each finished artifact.
+
+    Returns:
+        dict of job name to the value returned by its function
+
+    Raises:
+        AWSUploadError: if any of the jobs failed, after all jobs finished.
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from aimodelshare.exceptions import AWSUploadError
+
+    jobs = sorted(jobs, key=lambda job: job[1], reverse=True)
+    results, errors = {}, {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs) or 1))) as executor:
+        start = time.time()
+        futures = {executor.submit(function): (name, size) for name, size, function in jobs}
+
+        for finished, future in enumerate(as_completed(futures), 1):
+            name, size = futures[future]
+            try:
+                results[name] = future.result()
+                status = "uploaded"
+            except Exception as err:
+                errors[name] = err
+                status = "failed"
+
+            if print_progress:
+                print("[{}/{}] {} {} ({:.1f} MB, {:.1f}s)".format(
+                    finished, len(jobs), name, status, size / 1e6, time.time() - start))
+
+    if errors:
+        raise AWSUploadError("Upload failed for " + ", ".join(
+            name + ": " + str(err) for name, err in errors.items()))
+
+    return results
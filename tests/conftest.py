@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def aimodelshare_dirs(tmp_path, monkeypatch):
+    '''Keeps conversion cache, artifact store and upload journals of every test in tmp_path.'''
+
+    import aimodelshare.conversion_cache as conversion_cache
+
+    monkeypatch.setenv("AIMODELSHARE_CACHE_DIR", str(tmp_path / "onnx_cache"))
+    monkeypatch.setenv("AIMODELSHARE_ARTIFACT_DIR", str(tmp_path / "artifacts"))
+    monkeypatch.setenv("AIMODELSHARE_UPLOAD_JOURNAL_DIR", str(tmp_path / "uploads"))
+
+    # process wide instances are created again from the environment above
+    monkeypatch.setattr(conversion_cache, "_conversion_cache", None)
+    monkeypatch.setattr(conversion_cache, "_artifact_store", None)
+
+    return tmp_path
@@ -10,9 +10,21 @@ from aimodelshare.aimsonnx import _pyspark_to_onnx
 from aimodelshare.aimsonnx import _keras_to_onnx
 from aimodelshare.aimsonnx import _pytorch_to_onnx
 from aimodelshare.aimsonnx import _misc_to_onnx
+from aimodelshare.aimsonnx import model_to_onnx
+from aimodelshare.aimsonnx import model_to_onnx_many
+from aimodelshare.aimsonnx import optimize_onnx, onnx_to_ort, _get_metadata
+from aimodelshare.aimsonnx import quantize_onnx
+from aimodelshare.aimsonnx import profile_onnx
+from aimodelshare.aimsonnx import save_onnx, _inference_session
+from aimodelshare.aimsonnx import estimate_memory_size
+from aimodelshare.aimsonnx import _describe_model, torch_metadata
+from aimodelshare.aimsonnx import save_torch_state, load_torch_state
+from aimodelshare.aimsonnx import _dump_metadata, _load_metadata, METADATA_SCHEMA_VERSION
+from aimodelshare.exceptions import QuantizationAccuracyError
 from sklearn.linear_model import LogisticRegression
 from sklearn.neural_network import MLPClassifier
 import onnx
+import pytest
 from xgboost import XGBClassifier
 from pyspark.ml.classification import RandomForestClassifier, MultilayerPerceptronClassifier
 from keras.models import Sequential
@@ -38,6 +50,235 @@ def test_sklearn_to_onnx():
     # assert isinstance(onnx_model, onnx.ModelProto)
 
 
+def test_sklearn_to_onnx_threads():
+
+    from concurrent.futures import ThreadPoolExecutor
+    from sklearn.datasets import load_iris
+    data = load_iris()
+    X = data.data
+    y = data.target
+
+    models = [LogisticRegression(C=c, solver='liblinear').fit(X, y) for c in [0.1, 1, 10, 100]]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        onnx_models = list(pool.map(_sklearn_to_onnx, models))
+
+    for model, onnx_model in zip(models, onnx_models):
+        meta = [i.value for i in onnx_model.metadata_props if i.key == 'model_metadata'][0]
+        assert "'C': " + str(model.C) in meta
+
+
+def test_model_to_onnx_many():
+
+    from sklearn.datasets import load_iris
+    data = load_iris()
+    X = data.data
+    y = data.target
+
+    models = [LogisticRegression(C=c, solver='liblinear').fit(X, y) for c in [0.1, 1, 10]]
+    models.append(LogisticRegression())  # not fitted
+
+    results = model_to_onnx_many(models, framework='sklearn', n_jobs=2, use_cache=False)
+
+    assert len(results) == 4
+    for result in results[:3]:
+        assert isinstance(result.onnx_model, onnx.ModelProto)
+        assert result.error is None
+        assert result.seconds > 0
+    assert results[3].onnx_model is None
+    assert results[3].error is not None
+
+
+def test_optimize_onnx():
+
+    from sklearn.datasets import load_iris
+    data = load_iris()
+    X = data.data
+    y = data.target
+
+    model = LogisticRegression(C=10, penalty='l1', solver='liblinear')
+    model.fit(X, y)
+
+    onnx_model = model_to_onnx(model, framework='sklearn', optimization_level='extended')
+    assert isinstance(onnx_model, onnx.ModelProto)
+    assert _get_metadata(onnx_model)['onnx_optimization_level'] == 'extended'
+
+    ort_model = onnx_to_ort(onnx_model)
+    assert isinstance(ort_model, bytes) and len(ort_model) > 0
+
+
+def test_quantize_onnx():
+
+    from sklearn.datasets import load_iris
+    data = load_iris()
+    X = data.data
+    y = data.target
+
+    model = MLPClassifier(hidden_layer_sizes=(32,), max_iter=500, random_state=0)
+    model.fit(X, y)
+    onnx_model = model_to_onnx(model, framework='sklearn')
+
+    quantized_model = quantize_onnx(onnx_model, X, quantization='dynamic', tolerance=0.2)
+    assert isinstance(quantized_model, onnx.ModelProto)
+    assert _get_metadata(quantized_model)['quantization']['mode'] == 'dynamic'
+
+    try:
+        quantize_onnx(onnx_model, X, quantization='dynamic', tolerance=-1)
+        assert False
+    except QuantizationAccuracyError:
+        pass
+
+
+def test_sklearn_to_onnx_tensor_output():
+
+    from sklearn.datasets import load_iris
+    import onnxruntime as rt
+    data = load_iris()
+    X = data.data
+    y = data.target
+
+    model = LogisticRegression(C=10, penalty='l1', solver='liblinear')
+    model.fit(X, y)
+
+    onnx_model = _sklearn_to_onnx(model, zipmap=False)
+    assert _get_metadata(onnx_model)['zipmap'] == False
+
+    sess = rt.InferenceSession(onnx_model.SerializeToString())
+    labels, probabilities = sess.run(None, {sess.get_inputs()[0].name: X.astype('float32')})
+    assert probabilities.shape == (len(X), 3)
+
+
+def test_profile_onnx():
+
+    from sklearn.datasets import load_iris
+    data = load_iris()
+    X = data.data
+    y = data.target
+
+    model = LogisticRegression(C=10, penalty='l1', solver='liblinear')
+    model.fit(X, y)
+    onnx_model = model_to_onnx(model, framework='sklearn', profile=False)
+
+    profile = profile_onnx(onnx_model, X, batch_sizes=(1, 16), repeats=5)
+    assert set(profile['batch_sizes'].keys()) == {1, 16}
+    assert profile['latency_p50_ms'] <= profile['latency_p99_ms']
+    assert profile['rows_per_sec'] > 0
+
+    # profiling is opt-in
+    assert not _get_metadata(model_to_onnx(model, framework='sklearn')).get('inference_profile')
+
+    onnx_model = model_to_onnx(model, framework='sklearn', profile=True)
+    assert 'latency_p50_ms' in _get_metadata(onnx_model)['inference_profile']
+
+
+def test_save_onnx_external_data(tmp_path, monkeypatch):
+
+    import os
+    import aimodelshare.aimsonnx as aimsonnx
+    from sklearn.datasets import load_iris
+    data = load_iris()
+    X = data.data
+    y = data.target
+
+    model = MLPClassifier(hidden_layer_sizes=(256,), max_iter=5)
+    model.fit(X, y)
+    onnx_model = model_to_onnx(model, framework='sklearn', profile=False, use_cache=False)
+    expected = _inference_session(onnx_model).run(None, {'float_input': X.astype('float32')})[0]
+
+    # pretend the model is larger than the protobuf limit
+    monkeypatch.setattr(aimsonnx, 'EXTERNAL_DATA_THRESHOLD', 1024)
+    files = save_onnx(onnx_model, str(tmp_path / 'model.onnx'))
+    assert len(files) == 2 and os.path.exists(files[1])
+    assert os.path.getsize(files[0]) < os.path.getsize(files[1])
+
+    # initializers are restored on the saved object and reloaded from disk
+    assert all(len(init.external_data) == 0 for init in onnx_model.graph.initializer)
+    reloaded = onnx.load(files[0])
+    result = _inference_session(reloaded).run(None, {'float_input': X.astype('float32')})[0]
+    assert (result == expected).all()
+
+
+def test_estimate_memory_size():
+
+    from sklearn.datasets import load_iris
+    from sklearn.ensemble import RandomForestClassifier as SklearnRandomForest
+    data = load_iris()
+    X = data.data
+    y = data.target
+
+    model = SklearnRandomForest(n_estimators=20)
+    model.fit(X, y)
+    size, method = estimate_memory_size(model)
+    assert method == 'array_walk'
+    assert size > sum(tree.tree_.value.nbytes for tree in model.estimators_)
+
+    model = nn.Sequential(nn.Linear(10, 100), nn.ReLU(), nn.Linear(100, 1))
+    size, method = estimate_memory_size(model)
+    assert method == 'torch_tensors'
+    assert size == (10 * 100 + 100 + 100 + 1) * 4
+
+
+def test_describe_model():
+
+    model = nn.Sequential(nn.Sequential(nn.Linear(10, 20), nn.ReLU()),
+                          nn.Sequential(nn.Sequential(nn.Linear(20, 5))),
+                          nn.Softmax(dim=1))
+
+    structure = _describe_model(model)
+    assert [info.layer for info in structure.layers] == ['Linear', 'ReLU', 'Linear', 'Softmax']
+    assert [info.params for info in structure.layers] == [220, 0, 105, 0]
+    assert len(structure.edges) == 3
+
+    # computed once per model object
+    assert _describe_model(model) is structure
+
+    name_list, layer_list, param_list, weight_list, activation_list = torch_metadata(model)
+    assert layer_list == ['Linear', 'Linear']
+    assert weight_list == [((20, 10), (20,)), ((5, 20), (5,))]
+
+
+def test_torch_state(tmp_path):
+
+    model = nn.Sequential(nn.Linear(10, 20), nn.BatchNorm1d(20), nn.Linear(20, 1))
+    filepath = save_torch_state(model, str(tmp_path / 'model_state.safetensors'))
+
+    state_dict = load_torch_state(filepath)
+    assert list(state_dict.keys()) == list(model.state_dict().keys())
+    for name, tensor in model.state_dict().items():
+        assert state_dict[name].dtype == tensor.dtype
+        assert torch.equal(state_dict[name], tensor)
+
+    restored = nn.Sequential(nn.Linear(10, 20), nn.BatchNorm1d(20), nn.Linear(20, 1))
+    restored.load_state_dict(state_dict)
+    x = torch.randn(4, 10)
+    model.eval()
+    restored.eval()
+    assert torch.equal(model(x), restored(x))
+
+
+def test_metadata_schema():
+
+    import numpy as np
+
+    metadata = {'ml_framework': 'pytorch', 'model_type': 'Sequential', 'model_config': None,
+                'model_architecture': {'layers_n_params': [np.int64(220)], 'layers_shapes': [(None, 20)]},
+                'metadata_onnx': None, 'model_weights': b'\x00\x01'}
+
+    loaded = _load_metadata(_dump_metadata(metadata))
+    assert loaded['schema_version'] == METADATA_SCHEMA_VERSION
+    assert loaded['model_architecture']['layers_n_params'] == [220]
+    assert loaded['model_weights'] == b'\x00\x01'
+
+    # metadata of models submitted with earlier versions
+    legacy = dict(metadata, model_architecture=str({'layers_n_params': [220]}))
+    loaded = _load_metadata(str(legacy))
+    assert loaded['schema_version'] == 1
+    assert loaded['model_architecture'] == {'layers_n_params': [220]}
+
+    with pytest.raises(ValueError):
+        _dump_metadata({'ml_framework': 'sklearn'})
+
+
 # def test_misc_to_onnx():
 #
 #     model = XGBClassifier()
@@ -76,6 +317,26 @@ def test_pytorch_to_onnx():
 
     onnx_model = _pytorch_to_onnx(model, torch.randn(1, 3))
     assert isinstance(onnx_model, onnx.ModelProto)
+    assert _get_metadata(onnx_model)['batch_axis'] == 'dynamic'
+
+    import onnxruntime as rt
+    sess = rt.InferenceSession(onnx_model.SerializeToString())
+    output = sess.run(None, {sess.get_inputs()[0].name: torch.randn(5, 3).numpy()})[0]
+    assert output.shape == (5, 1)
+
+
+def test_pytorch_to_onnx_keeps_train_mode():
+
+    model = nn.Sequential(nn.Linear(3, 3), nn.BatchNorm1d(3), nn.Dropout(0.5), nn.Linear(3, 1))
+    model.train()
+    state = {name: tensor.clone() for name, tensor in model.state_dict().items()}
+
+    _pytorch_to_onnx(model, torch.randn(4, 3))
+
+    # conversion neither updates running statistics nor leaves the model in eval mode
+    assert model.training
+    for name, tensor in model.state_dict().items():
+        assert torch.equal(tensor, state[name])
 
 
 def test_get_layer_names():
@@ -105,6 +366,19 @@ def test_model_from_string():
     assert model_class.__name__ == "RandomForestClassifier"
 
 
+def test_estimator_registry():
+
+    from aimodelshare.estimator_registry import estimator_modules, default_params, SKLEARN_ESTIMATOR_MODULES
+
+    # precomputed table agrees with the installed sklearn
+    scanned = estimator_modules('sklearn', scan=True)
+    for name in ['RandomForestClassifier', 'LogisticRegression', 'SVC', 'MLPClassifier']:
+        assert SKLEARN_ESTIMATOR_MODULES[name] == scanned[name]
+
+    assert default_params("LogisticRegression") == LogisticRegression().get_params()
+    assert model_from_string("LogisticRegression") is model_from_string("LogisticRegression")
+
+
 def test_get_pyspark_modules():
 
     modules = _get_pyspark_modules()
@@ -133,3 +407,46 @@ def test_layer_mapping():
     layer_map = layer_mapping(direction="keras_to_torch", activation=True)
     assert isinstance(layer_map, dict)
 
+
+
+def test_import_does_not_load_frameworks():
+
+    import subprocess
+    import sys
+    import json
+    import time
+
+    heavy_modules = ['tensorflow', 'keras', 'torch', 'xgboost', 'pyspark',
+                     'skl2onnx', 'tf2onnx', 'onnxmltools', 'networkx', 'pympler']
+
+    code = ("import sys, json; "
+            "import aimodelshare, aimodelshare.aimsonnx, aimodelshare.model, aimodelshare.leaderboard; "
+            "aimodelshare.ModelPlayground; "
+            "print(json.dumps(sorted(m for m in " + str(heavy_modules) + " if m in sys.modules)))")
+
+    start = time.time()
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    import_time = time.time() - start
+
+    assert json.loads(output.stdout.strip().splitlines()[-1]) == []
+
+    # import-time budget, generous enough for slow CI machines
+    assert import_time < 10
+
+
+def test_lazy_imports():
+
+    import subprocess
+    import sys
+    import json
+
+    # pandas and IPython are only imported by the functions that display or tabulate results
+    code = ("import sys, json; "
+            "import aimodelshare, aimodelshare.aimsonnx; "
+            "print(json.dumps([aimodelshare.aws.__name__, "
+            "sorted(m for m in ['pandas', 'IPython'] if m in sys.modules)]))")
+
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    # submodules resolve after a bare import aimodelshare
+    assert json.loads(output.stdout.strip().splitlines()[-1]) == ["aimodelshare.aws", []]
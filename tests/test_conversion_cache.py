@@ -0,0 +1,164 @@
+from aimodelshare.aimsonnx import model_to_onnx, _sklearn_to_onnx, _get_metadata
+from aimodelshare.conversion_cache import ConversionCache, model_fingerprint
+from sklearn.linear_model import LogisticRegression
+
+
+def test_model_to_onnx_cache():
+
+    from sklearn.datasets import load_iris
+    data = load_iris()
+    X = data.data
+    y = data.target
+
+    model = LogisticRegression(C=10, penalty='l1', solver='liblinear')
+    model.fit(X, y)
+
+    key = model_fingerprint(model, 'sklearn', {'task_type': 'classification'})
+    assert key == model_fingerprint(model, 'sklearn', {'task_type': 'classification'})
+    assert key != model_fingerprint(model, 'sklearn', {'task_type': 'regression'})
+
+    onnx_model = model_to_onnx(model, framework='sklearn', profile=False)
+    onnx_model_cached = model_to_onnx(model, framework='sklearn', profile=False)
+    assert onnx_model.SerializeToString() == onnx_model_cached.SerializeToString()
+
+
+def test_model_to_onnx_cache_profile(monkeypatch):
+
+    import aimodelshare.aimsonnx as aimsonnx
+    from sklearn.datasets import load_iris
+    data = load_iris()
+
+    profiles = []
+    monkeypatch.setattr(aimsonnx, 'profile_onnx', lambda onx, model_input: profiles.append(1) or {'latency_p50_ms': 1.0})
+
+    model = LogisticRegression().fit(data.data, data.target)
+    onnx_model = model_to_onnx(model, framework='sklearn', profile=True)
+    onnx_model_cached = model_to_onnx(model, framework='sklearn', profile=True)
+
+    # profile is stored with the cached model and not measured again on hits
+    assert len(profiles) == 1
+    assert _get_metadata(onnx_model_cached)['inference_profile'] == {'latency_p50_ms': 1.0}
+    assert onnx_model.SerializeToString() == onnx_model_cached.SerializeToString()
+
+
+def test_conversion_cache(tmp_path):
+
+    cache = ConversionCache(cache_dir=str(tmp_path), max_size=25)
+
+    assert cache.get('a') is None
+    cache.put('a', b'0123456789')
+    assert cache.get('a') == b'0123456789'
+
+    cache.put('b', b'0123456789')
+    cache.put('c', b'0123456789')
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['evictions'] == 1
+    assert stats['size'] <= 25
+
+
+def test_weights_artifact():
+
+    import pickle
+    import aimodelshare.conversion_cache as conversion_cache
+    from sklearn.datasets import load_iris
+    data = load_iris()
+    X = data.data
+    y = data.target
+
+    model = LogisticRegression(C=10, penalty='l1', solver='liblinear')
+    model.fit(X, y)
+    onnx_model = _sklearn_to_onnx(model)
+
+    # onnx file only holds a reference to the content addressed weights
+    metadata = _get_metadata(onnx_model)
+    assert metadata['model_weights'] is None
+    weights_artifact = metadata['weights_artifact']
+    assert weights_artifact['format'] == 'pickle'
+
+    path = conversion_cache.get_artifact_store().path(weights_artifact['sha256'])
+    with open(path, 'rb') as f:
+        restored = pickle.loads(f.read())
+    assert (restored.predict(X) == model.predict(X)).all()
+
+
+def test_weights_artifact_not_stored(monkeypatch):
+
+    import pickle
+    import pytest
+    from sklearn.datasets import load_iris
+    data = load_iris()
+
+    monkeypatch.setenv("AIMODELSHARE_ARTIFACT_MAX_SIZE", "10")
+
+    model = LogisticRegression().fit(data.data, data.target)
+    with pytest.warns(UserWarning, match="embedded"):
+        onnx_model = _sklearn_to_onnx(model)
+
+    # weights that do not fit the store are kept in the onnx file
+    metadata = _get_metadata(onnx_model)
+    assert metadata['weights_artifact'] is None
+    assert (pickle.loads(metadata['model_weights']).predict(data.data) == model.predict(data.data)).all()
+
+
+def test_model_to_onnx_cache_evicted_weights():
+
+    import aimodelshare.conversion_cache as conversion_cache
+    from sklearn.datasets import load_iris
+    data = load_iris()
+
+    model = LogisticRegression().fit(data.data, data.target)
+    weights_artifact = _get_metadata(model_to_onnx(model, framework='sklearn', profile=False))['weights_artifact']
+
+    # cached onnx file referencing an evicted artifact is converted again
+    conversion_cache.get_artifact_store().clear()
+    model_to_onnx(model, framework='sklearn', profile=False)
+
+    assert conversion_cache.get_artifact_store().path(weights_artifact['sha256']) is not None
+
+
+def test_local_weights_artifact_missing():
+
+    import pytest
+    import aimodelshare.conversion_cache as conversion_cache
+    from aimodelshare.aimsonnx import _local_weights_artifact
+    from sklearn.datasets import load_iris
+    data = load_iris()
+
+    model = LogisticRegression().fit(data.data, data.target)
+    weights_artifact = _get_metadata(_sklearn_to_onnx(model))['weights_artifact']
+    assert _local_weights_artifact(weights_artifact) is not None
+
+    # models whose weights are gone are not uploaded untrained
+    conversion_cache.get_artifact_store().clear()
+    with pytest.raises(ValueError, match="untrained"):
+        _local_weights_artifact(weights_artifact)
+
+
+def test_model_fingerprint_pytorch_forward():
+
+    import torch
+
+    # classes defined in a notebook have no source, their forward bytecode is hashed
+    code = '''
+import torch
+class Net(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.fc = torch.nn.Linear(4, 2)
+    def forward(self, x):
+        return self.fc(x) * {}
+'''
+
+    def fingerprint(scale):
+        namespace = {"__name__": "notebook"}
+        exec(code.format(scale), namespace)
+        torch.manual_seed(0)
+        return model_fingerprint(namespace["Net"](), "pytorch")
+
+    assert fingerprint(2) is not None
+    assert fingerprint(2) == fingerprint(2)
+    # same weights, redefined forward
+    assert fingerprint(2) != fingerprint(3)
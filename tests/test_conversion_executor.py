@@ -0,0 +1,79 @@
+from aimodelshare.conversion_executor import ConversionExecutor
+from aimodelshare.exceptions import ConversionTimeoutError
+from sklearn.linear_model import LogisticRegression
+import onnx
+
+
+def test_conversion_executor():
+
+    from sklearn.datasets import load_iris
+    data = load_iris()
+    X = data.data
+    y = data.target
+
+    model = LogisticRegression(C=10, penalty='l1', solver='liblinear')
+    model.fit(X, y)
+
+    with ConversionExecutor(timeout=120) as executor:
+        onnx_model = executor.convert(model, framework='sklearn', use_cache=False)
+        assert isinstance(onnx_model, onnx.ModelProto)
+
+        try:
+            executor.convert(model, timeout=0.001, framework='sklearn', use_cache=False)
+            assert False
+        except ConversionTimeoutError:
+            pass
+
+        # worker is restarted after it was killed
+        onnx_model = executor.convert(model, framework='sklearn', use_cache=False)
+        assert isinstance(onnx_model, onnx.ModelProto)
+
+
+def test_conversion_executor_main_module():
+
+    import sys
+    import textwrap
+    import subprocess
+
+    # classes defined in __main__ of a notebook or `python -c` cannot be unpickled by the worker
+    code = textwrap.dedent('''
+        import torch
+        from torch import nn
+        from aimodelshare.conversion_executor import ConversionExecutor
+
+        class Net(nn.Module):
+
+            def __init__(self):
+                super().__init__()
+                self.fc = nn.Linear(4, 2)
+
+            def forward(self, x):
+                return self.fc(x)
+
+        with ConversionExecutor(timeout=300) as executor:
+            onnx_model = executor.convert(Net(), framework='pytorch', model_input=torch.randn(1, 4),
+                                          use_cache=False, profile=False)
+        print(type(onnx_model).__name__)
+    ''')
+
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert output.stdout.strip().splitlines()[-1] == "ModelProto"
+
+
+def test_conversion_executor_in_process_timeout(monkeypatch):
+
+    import time
+    import pytest
+    from aimodelshare import aimsonnx
+
+    def model_to_onnx(model, **kwargs):
+        time.sleep(2)
+
+    monkeypatch.setattr(aimsonnx, "model_to_onnx", model_to_onnx)
+
+    # lambdas cannot be pickled, they are converted in a thread that keeps the timeout
+    with ConversionExecutor(timeout=0.1) as executor:
+        with pytest.warns(UserWarning, match="not enforced"):
+            with pytest.raises(ConversionTimeoutError):
+                executor.convert(lambda x: x)
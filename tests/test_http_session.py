@@ -0,0 +1,105 @@
+def test_http_session_retries():
+
+    import threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from aimodelshare.http_session import HttpSession
+
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _respond(self):
+            calls.append(self.command)
+            self.send_response(503 if len(calls) % 2 else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        do_GET = do_POST = _respond
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:{}/".format(server.server_port)
+
+    try:
+        session = HttpSession(retries=2, backoff_factor=0)
+
+        # idempotent requests are retried after transient errors
+        assert session.get(url).status_code == 200
+        assert calls == ["GET", "GET"]
+
+        assert session.post(url, data="{}", idempotent=True).status_code == 200
+
+        # other posts are sent once
+        assert session.post(url, data="{}").status_code == 503
+        assert calls == ["GET", "GET", "POST", "POST", "POST"]
+
+        # retries can be turned off per request
+        assert session.get(url, retries=0).status_code == 200
+        assert session.get(url, retries=0).status_code == 503
+        assert calls == ["GET", "GET", "POST", "POST", "POST", "GET", "GET"]
+    finally:
+        server.shutdown()
+
+
+def test_http_session_retries_connect_errors():
+
+    import socket
+    import pytest
+    import requests
+    from aimodelshare.http_session import HttpSession
+
+    # port that was free a moment ago refuses connections
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    url = "http://127.0.0.1:{}/".format(sock.getsockname()[1])
+    sock.close()
+
+    session = HttpSession(retries=2, backoff_factor=0)
+    attempts = []
+    session._backoff = attempts.append
+
+    # the adapter does not retry on its own, request retries posts that never reached the server
+    with pytest.raises(requests.ConnectionError):
+        session.post(url, data="{}")
+    assert attempts == [0, 1]
+
+
+def test_http_session_http2_requests_types():
+
+    import threading
+    import pytest
+    import requests
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from aimodelshare.http_session import HttpSession
+
+    pytest.importorskip("httpx")
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            self.send_response(404)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:{}/".format(server.server_port)
+
+    try:
+        session = HttpSession(retries=0, http2=True)
+        response = session.get(url)
+
+        # httpx responses are returned as requests responses
+        assert isinstance(response, requests.Response)
+        assert response.json() == {}
+        with pytest.raises(requests.exceptions.HTTPError):
+            response.raise_for_status()
+    finally:
+        server.shutdown()
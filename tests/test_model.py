@@ -0,0 +1,160 @@
+from aimodelshare.aimsonnx import _get_metadata
+from sklearn.linear_model import LogisticRegression
+import onnx
+
+
+def test_submission_bundle():
+
+    import numpy as np
+    from sklearn.datasets import load_iris
+    from aimodelshare.model import _build_submission_bundle, _encode_predictions
+    from aimodelshare.prediction_encoding import decode_predictions
+    data = load_iris()
+
+    model = LogisticRegression().fit(data.data, data.target)
+    bundle = _build_submission_bundle(model, np.array([0.0, 1.0, 2.0]))
+
+    # predictions are only encoded once the eval lambda is known to read the compact format
+    assert bundle.predictions_encoded is None
+    assert decode_predictions(_encode_predictions(bundle).predictions_encoded).tolist() == [0.0, 1.0, 2.0]
+    assert bundle.meta_dict['model_type'] == 'LogisticRegression'
+    assert bundle.meta_dict == _get_metadata(onnx.load(bundle.model_filepath))
+    assert bundle.external_data_filepath is None
+    assert len(bundle.model_sha256) == 64
+
+    assert _build_submission_bundle(None, [1, 0]).meta_dict is None
+
+
+def test_embed_weights():
+
+    import pickle
+    from sklearn.datasets import load_iris
+    from aimodelshare.model import _build_submission_bundle, _embed_weights
+    from aimodelshare.conversion_cache import get_artifact_store
+    data = load_iris()
+
+    model = LogisticRegression().fit(data.data, data.target)
+    bundle = _build_submission_bundle(model, [0, 1])
+    weights_filepath = get_artifact_store().path(bundle.meta_dict['weights_artifact']['sha256'])
+
+    embedded = _embed_weights(bundle, weights_filepath)
+
+    # playgrounds without weights artifacts receive the weights inside the onnx file
+    assert embedded.meta_dict['weights_artifact'] is None
+    assert (pickle.loads(embedded.meta_dict['model_weights']).predict(data.data) == model.predict(data.data)).all()
+    assert embedded.model_sha256 != bundle.model_sha256
+    assert _get_metadata(onnx.load(bundle.model_filepath))['weights_artifact'] is not None
+
+
+def test_submission_bundle_pytorch():
+
+    import torch
+    from torch import nn
+    from aimodelshare.model import _build_submission_bundle
+
+    model = nn.Sequential(nn.Linear(3, 3), nn.ReLU(), nn.Linear(3, 1))
+
+    # pytorch models are traced with model_input
+    bundle = _build_submission_bundle(model, [0.5], model_input=torch.randn(1, 3))
+
+    assert bundle.meta_dict['ml_framework'] == 'pytorch'
+    assert isinstance(onnx.load(bundle.model_filepath), onnx.ModelProto)
+
+
+def test_upload_model_graph_raises(monkeypatch):
+
+    import pytest
+    from aimodelshare import http_session
+    from aimodelshare.model import upload_model_graph
+    from aimodelshare.utils import run_upload_jobs
+    from aimodelshare.exceptions import AWSUploadError
+
+    class Forbidden:
+        status_code = 403
+
+        def raise_for_status(self):
+            raise IOError("403 Forbidden")
+
+    def download_file(url, out):
+        raise IOError("no previous graph")
+
+    monkeypatch.setattr(http_session, "download_file", download_file)
+    monkeypatch.setattr(http_session, "post", lambda url, **kwargs: Forbidden())
+
+    s3_presigned_dict = {"get": {"model_graph_1.json": "https://example.com/get"},
+                         "put": {"model_graph_1.json": str({"url": "https://example.com/put", "fields": {}})}}
+    meta_dict = {"ml_framework": "sklearn", "model_type": "LogisticRegression"}
+
+    # failed uploads reach run_upload_jobs instead of being reported as uploaded
+    with pytest.raises(AWSUploadError, match="model graph"):
+        run_upload_jobs([("model graph", 0, lambda: upload_model_graph(
+            None, s3_presigned_dict, "bucket", "model", 1, meta_dict=meta_dict))], print_progress=False)
+
+
+def test_prediction_formats(monkeypatch):
+
+    import json
+    from aimodelshare import http_session
+    from aimodelshare import model as model_module
+
+    class Response:
+
+        def __init__(self, status_code, text):
+            self.status_code = status_code
+            self.text = text
+
+    answers = {"https://new.example.com/prod/m": (200, json.dumps({"prediction_formats": ["aimspred"]})),
+               "https://old.example.com/prod/m": (200, "null"),
+               "https://failing.example.com/prod/m": (502, json.dumps({"prediction_formats": ["aimspred"]}))}
+    calls = []
+
+    def post(url, **kwargs):
+        # older lambdas may fail on the probe, it is not retried
+        assert kwargs["retries"] == 0 and not kwargs.get("idempotent")
+        calls.append(url)
+        return Response(*answers[url[:-4] + "m"])
+
+    monkeypatch.setattr(http_session, "post", post)
+    monkeypatch.setattr(model_module, "_prediction_formats_cache", None)
+
+    assert model_module._prediction_formats("https://new.example.com/prod/m") == ["aimspred"]
+    # eval lambdas deployed before the compact format get the json list
+    assert model_module._prediction_formats("https://old.example.com/prod/m") == []
+    assert model_module._prediction_formats("https://failing.example.com/prod/m") == []
+
+    # the answer is cached per playground
+    model_module._prediction_formats("https://new.example.com/prod/m")
+    assert len(calls) == 3
+
+
+def test_legacy_predictions():
+
+    import numpy as np
+    from aimodelshare.model import _legacy_predictions
+
+    assert _legacy_predictions(np.array(["a", "b"])) == ["a", "b"]
+    assert _legacy_predictions([np.float64(0.5)]) == [0.5]
+    assert type(_legacy_predictions([np.float64(0.5)])[0]) is float
+
+
+def test_submit_model_without_predictions(monkeypatch):
+
+    import pytest
+    from aimodelshare.model import submit_model
+
+    monkeypatch.setenv("username", "user")
+    monkeypatch.setenv("password", "password")
+
+    with pytest.raises(ValueError, match="prediction_submission"):
+        submit_model(None, "https://example.com/prod/m", prediction_submission=None)
+
+
+def test_encode_predictions_fallback():
+
+    from aimodelshare.model import _build_submission_bundle, _encode_predictions
+
+    # labels containing None cannot be encoded, they are sent as json list
+    bundle = _encode_predictions(_build_submission_bundle(None, ["a", None]))
+    assert bundle.predictions_encoded is None and bundle.predictions == ["a", None]
+
+    assert _encode_predictions(_build_submission_bundle(None, ["a", "b"])).predictions_encoded is not None
@@ -0,0 +1,109 @@
+import pytest
+
+
+def test_multipart_upload_resume(tmp_path, monkeypatch):
+
+    import os
+    import hashlib
+    from aimodelshare import multipart_upload as mp
+    from aimodelshare.exceptions import AWSUploadError
+
+    filepath = str(tmp_path / "model.onnx")
+    with open(filepath, "wb") as f:
+        f.write(bytes(range(256)) * 40)
+
+    # fake playground lambda and bucket, third part upload fails once
+    stored, calls, failures = {}, [], [3]
+
+    def fake_request(apiurl, submission_type, file_name, operation, **kwargs):
+        calls.append(operation)
+        if operation == "complete":
+            stored["object"] = b"".join(stored[int(n)] for n in sorted(kwargs["parts"], key=int))
+            return {"upload_id": "u1"}
+        parts = {str(n): hashlib.md5(stored[n]).hexdigest() for n in stored if n != "object"}
+        return {"upload_id": "u1", "parts": parts if operation == "resume" else {},
+                "urls": {str(n): n for n in kwargs["part_numbers"]}}
+
+    def fake_upload_part(number, data):
+        if number in failures:
+            failures.remove(number)
+            raise IOError("connection reset")
+        stored[number] = data
+        return hashlib.md5(data).hexdigest()
+
+    monkeypatch.setattr(mp, "_multipart_request", fake_request)
+    monkeypatch.setattr(mp, "_upload_part", fake_upload_part)
+
+    # journals are written to AIMODELSHARE_UPLOAD_JOURNAL_DIR set in conftest
+    kwargs = dict(part_size=4096, max_workers=2)
+
+    with pytest.raises(AWSUploadError, match="resumes"):
+        mp.multipart_upload("url", "competition", "onnx_model_v1.onnx", filepath, **kwargs)
+    assert len(os.listdir(tmp_path / "uploads")) == 1
+
+    uploaded = len(stored)
+    result = mp.multipart_upload("url", "competition", "onnx_model_v1.onnx", filepath, **kwargs)
+
+    assert calls == ["create", "resume", "complete"]
+    assert uploaded == 2 and result["upload_id"] == "u1" and len(result["parts"]) == 3
+    with open(filepath, "rb") as f:
+        assert stored["object"] == f.read()
+    assert os.listdir(tmp_path / "uploads") == []
+
+
+def test_multipart_upload_new_version(tmp_path, monkeypatch):
+
+    from aimodelshare import multipart_upload as mp
+    from aimodelshare.exceptions import AWSUploadError
+
+    filepath = str(tmp_path / "model.onnx")
+    with open(filepath, "wb") as f:
+        f.write(b"0" * 8192)
+
+    calls = []
+
+    def fake_request(apiurl, submission_type, file_name, operation, **kwargs):
+        calls.append((operation, file_name))
+        return {"upload_id": "u" + str(len(calls)), "parts": {}, "urls": {str(n): n for n in kwargs.get("part_numbers", [])}}
+
+    def failing_upload_part(number, data):
+        raise IOError("connection reset")
+
+    monkeypatch.setattr(mp, "_multipart_request", fake_request)
+    monkeypatch.setattr(mp, "_upload_part", failing_upload_part)
+
+    with pytest.raises(AWSUploadError):
+        mp.multipart_upload("url", "competition", "onnx_model_v1.onnx", filepath, part_size=4096)
+
+    # a retried submission is issued a new version, the upload of the old one is aborted
+    monkeypatch.setattr(mp, "_upload_part", lambda number, data: "etag" + str(number))
+    mp.multipart_upload("url", "competition", "onnx_model_v2.onnx", filepath, part_size=4096)
+
+    assert calls == [("create", "onnx_model_v1.onnx"), ("abort", "onnx_model_v1.onnx"),
+                     ("create", "onnx_model_v2.onnx"), ("complete", "onnx_model_v2.onnx")]
+
+
+def test_upload_part_kms_etag(monkeypatch):
+
+    from aimodelshare import http_session
+    from aimodelshare import multipart_upload as mp
+    from aimodelshare.exceptions import AWSUploadError
+
+    class Response:
+
+        def __init__(self, headers):
+            self.headers = headers
+
+        def raise_for_status(self):
+            pass
+
+    headers = {}
+    monkeypatch.setattr(http_session, "request", lambda method, url, **kwargs: Response(headers))
+
+    # ETags of KMS encrypted parts are not their md5, S3 checked the Content-MD5 header already
+    headers.update({"ETag": '"0123"', "x-amz-server-side-encryption": "aws:kms"})
+    assert mp._upload_part("url", b"data") == "0123"
+
+    headers.pop("x-amz-server-side-encryption")
+    with pytest.raises(AWSUploadError, match="Checksum"):
+        mp._upload_part("url", b"data")
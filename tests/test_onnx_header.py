@@ -0,0 +1,42 @@
+from aimodelshare.aimsonnx import _sklearn_to_onnx, _get_metadata
+from aimodelshare.onnx_header import read_onnx_header, read_onnx_metadata
+from sklearn.linear_model import LogisticRegression
+import onnx
+
+
+def test_read_onnx_header(tmp_path):
+
+    import io
+    import numpy as np
+    from sklearn.datasets import load_iris
+    data = load_iris()
+
+    onnx_model = _sklearn_to_onnx(LogisticRegression().fit(data.data, data.target))
+    path = str(tmp_path / "model.onnx")
+    onnx.save(onnx_model, path)
+
+    header = read_onnx_header(path)
+    assert _get_metadata(header) == _get_metadata(onnx_model)
+    assert [n.op_type for n in header.graph.nodes] == [n.op_type for n in onnx_model.graph.node]
+    assert [i.name for i in header.graph.inputs] == [i.name for i in onnx_model.graph.input]
+    assert header.graph.initializer_count == len(onnx_model.graph.initializer)
+    assert header.opset_import == {o.domain: o.version for o in onnx_model.opset_import}
+
+    assert read_onnx_header(onnx_model.SerializeToString(), graph=False).graph is None
+
+    # initializer payloads are skipped, not read
+    weights = onnx.numpy_helper.from_array(np.zeros((512, 512), dtype=np.float32), name="unused")
+    onnx_model.graph.initializer.append(weights)
+    onnx.save(onnx_model, path)
+
+    class CountingFile(io.FileIO):
+        bytes_read = 0
+
+        def read(self, size=-1):
+            data = super().read(size)
+            CountingFile.bytes_read += len(data)
+            return data
+
+    with CountingFile(path) as f:
+        assert read_onnx_metadata(f, block_size=4096) == {i.key: i.value for i in onnx_model.metadata_props}
+    assert CountingFile.bytes_read < weights.ByteSize()
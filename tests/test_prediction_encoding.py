@@ -0,0 +1,26 @@
+import pytest
+
+
+def test_prediction_encoding():
+
+    import json
+    import numpy as np
+    from aimodelshare.prediction_encoding import encode_predictions, decode_predictions, is_encoded_predictions
+
+    values = np.random.RandomState(0).rand(10000)
+    for compression in ["none", "zlib"]:
+        encoded = encode_predictions(values, compression=compression)
+        decoded = decode_predictions(encoded)
+        assert is_encoded_predictions(encoded)
+        assert decoded.dtype == np.float64 and np.array_equal(decoded, values)
+
+    # labels are stored once, rows as uint8 codes
+    labels = ["cat", "dog", "bird", "dog"] * 2500
+    encoded = encode_predictions(labels)
+    assert decode_predictions(encoded).tolist() == labels
+    assert len(encoded) < len(json.dumps(labels)) / 10
+
+    assert decode_predictions(encode_predictions([0, 2, 1])).tolist() == [0, 2, 1]
+
+    with pytest.raises(ValueError):
+        encode_predictions([{"label": 1}])
@@ -0,0 +1,18 @@
+def test_ttl_cache(tmp_path, monkeypatch):
+
+    import time
+    from aimodelshare.ttl_cache import TTLCache
+
+    path = str(tmp_path / "playgrounds.json")
+    cache = TTLCache(ttl=60, path=path)
+    cache.put("user https://example.com/m", ["api", "bucket", "model"])
+
+    # entries survive the process through the json file
+    assert TTLCache(ttl=60, path=path).get("user https://example.com/m") == ["api", "bucket", "model"]
+
+    cache.invalidate("user https://example.com/m")
+    assert TTLCache(ttl=60, path=path).get("user https://example.com/m") is None
+
+    cache.put("key", "value")
+    monkeypatch.setattr(time, "time", lambda: 1e12)
+    assert cache.get("key") is None
@@ -0,0 +1,26 @@
+import pytest
+
+
+def test_run_upload_jobs():
+
+    import threading
+    from aimodelshare.utils import run_upload_jobs
+    from aimodelshare.exceptions import AWSUploadError
+
+    barrier = threading.Barrier(2, timeout=5)
+
+    def upload(name):
+        # both jobs only finish when they run at the same time
+        barrier.wait()
+        return name
+
+    results = run_upload_jobs([("model", 100, lambda: upload("model")),
+                               ("metadata", 1, lambda: upload("metadata"))],
+                              max_workers=2, print_progress=False)
+    assert results == {"model": "model", "metadata": "metadata"}
+
+    def fail():
+        raise IOError("connection reset")
+
+    with pytest.raises(AWSUploadError, match="metadata"):
+        run_upload_jobs([("model", 100, lambda: "model"), ("metadata", 1, fail)], print_progress=False)